@@ -0,0 +1,58 @@
+import { NextRequest } from 'next/server';
+import prisma from '@/lib/prisma';
+import { getSession } from '@/lib/auth';
+import {
+  ERR_UNAUTHORIZED,
+  ERR_FORBIDDEN,
+  ERR_NOT_FOUND,
+  ERR_BAD_REQUEST,
+  successResponse,
+  isValidUUID,
+} from '@/lib/errors';
+import { formatJob } from '@/lib/helpers';
+
+export async function POST(
+  _request: NextRequest,
+  { params }: { params: Promise<{ jobId: string }> }
+) {
+  const auth = await getSession();
+  if (!auth) {
+    return ERR_UNAUTHORIZED();
+  }
+
+  const { jobId } = await params;
+
+  if (!isValidUUID(jobId)) {
+    return ERR_NOT_FOUND('Job not found');
+  }
+
+  const job = await prisma.analysisJob.findUnique({
+    where: { id: jobId },
+    include: { project: { select: { ownerId: true } } },
+  });
+
+  if (!job) {
+    return ERR_NOT_FOUND('Job not found');
+  }
+
+  if (job.project.ownerId !== auth.user.id) {
+    return ERR_FORBIDDEN();
+  }
+
+  // Only a job that has not finished can be cancelled. The worker polls the
+  // status of a running job, stops it and keeps it 'canceled'.
+  const { count } = await prisma.analysisJob.updateMany({
+    where: { id: jobId, status: { in: ['queued', 'running'] } },
+    data: { status: 'canceled', message: 'Canceled by user' },
+  });
+
+  if (count === 0) {
+    return ERR_BAD_REQUEST('Job has already finished');
+  }
+
+  const canceled = await prisma.analysisJob.findUniqueOrThrow({ where: { id: jobId } });
+
+  return successResponse({
+    job: formatJob(canceled),
+  });
+}
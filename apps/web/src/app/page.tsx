@@ -6,6 +6,7 @@ import { useRouter, useSearchParams } from "next/navigation";
 import dynamic from "next/dynamic";
 import { Suspense } from "react";
 import { apiFetch } from "@/lib/api";
+import { decodeGraph } from "@/lib/graphFormat";
 import type {
   FeedResponse,
   PostCard,
@@ -895,7 +896,7 @@ function LandingPageClient() {
         const urlRes = await apiFetch<ResultUrlResponse>(`/api/v1/analysis-jobs/${job.id}/result-url`);
         const graphRes = await fetch(urlRes.data.url);
         if (!graphRes.ok) throw new Error("Failed to fetch graph data");
-        const data: GraphData = await graphRes.json();
+        const data: GraphData = decodeGraph(await graphRes.json());
         const normalized = normalizeGraphData(data);
         if (!cancelled) setCityGraphData(normalized);
       } catch {
@@ -3,6 +3,7 @@
 import { useEffect, useMemo, useRef, useState } from "react";
 import dynamic from "next/dynamic";
 import type { GraphData, ResultUrlResponse, PlanetSummary } from "@/lib/types";
+import { decodeGraph } from "@/lib/graphFormat";
 import { apiFetch } from "@/lib/api";
 import type { ThemeType } from "@/components/viewer/useCodeCityViewer";
 import { cn } from "@/lib/utils";
@@ -200,7 +201,7 @@ export function PostVisualization({
         );
         const graphRes = await fetch(urlRes.data.url);
         if (!graphRes.ok) throw new Error("Failed to fetch graph data");
-        const raw = (await graphRes.json()) as GraphData;
+        const raw = decodeGraph(await graphRes.json());
         const data: GraphData = {
           ...raw,
           history: raw.history ?? history,
@@ -20,6 +20,8 @@ type StatsData = {
   totalLines?: number;
   languages?: Record<string, number>;
   commitCount?: number;
+  sampled?: boolean;
+  sampledFrom?: number;
 };
 
 type Props = {
@@ -61,6 +63,7 @@ export function ControlsPanel({ project, theme, onThemeChange, saving, onSave, s
       { key: "directoryCount", value: stats.directoryCount },
       { key: "totalLines", value: stats.totalLines },
       { key: "commitCount", value: stats.commitCount },
+      { key: "sampledFrom", value: stats.sampled ? stats.sampledFrom : undefined },
     ].filter((e) => e.value !== undefined)
     : [];
 
@@ -2,6 +2,8 @@
 
 import { useEffect, useState, useRef, useCallback } from "react";
 import type { ProjectDetailResponse, ResultUrlResponse, GraphData } from "@/lib/types";
+import { decodeGraph } from "@/lib/graphFormat";
+import { buildLevelView, coarsestExpansion, expandTo } from "@/lib/lod";
 import { apiFetch } from "@/lib/api";
 import { useCodeCityViewer, ThemeType } from "./useCodeCityViewer";
 import { TwoViewer } from "./TwoViewer";
@@ -47,6 +49,9 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
   const [historyIndex, setHistoryIndex] = useState(-1);
   const [activeGraphData, setActiveGraphData] = useState<GraphData | null>(null);
 
+  // 대형 저장소: 펼쳐진 디렉터리 목록 (null이면 모든 파일을 그대로 표시)
+  const [expandedDirs, setExpandedDirs] = useState<Set<string> | null>(null);
+
   // 사이드바 전용 상태
   const [selectedNode, setSelectedNode] = useState<any>(null);
   const [sidebarActive, setSidebarActive] = useState(false);
@@ -55,6 +60,21 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
   const jobStatus = project?.latestJob?.status;
   const jobId = project?.latestJob?.id;
   const progress = project?.latestJob?.progress;
+  const interrupted = jobStatus === "canceled" || jobStatus === "timed_out";
+  const [canceling, setCanceling] = useState(false);
+
+  // 진행 중인 분석 작업 취소 요청 (워커가 상태를 확인하고 작업을 중단함)
+  const handleCancelJob = useCallback(async () => {
+    if (!jobId) return;
+    setCanceling(true);
+    try {
+      await apiFetch(`/api/v1/analysis-jobs/${jobId}/cancel`, { method: "POST" });
+    } catch (e) {
+      console.error("작업 취소 실패:", e);
+    } finally {
+      setCanceling(false);
+    }
+  }, [jobId]);
 
   // 핸들러용 Ref (순환 참조 방지 및 의존성 안정화)
   const onNodeClickRef = useRef<(node: any) => void>(null as any);
@@ -82,6 +102,16 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
   const handleNodeSelect = useCallback((node: any) => {
     if (!node) return;
 
+    // 디렉터리 슈퍼노드를 클릭하면 선택 대신 한 단계 펼침
+    if (typeof node.id === "string" && node.id.endsWith("/")) {
+      setExpandedDirs((prev) => new Set(prev ?? []).add(node.id));
+      return;
+    }
+    // 접힌 디렉터리 안의 파일(검색 결과 등)은 보이도록 상위 디렉터리를 모두 펼침
+    if (expandedDirs && !activeGraphData?.nodes.some((n: any) => n.id === node.id)) {
+      setExpandedDirs(expandTo(node.id, expandedDirs));
+    }
+
     // 이미 데이터가 enrich 되어있으므로, ID로 찾아도 좋고 넘겨받은 객체를 그대로 써도 좋습니다.
     // 다만 history 전환 시의 최신 상태(isModified 등)를 반영하기 위해 activeGraphData에서 조회합니다.
     const fullNode = activeGraphData?.nodes.find((n: any) => n.id === node.id) || node;
@@ -95,7 +125,7 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
       setFocusedNodeState(node);
     }
     setSearchQuery("");
-  }, [theme, highlightNode, activeGraphData]);
+  }, [theme, highlightNode, activeGraphData, expandedDirs]);
 
   const closeSidebar = useCallback(() => {
     setSidebarActive(false);
@@ -114,7 +144,15 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
     if (!graphData) return;
 
     if (historyIndex === -1 || !graphData.history || graphData.history.length === 0) {
-      setActiveGraphData(graphData);
+      // 대형 저장소는 디렉터리 단위의 거친 레벨부터 보여주고, 클릭 시 하위 트리를 펼침
+      if (expandedDirs) {
+        const initial = coarsestExpansion(graphData);
+        const isInitial =
+          initial && initial.size === expandedDirs.size && [...initial].every((id) => expandedDirs.has(id));
+        setActiveGraphData(buildLevelView(graphData, expandedDirs, isInitial ? graphData.levels?.[0] : undefined));
+      } else {
+        setActiveGraphData(graphData);
+      }
     } else {
       const targetCommit = graphData.history[historyIndex];
       console.log("히스토리 인덱스 변경:", historyIndex);
@@ -125,14 +163,29 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
 
       if (snapshot) {
         // 스냅샷 파일 맵을 GraphNode[] 및 GraphEdge[] 형식으로 변환
-        const snapshotNodes = Object.entries(snapshot.files).map(([path, info]) => ({
-          id: path,
-          name: path.split("/").pop() || path,
-          path: path,
-          type: "file",
-          lines: info.line_count,
-          language: info.language,
-        }));
+        // (워커가 스냅샷별 그래프 지표를 계산한 경우 노드에 함께 넣음)
+        const analytics = snapshot.analytics;
+        const metricIndex = new Map(analytics?.id.map((id, i) => [id, i]));
+        const snapshotNodes = Object.entries(snapshot.files).map(([path, info]) => {
+          const position = snapshot.positions?.[path];
+          const i = metricIndex.get(path);
+          return {
+            id: path,
+            name: path.split("/").pop() || path,
+            path: path,
+            type: "file",
+            lines: info.line_count,
+            language: info.language,
+            ...(position && { x: position[0], y: position[1], z: position[2] }),
+            ...(analytics && i !== undefined && {
+              inDegree: analytics.inDegree[i],
+              outDegree: analytics.outDegree[i],
+              cycle: analytics.cycle[i],
+              pageRank: analytics.pageRank[i],
+              layer: analytics.layer[i],
+            }),
+          };
+        });
 
         const snapshotEdges: any[] = [];
         const nodeIds = new Set(snapshotNodes.map((n) => n.id));
@@ -176,7 +229,7 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
         setActiveGraphData(graphData);
       }
     }
-  }, [graphData, historyIndex]);
+  }, [graphData, historyIndex, expandedDirs]);
 
   // 검색어 입력 시 결과 필터링
   useEffect(() => {
@@ -223,7 +276,7 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
         const graphRes = await fetch(urlRes.data.url);
         if (!graphRes.ok) throw new Error("Failed to fetch graph data");
 
-        const data: GraphData = await graphRes.json();
+        const data: GraphData = decodeGraph(await graphRes.json());
         console.log("그래프 데이터 로드 완료:", data);
         if (data.snapshots) {
           console.log("사용 가능한 스냅샷 개수:", data.snapshots.length);
@@ -247,6 +300,7 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
         // 3. 데이터를 상태에 저장하고 엔진 준비 알림
         if (!cancelled) {
           setGraphData(data);
+          setExpandedDirs(coarsestExpansion(data));
           // 컨테이너 요소가 DOM에 완전히 준비될 시간을 주기 위한 약간의 지연
           setTimeout(() => {
             if (!cancelled) setViewerReady(true);
@@ -278,6 +332,7 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
     jobStatus === "queued" ||
     jobStatus === "running" ||
     jobStatus === "failed" ||
+    interrupted ||
     graphLoading ||
     graphError ||
     !graphData;
@@ -399,6 +454,25 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
           <strong>Line Count</strong>{" "}
           <span id="sb-loc">{selectedNode?.lineCount || selectedNode?.loc || 0}</span>
         </div>
+        {selectedNode?.inDegree !== undefined && (
+          <>
+            <div className="info-group">
+              <strong>Fan-in / Fan-out</strong>{" "}
+              <span>{selectedNode.inDegree} / {selectedNode.outDegree}</span>
+            </div>
+            <div className="info-group">
+              <strong>PageRank</strong> <span>{selectedNode.pageRank.toFixed(2)}</span>
+            </div>
+            <div className="info-group">
+              <strong>Layer</strong> <span>{selectedNode.layer}</span>
+            </div>
+            {selectedNode.cycle !== null && (
+              <div className="info-group">
+                <strong>Import Cycle</strong> <span>#{selectedNode.cycle + 1}</span>
+              </div>
+            )}
+          </>
+        )}
 
         <div className="dep-section">
           <h3>Imports</h3>
@@ -437,6 +511,10 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
             <div className="text-white">
               {jobStatus === "failed" ? (
                 <span className="text-red-400 font-bold">Analysis Failed</span>
+              ) : jobStatus === "timed_out" ? (
+                <span className="text-red-400 font-bold">Analysis Timed Out</span>
+              ) : jobStatus === "canceled" ? (
+                <span className="text-neutral-300 font-bold">Analysis Canceled</span>
               ) : graphError ? (
                 <span className="text-red-400 font-bold">{graphError}</span>
               ) : (
@@ -448,6 +526,20 @@ export function ThreeViewer({ project, loading, theme = "Thema1", onThemeChange,
                 {project?.latestJob?.message || (jobStatus === "failed" ? "작업 중 오류가 발생했습니다." : "Preparing repository...")}
               </div>
             )}
+            {interrupted && (
+              <div className="mt-2 text-sm text-neutral-400">
+                {jobStatus === "timed_out" ? "분석 시간이 제한을 초과했습니다." : "분석이 취소되었습니다."}
+              </div>
+            )}
+            {(jobStatus === "queued" || jobStatus === "running") && (
+              <button
+                onClick={handleCancelJob}
+                disabled={canceling}
+                className="mt-4 border border-white/15 px-4 py-2 text-xs uppercase tracking-[0.2em] text-white/80 hover:bg-white/10 disabled:text-white/40"
+              >
+                {canceling ? "Canceling..." : "Cancel Analysis"}
+              </button>
+            )}
           </div>
         </div>
       )}
@@ -35,7 +35,10 @@ export function TwoViewer({ data, focusedNode, onNodeClick, onBackgroundClick }:
         const ForceGraphAny = ForceGraph as any;
         const Graph = ForceGraphAny()(containerRef.current)
             .graphData({
-                nodes: data.nodes,
+                // Copies without the worker's 3D layout (unit-sphere x/y/z), which is
+                // meaningless in 2D; the simulation then also leaves data.nodes untouched.
+                // eslint-disable-next-line @typescript-eslint/no-unused-vars
+                nodes: data.nodes.map(({ x, y, z, ...node }) => node),
                 links: data.edges || []
             })
             .backgroundColor("#000000")
@@ -91,7 +94,7 @@ export function TwoViewer({ data, focusedNode, onNodeClick, onBackgroundClick }:
             });
 
         // Initial node pinning if positions exist
-        data.nodes.forEach((node: any) => {
+        Graph.graphData().nodes.forEach((node: any) => {
             if (node.x !== undefined) {
                 node.fx = node.x;
                 node.fy = node.y;
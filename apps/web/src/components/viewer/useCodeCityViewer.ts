@@ -31,6 +31,7 @@ export type CityNode = {
   fy?: number | null;
   fz?: number | null;
   isModified?: boolean;
+  hasLayout?: boolean; // 워커가 미리 계산한 위치에 고정된 노드
   __threeObj?: THREE.Object3D;
 };
 
@@ -424,10 +425,34 @@ export function useCodeCityViewer(
     const links: CityLink[] = [];
 
     const nodeMap = new Map<string, CityNode>();
-    const sourceNodes = data.nodes.filter((n) => n.type === "file");
+    // 대형 저장소의 디렉터리 슈퍼노드도 하나의 건물로 표시
+    const sourceNodes = data.nodes.filter((n) => n.type === "file" || n.type === "directory");
 
     // 파일 노드 생성 (코드 라인 수에 따라 나중에 건물 크기가 결정됨)
     sourceNodes.forEach((n: any) => {
+      // 워커가 미리 계산한 레이아웃(단위 구 위의 좌표)이 있으면 행성 표면에 그대로 고정
+      if (typeof n.x === "number" && typeof n.y === "number" && typeof n.z === "number") {
+        const x = n.x * R;
+        const y = n.y * R;
+        const z = n.z * R + Cz;
+        const node: CityNode = {
+          id: n.id,
+          lineCount: n.lines || n.loc || 10,
+          imports: [],
+          importedBy: [],
+          x,
+          y,
+          z,
+          fx: x,
+          fy: y,
+          fz: z,
+          hasLayout: true,
+        };
+        nodeMap.set(n.id, node);
+        nodes.push(node);
+        return;
+      }
+
       const node: CityNode = {
         id: n.id,
         lineCount: n.lines || n.loc || 10,
@@ -457,7 +482,7 @@ export function useCodeCityViewer(
     });
 
     return { nodes, links };
-  }, []);
+  }, [R, Cz]);
 
   /**
    * 행성 표면 위에 곡선 형태로 도로를 그리기 위한 베지어 곡선 생성
@@ -561,7 +586,8 @@ export function useCodeCityViewer(
         n.vy = 0;
         n.vz = 0;
 
-        // 물리 엔진이 다시 계산할 수 있도록 고정 해제 (원하는 경우)
+        // 물리 엔진이 다시 계산할 수 있도록 고정 해제 (미리 계산된 레이아웃은 유지)
+        if (n.hasLayout) return;
         n.fx = null;
         n.fy = null;
         n.fz = null;
@@ -711,7 +737,8 @@ export function useCodeCityViewer(
     const Graph = ForceGraph3DAny()(el)
       .graphData(cityData)
       .backgroundColor("#000000") // 배경 검은색 고정
-      .warmupTicks(120) // 초기 로딩 시 시뮬레이션을 미루고 계산만 수행하여 빠르게 배치
+      // 초기 로딩 시 시뮬레이션을 미루고 계산만 수행하여 빠르게 배치 (미리 계산된 레이아웃이 있으면 생략)
+      .warmupTicks(cityData.nodes.every((n) => n.fx != null) ? 0 : 120)
       .cooldownTicks(60) // 조금 더 길게 주어 안정적으로 멈추게 함
       .nodeThreeObject((node: CityNode) => {
         const group = new THREE.Group();
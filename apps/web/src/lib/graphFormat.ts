@@ -0,0 +1,312 @@
+// apps/web/src/lib/graphFormat.ts
+// Decoder for the worker's compact graph.json (format 3) and delta-encoded
+// snapshots. See apps/worker/src/services/graph_format.py for the layout.
+import type {
+  CommitInfo,
+  DirectoryNode,
+  GraphData,
+  GraphEdge,
+  GraphLevel,
+  GraphNode,
+  LayoutPosition,
+  Snapshot,
+  SnapshotAnalytics,
+  SnapshotDelta,
+  SnapshotFile,
+} from "@/lib/types";
+
+type CompactNodes = {
+  id: number[];
+  lines: number[];
+  language: number[];
+  [column: string]: unknown[];
+};
+
+type CompactEdges = {
+  pairs: number[];
+  type: number[];
+};
+
+type CompactDelta = {
+  addedNodes: CompactNodes;
+  removedNodes: number[];
+  changedLines: { id: number[]; lines: number[] };
+  addedEdges: CompactEdges;
+  removedEdges: CompactEdges;
+};
+
+type CompactLayout = {
+  id: number[];
+  xyz: number[];
+};
+
+type CompactSnapshot = Omit<Snapshot, "files" | "delta" | "layout" | "positions" | "analytics"> & {
+  nodes?: CompactNodes;
+  edges?: CompactEdges;
+  delta?: CompactDelta;
+  layout?: CompactLayout;
+  analytics?: Omit<SnapshotAnalytics, "id"> & { id: number[] };
+};
+
+type CompactDirectories = {
+  id: number[];
+  lines: number[];
+  fileCount: number[];
+  languages: number[][];
+  x?: number[];
+  y?: number[];
+  z?: number[];
+};
+
+type CompactLevel = Omit<GraphLevel, "edges"> & {
+  edges: { pairs: number[]; weight: number[] };
+};
+
+type CompactGraph = {
+  format: 3;
+  metadata?: GraphData["metadata"];
+  paths: string[];
+  languages: string[];
+  edgeTypes: string[];
+  nodes: CompactNodes;
+  edges: CompactEdges;
+  history?: (Omit<CommitInfo, "files"> & { files: { path: number[]; status: string } })[];
+  stats?: GraphData["stats"];
+  snapshots?: CompactSnapshot[];
+  directories?: CompactDirectories;
+  levels?: CompactLevel[];
+};
+
+// Snapshots as sent by the worker: after the first, `files` may be replaced by `delta`.
+type WireSnapshot = Omit<Snapshot, "files"> & { files?: Record<string, SnapshotFile> };
+
+function isCompactGraph(raw: unknown): raw is CompactGraph {
+  return typeof raw === "object" && raw !== null && (raw as { format?: unknown }).format === 3;
+}
+
+function baseName(path: string): string {
+  return path.slice(path.lastIndexOf("/") + 1);
+}
+
+function decodeFileNodes(
+  columns: CompactNodes,
+  paths: string[],
+  languages: string[]
+): Record<string, Omit<SnapshotFile, "depends_on">> {
+  const files: Record<string, Omit<SnapshotFile, "depends_on">> = {};
+  columns.id.forEach((pathId, i) => {
+    files[paths[pathId]] = { language: languages[columns.language[i]], line_count: columns.lines[i] };
+  });
+  return files;
+}
+
+function decodeEdges(columns: CompactEdges, paths: string[], edgeTypes: string[]): GraphEdge[] {
+  return columns.type.map((typeId, i) => ({
+    source: paths[columns.pairs[2 * i]],
+    target: paths[columns.pairs[2 * i + 1]],
+    type: edgeTypes[typeId],
+  }));
+}
+
+function decodeLayout(columns: CompactLayout, paths: string[]): Record<string, LayoutPosition> {
+  const layout: Record<string, LayoutPosition> = {};
+  columns.id.forEach((pathId, i) => {
+    layout[paths[pathId]] = [columns.xyz[3 * i], columns.xyz[3 * i + 1], columns.xyz[3 * i + 2]];
+  });
+  return layout;
+}
+
+function decodeDirectories(columns: CompactDirectories, paths: string[], languages: string[]): DirectoryNode[] {
+  return columns.id.map((pathId, i) => {
+    const path = paths[pathId].slice(0, -1);
+    const slash = path.lastIndexOf("/");
+    const histogram = columns.languages[i];
+    const directoryLanguages: Record<string, number> = {};
+    for (let j = 0; j < histogram.length; j += 2) {
+      directoryLanguages[languages[histogram[j]]] = histogram[j + 1];
+    }
+    const directory: DirectoryNode = {
+      id: paths[pathId],
+      name: path.slice(slash + 1),
+      path,
+      type: "directory",
+      parent: slash >= 0 ? `${path.slice(0, slash)}/` : null,
+      depth: path.split("/").length,
+      lines: columns.lines[i],
+      fileCount: columns.fileCount[i],
+      languages: directoryLanguages,
+    };
+    if (columns.x && columns.y && columns.z) {
+      directory.x = columns.x[i];
+      directory.y = columns.y[i];
+      directory.z = columns.z[i];
+    }
+    return directory;
+  });
+}
+
+function decodeLevel({ edges, ...level }: CompactLevel, paths: string[]): GraphLevel {
+  return {
+    ...level,
+    edges: edges.weight.map((weight, i) => ({
+      source: paths[edges.pairs[2 * i]],
+      target: paths[edges.pairs[2 * i + 1]],
+      weight,
+    })),
+  };
+}
+
+function decodeSnapshot(
+  { nodes: snapNodes, edges: snapEdges, delta, layout: compactLayout, analytics, ...rest }: CompactSnapshot,
+  paths: string[],
+  languages: string[],
+  edgeTypes: string[]
+): WireSnapshot {
+  const snapshot: Omit<WireSnapshot, "files" | "delta"> = { ...rest };
+  if (compactLayout) snapshot.layout = decodeLayout(compactLayout, paths);
+  if (analytics) snapshot.analytics = { ...analytics, id: analytics.id.map((pathId) => paths[pathId]) };
+  if (delta) {
+    const changedLines: Record<string, number> = {};
+    delta.changedLines.id.forEach((pathId, i) => {
+      changedLines[paths[pathId]] = delta.changedLines.lines[i];
+    });
+    return {
+      ...snapshot,
+      delta: {
+        addedNodes: decodeFileNodes(delta.addedNodes, paths, languages),
+        removedNodes: delta.removedNodes.map((pathId) => paths[pathId]),
+        changedLines,
+        addedEdges: decodeEdges(delta.addedEdges, paths, edgeTypes),
+        removedEdges: decodeEdges(delta.removedEdges, paths, edgeTypes),
+      },
+    };
+  }
+
+  const files: Record<string, SnapshotFile> = {};
+  if (snapNodes) {
+    for (const [path, info] of Object.entries(decodeFileNodes(snapNodes, paths, languages))) {
+      files[path] = { ...info, depends_on: [] };
+    }
+  }
+  if (snapEdges) {
+    for (const edge of decodeEdges(snapEdges, paths, edgeTypes)) {
+      files[edge.source].depends_on.push({ target: edge.target, type: edge.type });
+    }
+  }
+  return { ...snapshot, files };
+}
+
+/** Returns the file map after `delta`; unchanged entries are shared with `files`. */
+export function applySnapshotDelta(
+  files: Record<string, SnapshotFile>,
+  delta: SnapshotDelta
+): Record<string, SnapshotFile> {
+  const result: Record<string, SnapshotFile> = { ...files };
+  for (const path of delta.removedNodes) delete result[path];
+  for (const [path, info] of Object.entries(delta.addedNodes)) {
+    result[path] = { ...info, depends_on: [] };
+  }
+  for (const [path, lineCount] of Object.entries(delta.changedLines)) {
+    result[path] = { ...result[path], line_count: lineCount };
+  }
+
+  const removedBySource = new Map<string, Set<string>>();
+  for (const edge of delta.removedEdges) {
+    if (!removedBySource.has(edge.source)) removedBySource.set(edge.source, new Set());
+    removedBySource.get(edge.source)!.add(`${edge.target}\0${edge.type}`);
+  }
+  removedBySource.forEach((removed, source) => {
+    const info = result[source];
+    if (!info) return;
+    result[source] = {
+      ...info,
+      depends_on: info.depends_on.filter((dep) => !removed.has(`${dep.target}\0${dep.type}`)),
+    };
+  });
+
+  const addedBySource = new Map<string, SnapshotFile["depends_on"]>();
+  for (const edge of delta.addedEdges) {
+    if (!addedBySource.has(edge.source)) addedBySource.set(edge.source, []);
+    addedBySource.get(edge.source)!.push({ target: edge.target, type: edge.type });
+  }
+  addedBySource.forEach((added, source) => {
+    const info = result[source];
+    result[source] = { ...info, depends_on: [...info.depends_on, ...added] };
+  });
+
+  return result;
+}
+
+/**
+ * Fills in `files` for delta-encoded snapshots, keeping each `delta` for
+ * consumers, and accumulates each snapshot's `layout` into `positions`.
+ */
+export function expandSnapshots(snapshots: WireSnapshot[]): Snapshot[] {
+  let files: Record<string, SnapshotFile> = {};
+  let positions: Record<string, LayoutPosition> | undefined;
+  return snapshots.map((snapshot) => {
+    if (snapshot.delta && !snapshot.files) {
+      files = applySnapshotDelta(files, snapshot.delta);
+    } else {
+      files = snapshot.files ?? {};
+    }
+    if (snapshot.layout) {
+      const next: Record<string, LayoutPosition> = {};
+      for (const path of Object.keys(files)) {
+        const position = snapshot.layout[path] ?? positions?.[path];
+        if (position) next[path] = position;
+      }
+      positions = next;
+    } else {
+      positions = undefined;
+    }
+    return { ...snapshot, files, positions };
+  });
+}
+
+function decodeCompactGraph(raw: CompactGraph): GraphData {
+  const { paths, languages, edgeTypes } = raw;
+  const extraColumns = Object.keys(raw.nodes).filter(
+    (key) => key !== "id" && key !== "lines" && key !== "language"
+  );
+
+  const nodes: GraphNode[] = raw.nodes.id.map((pathId, i) => {
+    const path = paths[pathId];
+    const node: GraphNode & Record<string, unknown> = {
+      id: path,
+      name: baseName(path),
+      path,
+      type: "file",
+      lines: raw.nodes.lines[i],
+      language: languages[raw.nodes.language[i]],
+    };
+    for (const key of extraColumns) node[key] = raw.nodes[key][i];
+    return node;
+  });
+
+  const history: CommitInfo[] | undefined = raw.history?.map(({ files, ...commit }) => ({
+    ...commit,
+    files: files.path.map((pathId, i) => ({ path: paths[pathId], status: files.status[i] })),
+  }));
+
+  const snapshots = raw.snapshots?.map((snapshot) => decodeSnapshot(snapshot, paths, languages, edgeTypes));
+
+  return {
+    metadata: raw.metadata,
+    nodes,
+    edges: decodeEdges(raw.edges, paths, edgeTypes),
+    history,
+    stats: raw.stats,
+    snapshots: snapshots && expandSnapshots(snapshots),
+    directories: raw.directories && decodeDirectories(raw.directories, paths, languages),
+    levels: raw.levels?.map((level) => decodeLevel(level, paths)),
+  };
+}
+
+/** Accepts any graph.json format and returns the legacy object shape with full snapshots. */
+export function decodeGraph(raw: unknown): GraphData {
+  if (isCompactGraph(raw)) return decodeCompactGraph(raw);
+
+  const data = raw as Omit<GraphData, "snapshots"> & { snapshots?: WireSnapshot[] };
+  return data.snapshots ? { ...data, snapshots: expandSnapshots(data.snapshots) } : (data as GraphData);
+}
@@ -0,0 +1,112 @@
+// apps/web/src/lib/lod.ts
+// Level-of-detail views of large graphs: files inside collapsed directories
+// are shown as one directory supernode, with weighted edges between the
+// visible nodes. See apps/worker/src/services/hierarchy.py.
+import type { DirectoryNode, GraphData, GraphEdge, GraphLevel, GraphNode } from "@/lib/types";
+
+/** Directories to expand so the view matches the worker's coarsest level. */
+export function coarsestExpansion(data: GraphData): Set<string> | null {
+  const level = data.levels?.[0];
+  if (!level || !data.directories) return null;
+  return new Set(data.directories.filter((dir) => dir.depth < level.depth).map((dir) => dir.id));
+}
+
+/** The node a file is shown as: its outermost collapsed ancestor, or the file itself. */
+function visibleId(path: string, expanded: Set<string>): string {
+  let end = path.indexOf("/");
+  while (end >= 0) {
+    const dirId = path.slice(0, end + 1);
+    if (!expanded.has(dirId)) return dirId;
+    end = path.indexOf("/", end + 1);
+  }
+  return path;
+}
+
+function dominantLanguage(dir: DirectoryNode): string {
+  let best = "";
+  let bestCount = -1;
+  for (const [language, count] of Object.entries(dir.languages)) {
+    if (count > bestCount) {
+      best = language;
+      bestCount = count;
+    }
+  }
+  return best;
+}
+
+/**
+ * The graph with every directory outside `expanded` collapsed. File nodes are
+ * the objects from `data.nodes`; directory nodes carry the aggregated lines.
+ * Edges touching a directory are aggregated with a `weight`; pass the
+ * worker's `level` when `expanded` came from it to reuse its edges.
+ */
+export function buildLevelView(data: GraphData, expanded: Set<string>, level?: GraphLevel): GraphData {
+  const directories = new Map((data.directories ?? []).map((dir) => [dir.id, dir]));
+  const mapping = new Map<string, string>();
+  const nodes: GraphNode[] = [];
+  const seen = new Set<string>();
+
+  for (const node of data.nodes) {
+    const id = visibleId(node.path ?? node.id, expanded);
+    mapping.set(node.id, id);
+    if (seen.has(id)) continue;
+    seen.add(id);
+
+    const dir = directories.get(id);
+    if (!dir) {
+      nodes.push(node);
+      continue;
+    }
+    nodes.push({
+      id: dir.id,
+      name: `${dir.name}/`,
+      path: dir.path,
+      type: "directory",
+      parent: dir.parent,
+      lines: dir.lines,
+      language: dominantLanguage(dir),
+      x: dir.x,
+      y: dir.y,
+      z: dir.z,
+    });
+  }
+
+  if (level) {
+    const levelEdges = level.edges.map((edge) => ({
+      ...edge,
+      type: directories.has(edge.source) || directories.has(edge.target) ? "aggregate" : "import",
+    }));
+    return { ...data, nodes, edges: levelEdges };
+  }
+
+  const edges: GraphEdge[] = [];
+  const weights = new Map<string, number>();
+  for (const edge of data.edges) {
+    const source = mapping.get(edge.source);
+    const target = mapping.get(edge.target);
+    if (!source || !target || source === target) continue;
+    if (source === edge.source && target === edge.target) {
+      edges.push(edge);
+      continue;
+    }
+    const key = `${source}\0${target}`;
+    weights.set(key, (weights.get(key) ?? 0) + 1);
+  }
+  weights.forEach((weight, key) => {
+    const [source, target] = key.split("\0");
+    edges.push({ source, target, type: "aggregate", weight });
+  });
+
+  return { ...data, nodes, edges };
+}
+
+/** `expanded` plus every ancestor directory of `path`, so the file itself is visible. */
+export function expandTo(path: string, expanded: Set<string>): Set<string> {
+  const next = new Set(expanded);
+  let end = path.indexOf("/");
+  while (end >= 0) {
+    next.add(path.slice(0, end + 1));
+    end = path.indexOf("/", end + 1);
+  }
+  return next;
+}
@@ -4,12 +4,14 @@ const QUEUE_NAME = 'codeviz:jobs';
 
 export interface JobPayload {
   jobId: string;
+  /** Force (true) or skip (false) worker profiling; omitted leaves it to sampling. */
+  profile?: boolean;
 }
 
-export async function enqueueJob(jobId: string): Promise<void> {
+export async function enqueueJob(jobId: string, options: { profile?: boolean } = {}): Promise<void> {
   const redis = createRedisClient();
   try {
-    const payload: JobPayload = { jobId };
+    const payload: JobPayload = { jobId, ...options };
     await redis.lpush(QUEUE_NAME, JSON.stringify(payload));
   } finally {
     await redis.quit();
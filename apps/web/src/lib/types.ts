@@ -26,7 +26,7 @@ export type UserPlanetsResponse = {
   };
 };
 
-export type JobStatus = "queued" | "running" | "done" | "failed" | "canceled";
+export type JobStatus = "queued" | "running" | "done" | "failed" | "canceled" | "timed_out";
 
 export type PostCard = {
   postId: string;
@@ -85,7 +85,7 @@ export type ProjectDetailResponse = {
       planet?: PlanetSummary | null;
       latestJob?: {
         id: string;
-        status: "queued" | "running" | "done" | "failed" | "canceled";
+        status: "queued" | "running" | "done" | "failed" | "canceled" | "timed_out";
         progress: number | null;
         message: string | null;
         result?: {
@@ -276,12 +276,68 @@ export type GraphNode = {
   lines?: number;
   language?: string;
   symbols?: SymbolInfo[];
+  // Precomputed layout position on the unit sphere, when the worker provides one.
+  x?: number;
+  y?: number;
+  z?: number;
+} & Partial<NodeMetrics>;
+
+// Per-file graph metrics computed by the worker (apps/worker/src/services/graph_analytics.py).
+export type NodeMetrics = {
+  inDegree: number;
+  outDegree: number;
+  // Import cycle the file belongs to (0 = largest), null if it is in none.
+  cycle: number | null;
+  // PageRank scaled so that the average file scores 1.
+  pageRank: number;
+  // 0 for files that import nothing, else one more than their highest import.
+  layer: number;
+};
+
+export type AnalyticsSummary = {
+  cycles: number;
+  filesInCycles: number;
+  largestCycle: number;
+  layers: number;
+  hubs: { id: string; pageRank: number; inDegree: number }[];
+};
+
+// A snapshot's metrics as columns aligned with `id` (opt-in on the worker).
+export type SnapshotAnalytics = { [K in keyof NodeMetrics]: NodeMetrics[K][] } & {
+  id: string[];
+  summary: AnalyticsSummary;
 };
 
 export type GraphEdge = {
   source: string;
   target: string;
   type: string;
+  // Number of file-level edges an edge between directory supernodes stands for.
+  weight?: number;
+};
+
+// Directory supernode; `id` is the directory path with a trailing "/".
+export type DirectoryNode = {
+  id: string;
+  name: string;
+  path: string;
+  type: "directory";
+  parent: string | null;
+  depth: number;
+  lines: number;
+  fileCount: number;
+  // Files per language.
+  languages: Record<string, number>;
+  x?: number;
+  y?: number;
+  z?: number;
+};
+
+// Files below `depth` collapsed into their ancestor directory at `depth`.
+export type GraphLevel = {
+  depth: number;
+  nodeCount: number;
+  edges: { source: string; target: string; weight: number }[];
 };
 
 export type CommitFile = {
@@ -303,13 +359,30 @@ export type SnapshotFile = {
   depends_on: { target: string; type: string }[];
 };
 
+export type SnapshotDelta = {
+  addedNodes: Record<string, Omit<SnapshotFile, "depends_on">>;
+  removedNodes: string[];
+  changedLines: Record<string, number>;
+  addedEdges: GraphEdge[];
+  removedEdges: GraphEdge[];
+};
+
 export type Snapshot = {
   hash: string;
   date: string;
   impact: number;
   files: Record<string, SnapshotFile>;
+  // Present on every snapshot after the first; relative to the previous one.
+  delta?: SnapshotDelta;
+  // Layout positions that are new or changed since the previous snapshot.
+  layout?: Record<string, LayoutPosition>;
+  // Every file's layout position, filled in by decodeGraph from `layout`.
+  positions?: Record<string, LayoutPosition>;
+  analytics?: SnapshotAnalytics;
 };
 
+export type LayoutPosition = [number, number, number];
+
 export type GraphStats = {
   nodeCount: number;
   edgeCount: number;
@@ -318,6 +391,9 @@ export type GraphStats = {
   totalLines: number;
   languages?: Record<string, number>;
   commitCount?: number;
+  analytics?: AnalyticsSummary;
+  sampled?: boolean;
+  sampledFrom?: number;
 };
 
 export type GraphData = {
@@ -326,6 +402,9 @@ export type GraphData = {
   history?: CommitInfo[];
   snapshots?: Snapshot[];
   stats?: GraphStats;
+  directories?: DirectoryNode[];
+  // Coarse levels, coarsest first; only for large repositories.
+  levels?: GraphLevel[];
   metadata?: {
     repoUrl: string;
     ref?: string | null;
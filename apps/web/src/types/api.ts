@@ -29,7 +29,7 @@ export interface UserProfile extends UserSummary {
 
 // Project types
 export type ProjectStatus = 'draft' | 'ready' | 'error';
-export type JobStatus = 'queued' | 'running' | 'done' | 'failed' | 'canceled';
+export type JobStatus = 'queued' | 'running' | 'done' | 'failed' | 'canceled' | 'timed_out';
 
 export interface AnalysisJobResult {
   resultUrl: string;
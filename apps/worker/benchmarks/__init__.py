@@ -0,0 +1 @@
+"""Offline benchmarks for the repository analyzer (see benchmarks/run.py)."""
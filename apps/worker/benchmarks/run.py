@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Stage-level analyzer benchmarks on synthetic repositories.
+
+Run from apps/worker (fully offline):
+
+    python -m benchmarks.run --files 2000 --commits 30 --output bench.json
+    python -m benchmarks.run --output bench.json --baseline baseline.json
+
+Each stage is timed separately over `--repeat` runs and reported as min and
+median wall time. With `--baseline`, stages whose median got slower than the
+baseline by more than `--tolerance` are reported as regressions and the exit
+status is 1.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from src.config import config
+
+# Benchmarks measure the analyzer itself, never a warm cache.
+config.ANALYSIS_CACHE_PATH = ""
+
+from src.services.graph_analytics import compute_analytics  # noqa: E402
+from src.services.graph_format import encode_graph  # noqa: E402
+from src.services.graph_model import FileGraph, FileRecord, PathTable  # noqa: E402
+from src.services.layout import layout_graphs  # noqa: E402
+from src.services.repo_analyzer import (  # noqa: E402
+    analyze_current_tree,
+    analyze_git_repository,
+    build_symbol_map,
+    get_git_history,
+    get_impactful_commits,
+)
+from src.services.s3 import iter_gzip_json  # noqa: E402
+
+from benchmarks.synthetic_repo import DEFAULT_LANGUAGES, default_spec, generate_repo  # noqa: E402
+
+
+def time_stage(fn: Callable[[], Any], repeat: int) -> tuple[dict[str, Any], Any]:
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    return {"min": min(runs), "median": statistics.median(runs), "runs": runs}, result
+
+
+def layout_case(nodes: int, seed: int = 0) -> list[FileGraph]:
+    """
+    A synthetic graph of `nodes` files with about three imports each, mostly
+    to nearby files and some to a few shared hub modules, and a next snapshot
+    in which 2% of the files changed their imports and 1% were added: the
+    cold and warm layouts of one job.
+    """
+    rng = random.Random(seed)
+    paths = PathTable()
+    names = [f"src/pkg{i // 50}/mod{i}.py" for i in range(nodes + nodes // 100)]
+    hubs = rng.sample(range(nodes), min(nodes, 20))
+
+    def record(index: int, count: int) -> FileRecord:
+        targets = {min(count - 1, max(0, index + int(rng.gauss(0, 40)))) for _ in range(3)}
+        if rng.random() < 0.5:
+            targets.add(rng.choice(hubs))
+        return FileRecord.from_dependencies(
+            "python", 100, [{"target": names[t]} for t in targets if t != index], paths
+        )
+
+    files = {names[i]: record(i, nodes) for i in range(nodes)}
+    changed = dict(files)
+    for i in rng.sample(range(nodes), nodes // 50):
+        changed[names[i]] = record(i, nodes)
+    for i in range(nodes, len(names)):
+        changed[names[i]] = record(i, len(names))
+    return [FileGraph.from_files(files, paths), FileGraph.from_files(changed, paths)]
+
+
+def run_benchmarks(repo_path: Path, repeat: int, layout_nodes: int) -> dict[str, Any]:
+    stages: dict[str, dict[str, Any]] = {}
+
+    def stage(name: str, fn: Callable[[], Any]) -> Any:
+        stages[name], result = time_stage(fn, repeat)
+        print(f"[Bench] {name:<26} median {stages[name]['median'] * 1000:9.1f} ms")
+        return result
+
+    commits = stage("get_impactful_commits", lambda: get_impactful_commits(repo_path))
+    symbol_map = stage("build_symbol_map", lambda: build_symbol_map(repo_path))
+    paths = PathTable()
+    files = stage("analyze_current_tree", lambda: analyze_current_tree(repo_path, paths))
+    file_graph = stage("build_graph", lambda: FileGraph.from_files(files, paths))
+    stage("compute_analytics", lambda: compute_analytics(file_graph))
+    stage("layout_graphs", lambda: layout_graphs([file_graph]))
+    # The largest graph the worker lays out, so the per-job layout cost at the cap is tracked.
+    layout_graphs_at_cap = layout_case(layout_nodes)
+    stage("layout_at_cap", lambda: layout_graphs(layout_graphs_at_cap))
+    stage("get_git_history", lambda: get_git_history(repo_path))
+    graph = stage("analyze_git_repository", lambda: analyze_git_repository(repo_path, str(repo_path), None))
+    payload = stage("serialization", lambda: b"".join(iter_gzip_json(encode_graph(graph))))
+
+    return {
+        "stages": stages,
+        "outputs": {
+            "symbols": len(symbol_map),
+            "files": len(files),
+            "nodes": file_graph.node_count,
+            "edges": file_graph.edge_count,
+            "snapshotCommits": len(commits),
+            "payloadBytes": len(payload),
+            "layoutNodes": layout_nodes,
+        },
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[dict[str, Any]]:
+    """Per-stage median ratios against a baseline; `regression` marks slowdowns beyond tolerance."""
+    rows = []
+    for name, timing in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base or base["median"] <= 0:
+            continue
+        ratio = timing["median"] / base["median"]
+        rows.append({
+            "stage": name,
+            "baseline": base["median"],
+            "current": timing["median"],
+            "ratio": ratio,
+            "regression": ratio > 1 + tolerance,
+        })
+    return rows
+
+
+def parse_languages(value: str) -> dict[str, float]:
+    """Parse "python=3,typescript=2" into a weight map."""
+    languages = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_LANGUAGES:
+            raise argparse.ArgumentTypeError(f"unknown language: {name}")
+        languages[name] = float(weight or 1)
+    return languages
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the repository analyzer on a synthetic repo.")
+    parser.add_argument("--files", type=int, help="number of source files (default 500)")
+    parser.add_argument("--commits", type=int, help="number of commits (default 20)")
+    parser.add_argument("--depth", type=int, help="directory depth (default 3)")
+    parser.add_argument("--import-density", type=float, help="mean imports per file (default 3)")
+    parser.add_argument("--languages", type=parse_languages, help="language weights, e.g. python=3,java=1")
+    parser.add_argument("--gradle-modules", type=int, help="gradle modules for java/kotlin (default 4)")
+    parser.add_argument("--seed", type=int, help="generator seed (default 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage (default 3)")
+    parser.add_argument(
+        "--layout-nodes",
+        type=int,
+        default=config.LAYOUT_MAX_NODES,
+        help="nodes of the synthetic layout_at_cap graph (default LAYOUT_MAX_NODES)",
+    )
+    parser.add_argument("--repo-dir", help="where to generate the repo (default: a temp dir)")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown ratio (default 0.2)")
+    args = parser.parse_args(argv)
+
+    spec = default_spec(
+        files=args.files,
+        commits=args.commits,
+        depth=args.depth,
+        import_density=args.import_density,
+        languages=args.languages,
+        gradle_modules=args.gradle_modules,
+        seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="codeviz_bench_") as temp_dir:
+        repo_path = Path(args.repo_dir or Path(temp_dir) / "repo")
+        start = time.perf_counter()
+        generate_repo(repo_path, spec)
+        print(f"[Bench] Generated {spec['files']} files / {spec['commits']} commits in {time.perf_counter() - start:.1f}s")
+
+        results = {
+            "spec": spec,
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "git": subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip(),
+            },
+            **run_benchmarks(repo_path, args.repeat, args.layout_nodes),
+        }
+
+    exit_code = 0
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline.get("spec") != spec:
+            print("[Bench] Warning: baseline was recorded with a different repo spec")
+        results["comparison"] = compare(results, baseline, args.tolerance)
+        for row in results["comparison"]:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"[Bench] {row['stage']:<26} x{row['ratio']:.2f} {flag}")
+        if any(row["regression"] for row in results["comparison"]):
+            exit_code = 1
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"[Bench] Results written to {args.output}")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Deterministic synthetic git repositories for analyzer benchmarks.
+
+A repository is described by a handful of knobs (file count, language mix,
+import density, directory depth, commit count) and a seed. The same spec
+always produces the same files, history and commit SHAs: content comes from a
+seeded RNG and commits are written through `git fast-import` with fixed
+timestamps. Imports are generated in the forms the analyzer resolves, so the
+dependency graph is realistic:
+
+- python: `import pkg.sub.module`
+- javascript/typescript: relative and `@/` specifiers
+- java/kotlin: `package` + fully qualified `import`
+- c/cpp: `#include "header.h"`
+- gradle: `settings.gradle` including per-module `build.gradle`
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any
+
+DEFAULT_LANGUAGES = {
+    "python": 3.0,
+    "typescript": 3.0,
+    "javascript": 1.0,
+    "java": 1.0,
+    "kotlin": 1.0,
+    "c": 1.0,
+    "cpp": 1.0,
+}
+
+# Languages whose files may import each other.
+FAMILIES = {
+    "python": "python",
+    "typescript": "js",
+    "javascript": "js",
+    "java": "jvm",
+    "kotlin": "jvm",
+    "c": "native",
+    "cpp": "native",
+}
+
+BASE_TIMESTAMP = 1_600_000_000
+COMMIT_INTERVAL = 6 * 3600
+
+
+def default_spec(**overrides: Any) -> dict[str, Any]:
+    """Benchmark repository spec with defaults filled in."""
+    spec: dict[str, Any] = {
+        "files": 500,
+        "commits": 20,
+        "depth": 3,
+        "import_density": 3.0,
+        "languages": dict(DEFAULT_LANGUAGES),
+        "gradle_modules": 4,
+        "seed": 0,
+    }
+    spec.update({key: value for key, value in overrides.items() if value is not None})
+    return spec
+
+
+class _Generator:
+    def __init__(self, spec: dict[str, Any]):
+        self.spec = spec
+        self.rnd = random.Random(spec["seed"])
+        self.dirs = self._make_dirs()
+        self.modules = [f"module{i}" for i in range(spec["gradle_modules"])]
+        # path -> (language, symbol used by importers)
+        self.files: dict[str, tuple[str, str]] = {}
+        self.contents: dict[str, str] = {}
+        # family -> paths other files can import (only headers for C/C++)
+        self.importable: dict[str, list[str]] = {}
+        self._serial = 0
+
+    def _make_dirs(self) -> list[str]:
+        dirs = [""]
+        frontier = [""]
+        for _level in range(self.spec["depth"]):
+            next_frontier = []
+            for parent in frontier:
+                for i in range(self.rnd.randint(2, 4)):
+                    child = f"{parent}/pkg{i}" if parent else f"pkg{i}"
+                    dirs.append(child)
+                    next_frontier.append(child)
+            frontier = next_frontier
+        return dirs
+
+    def _pick_language(self) -> str:
+        languages = self.spec["languages"]
+        names = sorted(languages)
+        return self.rnd.choices(names, weights=[languages[name] for name in names])[0]
+
+    def new_file(self) -> str:
+        language = self._pick_language()
+        self._serial += 1
+        n = self._serial
+        directory = self.rnd.choice(self.dirs)
+        if language in ("java", "kotlin") and self.modules:
+            module = self.rnd.choice(self.modules)
+            directory = f"{module}/src/main/{directory}".rstrip("/")
+
+        if language == "python":
+            path = f"{directory}/mod{n}.py"
+            symbol = path[:-3].lstrip("/").replace("/", ".")
+        elif language in ("typescript", "javascript"):
+            ext = self.rnd.choice([".ts", ".tsx"]) if language == "typescript" else self.rnd.choice([".js", ".jsx"])
+            path = f"src/{directory}/comp{n}{ext}"
+            symbol = path
+        elif language in ("java", "kotlin"):
+            ext = ".java" if language == "java" else ".kt"
+            path = f"{directory}/Class{n}{ext}"
+            package = "com.bench." + directory.split("/src/main", 1)[-1].strip("/").replace("/", ".")
+            symbol = f"{package.rstrip('.')}.Class{n}"
+        else:
+            ext = self.rnd.choice([".c", ".h"]) if language == "c" else self.rnd.choice([".cpp", ".hpp", ".cc"])
+            path = f"{directory}/unit{n}{ext}"
+            symbol = os.path.basename(path)
+
+        path = path.lstrip("/").replace("//", "/")
+        self.files[path] = (language, symbol)
+        if FAMILIES[language] != "native" or path.endswith((".h", ".hpp")):
+            self.importable.setdefault(FAMILIES[language], []).append(path)
+        self.contents[path] = self.render(path)
+        return path
+
+    def _import_line(self, path: str, target: str) -> str:
+        language, _symbol = self.files[path]
+        target_language, target_symbol = self.files[target]
+        if language == "python":
+            return f"import {target_symbol}"
+        if language in ("typescript", "javascript"):
+            stem = os.path.splitext(target)[0]
+            if self.rnd.random() < 0.3:
+                return f"import x from '@/{stem[len('src/'):]}'"
+            relative = os.path.relpath(stem, os.path.dirname(path) or ".").replace(os.sep, "/")
+            if not relative.startswith("."):
+                relative = f"./{relative}"
+            return f"import x from '{relative}'"
+        if language in ("java", "kotlin"):
+            return f"import {target_symbol}" + (";" if language == "java" else "")
+        return f'#include "{os.path.basename(target)}"'
+
+    def render(self, path: str) -> str:
+        language, symbol = self.files[path]
+        candidates = self.importable.get(FAMILIES[language], [])
+        count = int(self.rnd.expovariate(1 / self.spec["import_density"])) if self.spec["import_density"] > 0 else 0
+        count = min(len(candidates), count + 1)
+        targets = [target for target in self.rnd.sample(candidates, count) if target != path][:count - 1]
+
+        lines: list[str] = []
+        if language in ("java", "kotlin"):
+            package = symbol.rsplit(".", 1)[0]
+            lines.append(f"package {package}" + (";" if language == "java" else ""))
+        lines.extend(self._import_line(path, target) for target in targets)
+        for i in range(self.rnd.randint(10, 120)):
+            lines.append(f"// {language} line {i} {self.rnd.getrandbits(32):08x}")
+        return "\n".join(lines) + "\n"
+
+    def gradle_files(self) -> dict[str, str]:
+        if not self.modules:
+            return {}
+        files = {"settings.gradle": "".join(f"include ':{module}'\n" for module in self.modules)}
+        for module in self.modules:
+            files[f"{module}/build.gradle"] = "apply plugin: 'java'\n"
+        return files
+
+
+def _fast_import_stream(gen: _Generator) -> bytes:
+    spec = gen.spec
+    commits = max(1, spec["commits"])
+    total = spec["files"]
+    initial = max(1, total * 2 // 5) if commits > 1 else total
+    per_commit = (total - initial) // max(1, commits - 1)
+
+    out: list[bytes] = []
+
+    def data(payload: bytes) -> None:
+        out.append(f"data {len(payload)}\n".encode())
+        out.append(payload)
+        out.append(b"\n")
+
+    for index in range(commits):
+        changes: dict[str, str] = {}
+        if index == 0:
+            changes.update(gen.gradle_files())
+            for _ in range(initial):
+                path = gen.new_file()
+                changes[path] = gen.contents[path]
+        else:
+            count = per_commit if index < commits - 1 else total - len(gen.files)
+            for _ in range(max(0, count)):
+                path = gen.new_file()
+                changes[path] = gen.contents[path]
+            existing = sorted(gen.files)
+            for path in gen.rnd.sample(existing, min(len(existing), max(1, len(existing) // 20))):
+                gen.contents[path] = gen.render(path)
+                changes[path] = gen.contents[path]
+
+        timestamp = BASE_TIMESTAMP + index * COMMIT_INTERVAL
+        out.append(b"commit refs/heads/main\n")
+        out.append(f"mark :{index + 1}\n".encode())
+        out.append(f"author Bench <bench@example.com> {timestamp} +0000\n".encode())
+        out.append(f"committer Bench <bench@example.com> {timestamp} +0000\n".encode())
+        data(f"Synthetic commit {index}".encode())
+        if index:
+            out.append(f"from :{index}\n".encode())
+        for path, content in sorted(changes.items()):
+            out.append(f"M 100644 inline {path}\n".encode())
+            data(content.encode("utf-8"))
+        out.append(b"\n")
+
+    return b"".join(out)
+
+
+def generate_repo(target: Path, spec: dict[str, Any]) -> Path:
+    """Create (or recreate) a synthetic repository at `target` with a checked-out working tree."""
+    target = Path(target)
+    if target.exists():
+        shutil.rmtree(target)
+    target.mkdir(parents=True)
+
+    def git(*args: str, **kwargs: Any) -> subprocess.CompletedProcess:
+        return subprocess.run(["git", *args], cwd=target, check=True, capture_output=True, **kwargs)
+
+    git("init", "--quiet", "--initial-branch=main")
+    git("fast-import", "--quiet", "--done", input=_fast_import_stream(_Generator(spec)) + b"done\n")
+    git("reset", "--hard", "--quiet", "main")
+    return target
@@ -1,108 +1,406 @@
+import json
+import time
 import traceback
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Generator, Optional
 
-from src.services.db import get_job, update_job_status, update_project_status
-from src.services.s3 import upload_graph_json
-from src.services.repo_analyzer import analyze_repository
+from redis import Redis
 
+from src.config import config
+from src.services.db import ProgressWriter, get_job, get_job_status, update_job_status, update_project_status
+from src.services.graph_format import encode_graph
+from src.services.inflight import InflightRegistry, get_inflight_registry
+from src.services.job_control import CANCELED, TIMED_OUT, JobControl, JobInterrupted
+from src.services.metrics import JobMetrics, record_job, span
+from src.services.profiling import JobProfile, maybe_profile, should_profile
+from src.services.s3 import upload_graph_json, upload_job_artifact
+from src.services.repo_analyzer import analyze_git_repository, fetched_repository, resolve_remote_commit
+from src.services.result_index import ResultIndex, get_result_index
 
-def process_analysis_job(job_id: str) -> None:
+
+def process_analysis_job(job_id: str, attempt: int = 0, profile: Optional[bool] = None) -> None:
     """
-    Process an analysis job:
-    1. Load job from DB
-    2. Update status to 'running'
-    3. Clone and analyze the repository
-    4. Upload dependency graph to S3
-    5. Update job with result URL and stats
-    6. Update project status to 'ready'
+    Run an analysis job start to finish with per-stage instrumentation and
+    record its metrics.
+
+    `profile` is the payload's profiling flag; None leaves it to sampling.
     """
-    print(f"[Worker] Starting job: {job_id}")
+    job = AnalysisJob(job_id, attempt, profile)
+    with job.activate():
+        try:
+            if job.prepare():
+                job.fetch()
+                job.analyze()
+                job.publish()
+        except Exception as e:
+            job.fail(e)
+        finally:
+            job.close()
+            record_job(job.metrics)
 
-    try:
-        # Load job from DB
-        job = get_job(job_id)
+
+class AnalysisJob:
+    """
+    Process an analysis job in stages:
+    1. prepare: load the job from DB and update its status to 'running'
+       (finish right away if this repository commit was already analyzed,
+       or wait as a follower if the same repository is being analyzed)
+    2. fetch: clone the repository or update its mirror
+    3. analyze: analyze the repository (this does the real work)
+    4. publish: upload the dependency graph and any profiling artifacts to S3,
+       update the job with result URL and stats and the project to 'ready'
+
+    The stages may run on different threads (see src/jobs/pipeline.py), one
+    at a time, inside `activate()`. The in-flight lease is kept from prepare
+    until the upload is done, and the fetched repository until the analysis
+    is done. Once started, the job can be cancelled or run out of time (see
+    src/services/job_control.py); it then ends as 'canceled' or 'timed_out'
+    with partial stats.
+    """
+
+    def __init__(self, job_id: str, attempt: int = 0, profile: Optional[bool] = None):
+        self.job_id = job_id
+        self.attempt = attempt
+        self.requested_profile = profile
+        self.profile = should_profile(profile)
+        self.progress = ProgressWriter(job_id)
+        # Progress follows the analyzer's real stages and snapshot counters.
+        self.metrics = JobMetrics(self.progress.update)
+        self.control = JobControl(lambda: get_job_status(job_id) == CANCELED)
+
+        self.project_id: Optional[str] = None
+        self.repo_url: Optional[str] = None
+        self.ref: Optional[str] = None
+        self.result_index: Optional[ResultIndex] = None
+        self.registry: Optional[InflightRegistry] = None
+        self.repo_path: Optional[Path] = None
+        self.rev = "HEAD"
+        self.graph: Optional[dict[str, Any]] = None
+        self.job_profile: Optional[JobProfile] = None
+        self._lease = ExitStack()
+        self._repository = ExitStack()
+
+    @contextmanager
+    def activate(self) -> Generator["AnalysisJob", None, None]:
+        """Make this job's metrics and control current for the stage run in the body."""
+        with self.metrics.activate(), self.control.activate():
+            yield self
+
+    def payload(self) -> dict[str, Any]:
+        """The queue payload this job was received with."""
+        payload: dict[str, Any] = {"jobId": self.job_id, "attempt": self.attempt}
+        if self.requested_profile is not None:
+            payload["profile"] = self.requested_profile
+        return payload
+
+    def prepare(self) -> bool:
+        """Load the job and start it; False when it finished without an analysis of its own."""
+        print(f"[Worker] Starting job: {self.job_id}")
+        job = get_job(self.job_id)
         if not job:
-            print(f"[Worker] Job not found: {job_id}")
-            return
+            print(f"[Worker] Job not found: {self.job_id}")
+            self.metrics.outcome = "missing"
+            return False
+        if job["status"] == CANCELED:
+            print(f"[Worker] Job was cancelled before it started: {self.job_id}")
+            self.metrics.outcome = CANCELED
+            return False
 
-        project_id = job["project_id"]
-        repo_url = job["repo_url"]
-        ref = job.get("ref")
+        self.project_id = job["project_id"]
+        self.repo_url = job["repo_url"]
+        self.ref = job.get("ref")
+        self.control.start()
 
         # Update status to running
-        update_job_status(
-            job_id,
-            status="running",
-            progress=0.0,
-            message="Starting analysis..."
-        )
+        self.progress.update(0.0, "Starting analysis...")
 
-        # Clone repository
-        update_job_status(
-            job_id,
-            status="running",
-            progress=0.1,
-            message="Cloning repository..."
-        )
+        # Reuse an existing result for the same repository commit
+        self.result_index = get_result_index()
+        if self.result_index is not None:
+            reused = lookup_result(self.result_index, self.repo_url, self.ref)
+            if reused:
+                self.progress.finish(
+                    "done",
+                    progress=1.0,
+                    message="Analysis complete",
+                    result_url=reused["resultUrl"],
+                    stats_json=reused["stats"]
+                )
+                update_project_status(self.project_id, "ready")
+                self.metrics.outcome = "reused"
+                print(f"[Worker] Job completed from existing result: {self.job_id}")
+                return False
 
-        # Analyze repository (this does the real work)
-        update_job_status(
-            job_id,
-            status="running",
-            progress=0.3,
-            message="Analyzing code structure..."
-        )
+        # Attach to an identical analysis that is already running
+        registry = get_inflight_registry()
+        if registry is not None:
+            try:
+                leader_id = registry.claim(self.repo_url, self.ref, self.job_id, self.attempt)
+            except Exception as e:
+                print(f"[Worker] In-flight registry unavailable, analyzing alone: {e}")
+                registry = leader_id = None
+            if leader_id:
+                self.progress.finish("running", message="Waiting for an identical analysis in progress...")
+                self.metrics.outcome = "followed"
+                print(f"[Worker] Job {self.job_id} follows in-flight job {leader_id}")
+                return False
 
-        graph = analyze_repository(repo_url, ref)
-        graph["metadata"]["analyzedAt"] = datetime.now(timezone.utc).isoformat()
+        if registry is not None:
+            self._lease.enter_context(registry.lease_kept(self.repo_url, self.ref, self.job_id))
+        self.registry = registry
+        return True
 
-        # Extract stats
-        stats = graph.get("stats", {})
+    def fetch(self) -> None:
+        """Clone the repository or update its mirror; kept until the analysis is done."""
+        self.repo_path, self.rev = self._repository.enter_context(fetched_repository(self.repo_url, self.ref))
 
-        update_job_status(
-            job_id,
-            status="running",
-            progress=0.8,
-            message="Uploading results..."
-        )
+    def analyze(self) -> None:
+        self.control.check()
+        try:
+            with maybe_profile(self.profile) as job_profile:
+                self.graph = analyze_git_repository(self.repo_path, self.repo_url, self.ref, self.rev)
+            self.job_profile = job_profile
+        finally:
+            self._repository.close()
+        self.graph["metadata"]["analyzedAt"] = datetime.now(timezone.utc).isoformat()
+
+    def publish(self) -> None:
+        self.control.check()
+        # Extract stats
+        stats = self.graph.get("stats", {})
+        commit = self.graph["metadata"].get("commit")
 
         # Upload to S3
-        result_url = upload_graph_json(job_id, graph)
+        try:
+            with span("upload"):
+                result_url = upload_graph_json(self.job_id, encode_graph(self.graph))
+        finally:
+            self._lease.close()
+        self.graph = None
+
+        job_stats = {**stats, "timings": self.metrics.to_stats()}
+        if self.job_profile is not None:
+            job_stats["profile"] = upload_profile(self.job_id, self.job_profile)
 
         # Mark job as done
-        update_job_status(
-            job_id,
-            status="done",
+        self.metrics.outcome = "done"
+        self.progress.finish(
+            "done",
             progress=1.0,
             message="Analysis complete",
             result_url=result_url,
-            stats_json=stats
+            stats_json=job_stats
         )
 
         # Update project status to ready
-        update_project_status(project_id, "ready")
+        update_project_status(self.project_id, "ready")
+
+        if self.result_index is not None and commit:
+            try:
+                self.result_index.put(self.repo_url, commit, result_url, stats)
+            except Exception as e:
+                print(f"[Worker] Could not record result for reuse: {e}")
 
-        print(f"[Worker] Job completed: {job_id}")
+        if self.registry is not None:
+            try:
+                complete_followers(self.registry.release(self.repo_url, self.ref, self.job_id), result_url, stats)
+            except Exception as e:
+                print(f"[Worker] Could not hand off followers of {self.job_id}: {e}")
+
+        print(f"[Worker] Job completed: {self.job_id}")
         print(f"[Worker] Result URL: {result_url}")
         print(f"[Worker] Stats: {stats}")
 
-    except Exception as e:
-        error_msg = f"{type(e).__name__}: {str(e)}"
-        print(f"[Worker] Job failed: {job_id}")
+    def fail(self, error: Exception) -> None:
+        """Mark the job failed after a stage raised `error`, or interrupted if that is why it raised."""
+        interruption = error if isinstance(error, JobInterrupted) else self.control.error()
+        if interruption is not None:
+            self.interrupted(interruption)
+            return
+
+        error_msg = f"{type(error).__name__}: {str(error)}"
+        print(f"[Worker] Job failed: {self.job_id}")
         print(f"[Worker] Error: {error_msg}")
-        traceback.print_exc()
+        traceback.print_exception(error)
 
-        # Mark job as failed
-        update_job_status(
-            job_id,
-            status="failed",
-            error_message=error_msg
-        )
+        self.close()
+        self.graph = None
+        self.progress.cancel()
+        mark_job_failed(self.job_id, error_msg)
+
+    def interrupted(self, interruption: JobInterrupted) -> None:
+        """End a cancelled or timed out job with the stats gathered so far."""
+        print(f"[Worker] Job {interruption.status}: {self.job_id} ({interruption})")
+        self.close()
+        self.graph = None
+        self.progress.cancel()
+        self.metrics.outcome = interruption.status
+
+        partial_stats: dict[str, Any] = {"timings": self.metrics.to_stats()}
+        if self.metrics.position is not None:
+            stage, done, total = self.metrics.position
+            partial_stats["interrupted"] = {"stage": stage, "done": done, "total": total}
+        mark_job_failed(self.job_id, str(interruption), status=interruption.status, stats_json=partial_stats)
+
+    def requeue(self, redis_client: Redis) -> None:
+        """
+        Put a job that was fetched but not analyzed back on the queue, with the
+        followers it gathered; they are pushed to the consuming end, the job
+        last, so it runs next and leads them again.
+        """
+        self.control.check()
+        self.close()
+        self.progress.finish("queued", progress=0.0, message="Waiting for a worker...")
+        followers = []
+        if self.registry is not None:
+            followers = self.registry.release(self.repo_url, self.ref, self.job_id)
+        for payload in [*followers, self.payload()]:
+            redis_client.rpush(config.QUEUE_NAME, json.dumps(payload))
+        self.metrics.outcome = "requeued"
+        print(f"[Worker] Requeued job {self.job_id}")
 
-        # Update project status to error
+    def close(self) -> None:
+        """Release the fetched repository and the in-flight lease, if still held."""
+        self.control.stop()
+        self._repository.close()
+        self._lease.close()
+
+
+def upload_profile(job_id: str, job_profile: JobProfile) -> dict[str, Any]:
+    """Store a job's profile and allocation report next to its graph.json; returns their keys."""
+    try:
+        keys = {
+            "profileKey": upload_job_artifact(
+                job_id, "profile.prof", job_profile.prof_bytes(), "application/octet-stream"
+            ),
+            "allocationsKey": upload_job_artifact(
+                job_id, "allocations.txt", job_profile.report().encode("utf-8"), "text/plain; charset=utf-8"
+            ),
+        }
+        print(f"[Worker] Profile of {job_id} uploaded: {keys['profileKey']}")
+        return keys
+    except Exception as e:
+        # Profiling is diagnostics only; never fail the analysis over it.
+        print(f"[Worker] Could not upload profile of {job_id}: {e}")
+        return {"error": str(e)}
+
+
+def lookup_result(result_index: ResultIndex, repo_url: str, ref: Optional[str]) -> Optional[dict]:
+    """Find an earlier result for the commit `ref` currently points to."""
+    try:
+        commit = resolve_remote_commit(repo_url, ref)
+        return result_index.get(repo_url, commit) if commit else None
+    except Exception as e:
+        print(f"[Worker] Result lookup failed: {e}")
+        return None
+
+
+def complete_followers(followers: list[dict[str, Any]], result_url: str, stats: dict) -> None:
+    """Give jobs that waited on this analysis its result."""
+    for follower in followers:
+        follower_id = follower["jobId"]
+        try:
+            update_job_status(
+                follower_id,
+                status="done",
+                progress=1.0,
+                message="Analysis complete",
+                result_url=result_url,
+                stats_json=stats
+            )
+            follower_job = get_job(follower_id)
+            if follower_job:
+                update_project_status(follower_job["project_id"], "ready")
+            print(f"[Worker] Follower job completed: {follower_id}")
+        except Exception as e:
+            print(f"[Worker] Could not complete follower job {follower_id}: {e}")
+
+
+def retry_followers(
+    registry: InflightRegistry,
+    followers: list[dict[str, Any]],
+    error_msg: str,
+    count_attempt: bool = True,
+) -> None:
+    """
+    Requeue jobs that waited on a failed analysis, failing those out of retries.
+
+    With `count_attempt` False (the leader was cancelled or timed out, which
+    says nothing about the followers) the retry does not use up an attempt.
+    """
+    for follower in followers:
+        follower_id = follower["jobId"]
+        attempt = follower.get("attempt", 0) + (1 if count_attempt else 0)
+        try:
+            if attempt > config.INFLIGHT_MAX_RETRIES:
+                mark_job_failed(follower_id, error_msg)
+                continue
+            update_job_status(follower_id, status="queued", message="Retrying analysis...")
+            registry.requeue(follower_id, attempt)
+            print(f"[Worker] Requeued follower job {follower_id} (attempt {attempt})")
+        except Exception as e:
+            print(f"[Worker] Could not retry follower job {follower_id}: {e}")
+
+
+def mark_job_failed(
+    job_id: str,
+    error_msg: str,
+    status: str = "failed",
+    stats_json: Optional[dict] = None,
+) -> None:
+    """
+    Mark a job as failed (or `status`, e.g. 'timed_out'), its project as
+    errored unless the job was cancelled, and retry any jobs waiting on it.
+    """
+    update_job_status(
+        job_id,
+        status=status,
+        stats_json=stats_json,
+        error_message=error_msg
+    )
+
+    # Update project status to error
+    try:
+        job = get_job(job_id)
+        if job and status != CANCELED:
+            update_project_status(job["project_id"], "error")
+    except Exception:
+        job = None
+
+    registry = get_inflight_registry()
+    if job and registry is not None:
         try:
-            job = get_job(job_id)
-            if job:
-                update_project_status(job["project_id"], "error")
-        except Exception:
-            pass
+            retry_followers(
+                registry,
+                registry.release(job["repo_url"], job.get("ref"), job_id),
+                error_msg,
+                count_attempt=status not in (CANCELED, TIMED_OUT),
+            )
+        except Exception as e:
+            print(f"[Worker] Could not hand off followers of {job_id}: {e}")
+
+
+_next_orphan_check = 0.0
+
+
+def retry_orphaned_followers() -> None:
+    """
+    Retry jobs left waiting on a leader that died without releasing its lease.
+    Checks Redis at most once per INFLIGHT_LEASE seconds.
+    """
+    global _next_orphan_check
+    registry = get_inflight_registry()
+    if registry is None or time.monotonic() < _next_orphan_check:
+        return
+    _next_orphan_check = time.monotonic() + config.INFLIGHT_LEASE
+
+    try:
+        followers = registry.orphaned_followers()
+    except Exception as e:
+        print(f"[Worker] Could not check for orphaned followers: {e}")
+        return
+    if followers:
+        print(f"[Worker] Retrying {len(followers)} job(s) whose in-flight analysis was lost")
+        retry_followers(registry, followers, "WorkerCrashed: the analysis this job waited for was lost")
@@ -0,0 +1,244 @@
+"""
+Pipelined job loop: fetch, analyze and publish stages connected by queues.
+
+Cloning and uploading are network-bound while the analysis is CPU-bound, so
+each runs in its own stage and the three overlap across consecutive jobs:
+
+- fetch (thread): pulls the next job from Redis, prepares it and clones the
+  repository (or updates its mirror). It only pulls a job while fewer than
+  PIPELINE_PREFETCH fetched jobs wait for analysis, so the worker looks ahead
+  by that many jobs and never hoards the queue. Jobs that need no analysis of
+  their own (reused results, followers) finish right here.
+- analyze (the calling thread): analyzes one job at a time, exactly as the
+  sequential loop does, so per-node CPU use does not grow.
+- publish (thread): uploads graph.json and records the result. Analysis
+  blocks while PIPELINE_PUBLISH_QUEUE analyzed graphs wait for it, which
+  bounds the memory held by finished graphs.
+
+A job's deadline clock is paused while it waits between stages, and a job
+cancelled while it waits ends when its next stage starts. While a profiled
+job is analyzed the other stages wait, so tracemalloc (which traces the
+whole process) only sees that job's allocations.
+
+On shutdown the fetch stage stops pulling jobs, fetched jobs that were not
+analyzed yet are requeued, and the job being analyzed and the pending uploads
+are finished before the loop returns.
+"""
+
+from __future__ import annotations
+
+import json
+import queue
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Generator, Optional
+
+from redis import Redis
+
+from src.config import config
+from src.jobs.analyze import AnalysisJob, retry_orphaned_followers
+from src.services.metrics import record_job
+
+
+class _StageGate:
+    """Shared/exclusive lock; a waiting exclusive holder blocks new shared ones."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self) -> Generator[None, None, None]:
+        with self._cond:
+            self._cond.wait_for(lambda: not self._exclusive and not self._waiting)
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._shared -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Generator[None, None, None]:
+        with self._cond:
+            self._waiting += 1
+            self._cond.wait_for(lambda: not self._exclusive and not self._shared)
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._exclusive = False
+                self._cond.notify_all()
+
+
+class JobPipeline:
+    """Fetch/analyze/publish stages for the jobs of one worker process."""
+
+    def __init__(
+        self,
+        should_stop: Callable[[], bool],
+        on_jobs_changed: Optional[Callable[[list[str]], None]] = None,
+    ):
+        self.should_stop = should_stop
+        self.on_jobs_changed = on_jobs_changed
+        self.redis = Redis.from_url(config.REDIS_URL)
+        # Free prefetch places; the fetch stage takes one before pulling a job.
+        self._prefetch = threading.Semaphore(max(1, config.PIPELINE_PREFETCH))
+        # None marks the end of a stage's input.
+        self._fetched: queue.Queue[Optional[AnalysisJob]] = queue.Queue()
+        self._analyzed: queue.Queue[Optional[AnalysisJob]] = queue.Queue(max(1, config.PIPELINE_PUBLISH_QUEUE))
+        self._jobs_lock = threading.Lock()
+        # Fetch and publish work under it shared; a profiled analysis takes it
+        # exclusively and so runs alone.
+        self._gate = _StageGate()
+        self._jobs: list[str] = []
+
+    def run(self) -> None:
+        """Run the stages until shutdown is requested and in-flight jobs are settled."""
+        fetcher = threading.Thread(target=self._fetch_stage, name="codeviz-fetch", daemon=True)
+        publisher = threading.Thread(target=self._publish_stage, name="codeviz-publish", daemon=True)
+        fetcher.start()
+        publisher.start()
+        try:
+            self._analyze_stage()
+        finally:
+            self._analyzed.put(None)
+            publisher.join()
+            fetcher.join()
+            self.redis.close()
+
+    def _fetch_stage(self) -> None:
+        try:
+            while not self.should_stop():
+                if not self._prefetch.acquire(timeout=1):
+                    continue
+                handed_over = False
+                try:
+                    job = self._receive()
+                    if job is not None and self._fetch_exclusive(job):
+                        self._fetched.put(job)
+                        handed_over = True
+                except Exception as e:
+                    print(f"[Worker] Error fetching job: {e}")
+                finally:
+                    if not handed_over:
+                        self._prefetch.release()
+        finally:
+            self._fetched.put(None)
+
+    def _receive(self) -> Optional[AnalysisJob]:
+        retry_orphaned_followers()
+        # BRPOP blocks for up to 5 seconds waiting for a job
+        result = self.redis.brpop(config.QUEUE_NAME, timeout=5)
+        if result is None:
+            return None
+
+        _, payload_bytes = result
+        payload = json.loads(payload_bytes.decode("utf-8"))
+        job_id = payload.get("jobId")
+        if not job_id:
+            print("[Worker] Invalid job payload, missing jobId")
+            return None
+
+        print(f"[Worker] Received job: {job_id}")
+        self._track(job_id)
+        return AnalysisJob(job_id, payload.get("attempt", 0), payload.get("profile"))
+
+    def _fetch_exclusive(self, job: AnalysisJob) -> bool:
+        with self._gate.shared():
+            return self._fetch(job)
+
+    def _fetch(self, job: AnalysisJob) -> bool:
+        """Prepare and fetch `job`; True when it goes on to the analysis."""
+        with job.activate():
+            try:
+                if job.prepare():
+                    job.fetch()
+                    job.progress.update(message="Waiting for analysis...")
+                    job.control.pause()
+                    return True
+            except Exception as e:
+                self._fail(job, e)
+                return False
+        self._settle(job)
+        return False
+
+    def _analyze_stage(self) -> None:
+        while True:
+            job = self._fetched.get()
+            if job is None:
+                return
+            self._prefetch.release()
+            job.control.resume()
+
+            if self.should_stop():
+                self._requeue(job)
+                continue
+
+            with self._gate.exclusive() if job.profile else nullcontext(), job.activate():
+                try:
+                    job.analyze()
+                except Exception as e:
+                    self._fail(job, e)
+                    continue
+            # Blocks while the publish stage is PIPELINE_PUBLISH_QUEUE jobs behind.
+            job.control.pause()
+            self._analyzed.put(job)
+
+    def _publish_stage(self) -> None:
+        while True:
+            job = self._analyzed.get()
+            if job is None:
+                return
+            job.control.resume()
+            with self._gate.shared(), job.activate():
+                try:
+                    job.publish()
+                except Exception as e:
+                    self._fail(job, e)
+                    continue
+            self._settle(job)
+
+    def _requeue(self, job: AnalysisJob) -> None:
+        try:
+            job.requeue(self.redis)
+        except Exception as e:
+            self._fail(job, e)
+            return
+        self._settle(job)
+
+    def _fail(self, job: AnalysisJob, error: Exception) -> None:
+        try:
+            job.fail(error)
+        except Exception as e:
+            print(f"[Worker] Could not mark job {job.job_id} as failed: {e}")
+        self._settle(job)
+
+    def _settle(self, job: AnalysisJob) -> None:
+        """End of a job's way through the pipeline, whichever stage it ended in."""
+        try:
+            job.close()
+            record_job(job.metrics)
+        except Exception as e:
+            print(f"[Worker] Error settling job {job.job_id}: {e}")
+        finally:
+            self._untrack(job.job_id)
+
+    def _track(self, job_id: str) -> None:
+        with self._jobs_lock:
+            self._jobs.append(job_id)
+            self._publish_jobs()
+
+    def _untrack(self, job_id: str) -> None:
+        with self._jobs_lock:
+            self._jobs.remove(job_id)
+            self._publish_jobs()
+
+    def _publish_jobs(self) -> None:
+        if self.on_jobs_changed is not None:
+            self.on_jobs_changed(list(self._jobs))
@@ -0,0 +1,139 @@
+"""
+Persistent per-file analysis cache.
+
+Results are content-addressed: the key is the git blob SHA of the file plus
+the identity/version of the extractor that produced them, so an entry stays
+valid across snapshots and across jobs for the same (or a forked) repository.
+Entries are evicted least-recently-used once the cache grows past its bound.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+from src.config import config
+
+
+class AnalysisCache:
+    """SQLite-backed (blob_sha, extractor) -> file facts store with LRU eviction."""
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # The cache is shared between worker processes, hence WAL + busy timeout.
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_facts (
+                blob_sha TEXT NOT NULL,
+                extractor TEXT NOT NULL,
+                facts TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (blob_sha, extractor)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS file_facts_last_used ON file_facts (last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys: Iterable[tuple[str, str]]) -> dict[tuple[str, str], dict[str, Any]]:
+        """Look up several keys at once and bump their recency."""
+        keys = list(keys)
+        found: dict[tuple[str, str], dict[str, Any]] = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            cur = self._conn.cursor()
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(keys), 400):
+                chunk = keys[start:start + 400]
+                clause = " OR ".join(["(blob_sha = ? AND extractor = ?)"] * len(chunk))
+                params = [value for key in chunk for value in key]
+                cur.execute(f"SELECT blob_sha, extractor, facts FROM file_facts WHERE {clause}", params)
+                for blob_sha, extractor, facts in cur.fetchall():
+                    found[(blob_sha, extractor)] = json.loads(facts)
+
+            if found:
+                now = time.time()
+                cur.executemany(
+                    "UPDATE file_facts SET last_used = ? WHERE blob_sha = ? AND extractor = ?",
+                    [(now, blob_sha, extractor) for blob_sha, extractor in found],
+                )
+                self._conn.commit()
+
+        return found
+
+    def put_many(self, items: dict[tuple[str, str], dict[str, Any]]) -> None:
+        """Store freshly extracted facts, evicting old entries when over the bound."""
+        if not items:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO file_facts (blob_sha, extractor, facts, last_used) VALUES (?, ?, ?, ?)",
+                [
+                    (blob_sha, extractor, json.dumps(facts, separators=(",", ":")), now)
+                    for (blob_sha, extractor), facts in items.items()
+                ],
+            )
+            self._conn.commit()
+
+            self._writes_since_evict += len(items)
+            if self._writes_since_evict >= 1000:
+                self._writes_since_evict = 0
+                self._evict()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM file_facts").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+
+        self._conn.execute(
+            """
+            DELETE FROM file_facts WHERE rowid IN (
+                SELECT rowid FROM file_facts ORDER BY last_used ASC LIMIT ?
+            )
+            """,
+            (excess,),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[AnalysisCache] = None
+
+
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """Return the process-wide cache, or None when caching is disabled."""
+    global _cache
+    if not config.ANALYSIS_CACHE_PATH:
+        return None
+
+    if _cache is None:
+        try:
+            _cache = AnalysisCache(config.ANALYSIS_CACHE_PATH, config.ANALYSIS_CACHE_MAX_ENTRIES)
+        except Exception as e:
+            print(f"[Cache] Analysis cache unavailable: {e}")
+            return None
+
+    return _cache
@@ -1,19 +1,92 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from contextlib import contextmanager
 from typing import Generator, Any, Optional
 import json
+import os
+import threading
+import time
 
 from src.config import config
 
 
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises instead of waiting when it is exhausted; borrowers
+# take a slot first so that fetch, analysis, publish and progress threads queue up.
+_pool_slots: Optional[threading.BoundedSemaphore] = None
+_last_used: dict[int, float] = {}
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    """Return this process's connection pool, creating it on first use."""
+    global _pool, _pool_pid, _pool_slots
+    with _pool_lock:
+        # Never share sockets with a forked parent; each process gets its own pool.
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadedConnectionPool(config.DB_POOL_MIN, config.DB_POOL_MAX, config.DATABASE_URL)
+            _pool_pid = os.getpid()
+            _pool_slots = threading.BoundedSemaphore(config.DB_POOL_MAX)
+            _last_used.clear()
+        return _pool
+
+
+def _is_healthy(conn: psycopg2.extensions.connection) -> bool:
+    """Check a pooled connection that has been idle longer than the health check interval."""
+    if conn.closed:
+        return False
+    last_used = _last_used.get(id(conn))
+    if last_used is None:
+        # Freshly opened by the pool.
+        _last_used[id(conn)] = time.monotonic()
+        return True
+    if time.monotonic() - last_used < config.DB_HEALTHCHECK_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
 @contextmanager
 def get_db_connection() -> Generator[psycopg2.extensions.connection, None, None]:
-    conn = psycopg2.connect(config.DATABASE_URL)
+    pool = _get_pool()
+    slots = _pool_slots
+    slots.acquire()
     try:
-        yield conn
+        conn = pool.getconn()
+        if not _is_healthy(conn):
+            # Reconnect: drop the dead connection and let the pool open a fresh one.
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+            _last_used[id(conn)] = time.monotonic()
+
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            close = broken or bool(conn.closed)
+            if close:
+                _last_used.pop(id(conn), None)
+            else:
+                _last_used[id(conn)] = time.monotonic()
+            pool.putconn(conn, close=close)
     finally:
-        conn.close()
+        slots.release()
 
 
 def get_job(job_id: str) -> Optional[dict]:
@@ -33,6 +106,15 @@ def get_job(job_id: str) -> Optional[dict]:
             return dict(row) if row else None
 
 
+def get_job_status(job_id: str) -> Optional[str]:
+    """Fetch only a job's status, e.g. to notice that it was cancelled."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT status FROM analysis_jobs WHERE id = %s", (job_id,))
+            row = cur.fetchone()
+            return row[0] if row else None
+
+
 def update_job_status(
     job_id: str,
     status: str,
@@ -42,7 +124,7 @@ def update_job_status(
     stats_json: Optional[dict] = None,
     error_message: Optional[str] = None
 ) -> None:
-    """Update job status in the database."""
+    """Update job status in the database. A cancelled job stays cancelled."""
     with get_db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
@@ -56,7 +138,7 @@ def update_job_status(
                     stats_json = COALESCE(%s, stats_json),
                     error_message = COALESCE(%s, error_message),
                     updated_at = NOW()
-                WHERE id = %s
+                WHERE id = %s AND (status <> 'canceled' OR %s = 'canceled')
                 """,
                 (
                     status,
@@ -65,7 +147,8 @@ def update_job_status(
                     result_url,
                     json.dumps(stats_json) if stats_json else None,
                     error_message,
-                    job_id
+                    job_id,
+                    status
                 )
             )
             conn.commit()
@@ -84,3 +167,74 @@ def update_project_status(project_id: str, status: str) -> None:
                 (status, project_id)
             )
             conn.commit()
+
+
+class ProgressWriter:
+    """
+    Coalesce a running job's progress/message updates.
+
+    The first update is written immediately; later ones are merged and written
+    at most once per PROGRESS_FLUSH_INTERVAL (a timer flushes the last pending
+    value). Terminal states go through finish() and are written immediately.
+    """
+
+    def __init__(self, job_id: str, interval: Optional[float] = None):
+        self.job_id = job_id
+        self.interval = config.PROGRESS_FLUSH_INTERVAL if interval is None else interval
+        self._lock = threading.Lock()
+        self._pending: dict[str, Any] = {}
+        self._last_flush: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    def update(self, progress: Optional[float] = None, message: Optional[str] = None) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            if progress is not None:
+                self._pending["progress"] = progress
+            if message is not None:
+                self._pending["message"] = message
+
+            elapsed = None if self._last_flush is None else time.monotonic() - self._last_flush
+            if elapsed is None or elapsed >= self.interval:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.interval - elapsed, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._closed:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self._last_flush = time.monotonic()
+        update_job_status(self.job_id, status="running", **pending)
+
+    def finish(self, status: str, **fields: Any) -> None:
+        """Write a terminal state immediately; pending progress is folded into it."""
+        with self._lock:
+            self._cancel_locked()
+            fields = {**self._pending, **fields}
+            self._pending = {}
+            update_job_status(self.job_id, status=status, **fields)
+
+    def cancel(self) -> None:
+        """Drop pending updates without writing them (e.g. before marking a failure)."""
+        with self._lock:
+            self._cancel_locked()
+            self._pending = {}
+
+    def _cancel_locked(self) -> None:
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
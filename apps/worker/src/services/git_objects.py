@@ -0,0 +1,189 @@
+"""
+Read repository snapshots straight from the git object database.
+
+Trees are listed with `git ls-tree -r` and blob contents are streamed through a
+single long-lived `git cat-file --batch` process, so analyzing a historical
+commit never has to rewrite a working tree.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import threading
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from src.services.job_control import checkpoint, run_process, tracked
+
+
+def list_tree_blobs(repo_path: Path, rev: str = "HEAD") -> dict[str, str]:
+    """Map every regular file in a commit's tree to its blob SHA."""
+    result = run_process(
+        ["git", "ls-tree", "-r", "-z", rev],
+        cwd=repo_path,
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        return {}
+
+    blobs: dict[str, str] = {}
+    for entry in result.stdout.decode("utf-8", errors="surrogateescape").split("\0"):
+        if not entry:
+            continue
+        meta, path = entry.split("\t", 1)
+        mode, obj_type, sha = meta.split(" ")
+        # Skip submodules (commit entries) and symlinks (blob holds the link target).
+        if obj_type == "blob" and mode != "120000":
+            blobs[path] = sha
+    return blobs
+
+
+def list_tree_blob_sizes(repo_path: Path, rev: str = "HEAD") -> dict[str, tuple[str, int]]:
+    """Like list_tree_blobs, but map each path to (blob SHA, size in bytes)."""
+    result = run_process(
+        ["git", "ls-tree", "-r", "-l", "-z", rev],
+        cwd=repo_path,
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        return {}
+
+    blobs: dict[str, tuple[str, int]] = {}
+    for entry in result.stdout.decode("utf-8", errors="surrogateescape").split("\0"):
+        if not entry:
+            continue
+        meta, path = entry.split("\t", 1)
+        mode, obj_type, sha, size = meta.split()
+        if obj_type == "blob" and mode != "120000":
+            blobs[path] = (sha, int(size))
+    return blobs
+
+
+def list_modified_paths(repo_path: Path) -> Optional[set[str]]:
+    """
+    Tracked paths whose working-tree or index content differs from HEAD,
+    per `git status`, or None if git fails.
+    """
+    result = run_process(
+        ["git", "status", "--porcelain", "-z", "--untracked-files=no", "--no-renames"],
+        cwd=repo_path,
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        return None
+
+    # Entries are "XY <path>"; with --no-renames each entry names a single path.
+    return {
+        entry[3:]
+        for entry in result.stdout.decode("utf-8", errors="surrogateescape").split("\0")
+        if len(entry) > 3
+    }
+
+
+def read_blob_sizes(repo_path: Path, shas: Iterable[str]) -> dict[str, int]:
+    """Sizes of the given blobs from `git cat-file --batch-check`; missing ones are left out."""
+    shas = list(dict.fromkeys(shas))
+    if not shas:
+        return {}
+    result = run_process(
+        ["git", "cat-file", "--batch-check"],
+        cwd=repo_path,
+        input="".join(f"{sha}\n" for sha in shas).encode(),
+        capture_output=True,
+    )
+    sizes: dict[str, int] = {}
+    for line in result.stdout.decode().splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[1] != "missing":
+            sizes[parts[0]] = int(parts[2])
+    return sizes
+
+
+class GitObjectReader:
+    """Stream blob contents from a long-lived `git cat-file --batch` process."""
+
+    def __init__(self, repo_path: Path):
+        self._lock = threading.Lock()
+        self._proc = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        # Killed with the rest of the job's git processes if it is interrupted.
+        self._tracking = ExitStack()
+        self._tracking.enter_context(tracked(self._proc))
+
+    def __enter__(self) -> "GitObjectReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _read_response(self) -> Optional[bytes]:
+        header = self._proc.stdout.readline()
+        if not header:
+            checkpoint()
+            raise RuntimeError("git cat-file exited unexpectedly")
+
+        parts = header.split()
+        if len(parts) < 3 or parts[1] == b"missing":
+            return None
+
+        size = int(parts[2])
+        data = self._proc.stdout.read(size)
+        self._proc.stdout.read(1)  # trailing newline
+        return data
+
+    def read(self, sha: str) -> Optional[bytes]:
+        """Return the raw content of a single object, or None if it is missing."""
+        with self._lock:
+            self._proc.stdin.write(f"{sha}\n".encode())
+            self._proc.stdin.flush()
+            return self._read_response()
+
+    def read_many(self, shas: Iterable[str]) -> Iterator[tuple[str, Optional[bytes]]]:
+        """
+        Yield (sha, content) in request order.
+
+        Requests are written from a helper thread while responses are consumed
+        here, so git never stalls on a full pipe and no round trip is paid per blob.
+        """
+        shas = list(shas)
+        if not shas:
+            return
+
+        with self._lock:
+            def feed() -> None:
+                try:
+                    for sha in shas:
+                        self._proc.stdin.write(f"{sha}\n".encode())
+                    self._proc.stdin.flush()
+                except (BrokenPipeError, ValueError):
+                    pass
+
+            writer = threading.Thread(target=feed, daemon=True)
+            writer.start()
+            pending = len(shas)
+            try:
+                for sha in shas:
+                    content = self._read_response()
+                    pending -= 1
+                    yield sha, content
+            finally:
+                # Drain answers the caller did not consume so the stream stays in sync.
+                while pending and self._proc.poll() is None:
+                    self._read_response()
+                    pending -= 1
+                writer.join()
+
+    def close(self) -> None:
+        self._tracking.close()
+        if self._proc.poll() is None:
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=5)
+            except Exception:
+                self._proc.kill()
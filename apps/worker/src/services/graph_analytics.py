@@ -0,0 +1,211 @@
+"""
+Structural metrics of the file graph, computed once per analysis.
+
+Every file node gets:
+
+- `inDegree` / `outDegree`: how many files import it / it imports
+- `cycle`: the import cycle (strongly connected component of two or more
+  files) it belongs to, numbered from the largest cycle down, or None
+- `pageRank`: PageRank over import edges, scaled by the node count so the
+  average file scores 1; files many others (transitively) depend on rank high
+- `layer`: 0 for files that import nothing, otherwise one more than the
+  highest layer among their imports; the files of a cycle share a layer
+
+and `stats["analytics"]` summarizes them. Edges are the distinct
+(source, target) pairs of the graph regardless of edge type; self-imports
+are ignored. Components come from an iterative Tarjan and PageRank from a
+power iteration over the CSR arrays, so both are linear per pass and never
+recurse.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import numpy as np
+
+from src.config import config
+from src.services.graph_model import FileGraph
+from src.services.job_control import checkpoint
+
+# Decimals kept for `pageRank` in graph.json.
+PAGERANK_PRECISION = 4
+
+
+def adjacency(graph: FileGraph) -> tuple[np.ndarray, np.ndarray]:
+    """CSR offsets and targets of the distinct non-self edges of `graph`."""
+    n = graph.node_count
+    sources = np.array(graph.sources(), dtype=np.int64)
+    targets = np.array(graph.targets, dtype=np.int64)
+    keep = sources != targets
+    keys = np.unique(sources[keep] * n + targets[keep])
+    sources, targets = keys // max(n, 1), keys % max(n, 1)
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(sources, minlength=n))))
+    return offsets, targets
+
+
+def strongly_connected_components(offsets: np.ndarray, targets: np.ndarray) -> tuple[np.ndarray, int]:
+    """
+    Tarjan's algorithm with an explicit stack. Returns each node's component
+    and the number of components. Components are numbered in the order Tarjan
+    completes them, which is a reverse topological order: an edge between two
+    components always points to the lower number.
+    """
+    n = len(offsets) - 1
+    offsets_list, targets_list = offsets.tolist(), targets.tolist()
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    component = [-1] * n
+    stack: list[int] = []
+    count = 0
+    counter = 0
+
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        # Frames are (node, next edge position).
+        frames = [(root, offsets_list[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+
+        while frames:
+            node, position = frames[-1]
+            end = offsets_list[node + 1]
+            while position < end:
+                target = targets_list[position]
+                position += 1
+                if index[target] < 0:
+                    frames[-1] = (node, position)
+                    frames.append((target, offsets_list[target]))
+                    index[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    break
+                if on_stack[target] and index[target] < low[node]:
+                    low[node] = index[target]
+            else:
+                frames.pop()
+                if frames:
+                    parent = frames[-1][0]
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component[member] = count
+                        if member == node:
+                            break
+                    count += 1
+
+    return np.array(component, dtype=np.int64), count
+
+
+def pagerank(
+    offsets: np.ndarray,
+    targets: np.ndarray,
+    damping: Optional[float] = None,
+    tolerance: Optional[float] = None,
+    max_iterations: Optional[int] = None,
+) -> np.ndarray:
+    """
+    PageRank by power iteration; the scores sum to 1. Files without imports
+    spread their score evenly over all files. Stops once the L1 change drops
+    below `tolerance` (PAGERANK_TOLERANCE) or after PAGERANK_MAX_ITERATIONS.
+    """
+    damping = config.PAGERANK_DAMPING if damping is None else damping
+    tolerance = config.PAGERANK_TOLERANCE if tolerance is None else tolerance
+    max_iterations = config.PAGERANK_MAX_ITERATIONS if max_iterations is None else max_iterations
+
+    n = len(offsets) - 1
+    if n == 0:
+        return np.zeros(0)
+    out_degree = np.diff(offsets)
+    sources = np.repeat(np.arange(n), out_degree)
+    dangling = out_degree == 0
+    inverse_degree = np.zeros(n)
+    inverse_degree[~dangling] = 1 / out_degree[~dangling]
+
+    ranks = np.full(n, 1 / n)
+    for _ in range(max_iterations):
+        checkpoint()
+        flow = np.bincount(targets, weights=(ranks * inverse_degree)[sources], minlength=n)
+        updated = (1 - damping) / n + damping * (flow + ranks[dangling].sum() / n)
+        change = np.abs(updated - ranks).sum()
+        ranks = updated
+        if change < tolerance:
+            break
+    return ranks
+
+
+def component_layers(
+    component: np.ndarray,
+    count: int,
+    offsets: np.ndarray,
+    targets: np.ndarray,
+) -> np.ndarray:
+    """Layer of each component of a Tarjan numbering (longest import chain below it)."""
+    sources = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    source_components, target_components = component[sources], component[targets]
+    between = source_components != target_components
+    edges = np.unique(source_components[between] * max(count, 1) + target_components[between])
+
+    # Targets have lower numbers than sources, so walking edges by ascending
+    # source sees every target's final layer.
+    layers = [0] * count
+    for source, target in zip((edges // max(count, 1)).tolist(), (edges % max(count, 1)).tolist()):
+        if layers[target] >= layers[source]:
+            layers[source] = layers[target] + 1
+    return np.array(layers, dtype=np.int64)
+
+
+def compute_analytics(graph: FileGraph, top: Optional[int] = None) -> dict[str, Any]:
+    """
+    Per-node metric columns (aligned with the graph's nodes) and their summary:
+    {"columns": {"inDegree": [...], ...}, "summary": {...}}.
+    """
+    top = config.ANALYTICS_TOP_N if top is None else top
+    n = graph.node_count
+    offsets, targets = adjacency(graph)
+    out_degree = np.diff(offsets)
+    in_degree = np.bincount(targets, minlength=n)
+
+    component, count = strongly_connected_components(offsets, targets)
+    sizes = np.bincount(component, minlength=count)
+    # Cycles numbered by size (largest first), ties by first member.
+    cyclic = np.flatnonzero(sizes > 1)
+    first_member = np.full(count, n)
+    np.minimum.at(first_member, component, np.arange(n))
+    cyclic = cyclic[np.lexsort((first_member[cyclic], -sizes[cyclic]))]
+    cycle_of = np.full(count, -1)
+    cycle_of[cyclic] = np.arange(len(cyclic))
+    cycles = cycle_of[component]
+
+    layers = component_layers(component, count, offsets, targets)[component]
+    ranks = np.round(pagerank(offsets, targets) * n, PAGERANK_PRECISION)
+
+    hubs = np.lexsort((np.arange(n), -ranks))[:top]
+    summary = {
+        "cycles": int(len(cyclic)),
+        "filesInCycles": int(sizes[cyclic].sum()),
+        "largestCycle": int(sizes[cyclic[0]]) if len(cyclic) else 0,
+        "layers": int(layers.max()) + 1 if n else 0,
+        "hubs": [
+            {"id": graph.path(node), "pageRank": float(ranks[node]), "inDegree": int(in_degree[node])}
+            for node in hubs.tolist()
+        ],
+    }
+    return {
+        "columns": {
+            "inDegree": in_degree.tolist(),
+            "outDegree": out_degree.tolist(),
+            "cycle": [cycle if cycle >= 0 else None for cycle in cycles.tolist()],
+            "pageRank": ranks.tolist(),
+            "layer": layers.tolist(),
+        },
+        "summary": summary,
+    }
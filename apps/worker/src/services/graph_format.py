@@ -0,0 +1,343 @@
+"""
+Wire formats for graph.json.
+
+Format 2 is the analyzer's JSON output (nodes/edges as lists of objects and a
+full `files` map per snapshot). Format 3 is a compact columnar encoding of the
+same data:
+
+- `paths`: interned path table; a node/file is referred to by its index
+- `languages`, `edgeTypes`: enum tables for the string columns
+- `nodes`: {"id": [...], "lines": [...], "language": [...]} plus any extra
+  per-node columns (copied as-is, e.g. the precomputed `x`/`y`/`z`)
+- `edges`: {"pairs": [source, target, source, target, ...], "type": [...]}
+- `snapshots[0]`: {"hash", "date", "impact", "nodes": {...}, "edges": {...}}
+  where snapshot edges keep every `depends_on` entry in order
+- `snapshots[i > 0]`: {"hash", "date", "impact", "delta": {"addedNodes": nodes,
+  "removedNodes": [...], "changedLines": {"id", "lines"}, "addedEdges": edges,
+  "removedEdges": edges}}
+- `snapshots[i].layout`: {"id": [...], "xyz": [x, y, z, x, y, z, ...]} with
+  the positions that are new or changed since the previous snapshot
+- `snapshots[i].analytics` (opt-in): {"id": [...], "inDegree": [...], ...,
+  "summary": {...}}, already columnar; only `id` is interned
+- `history[i].files`: {"path": [...], "status": "AMD..."}
+- `directories`: {"id": [...], "lines": [...], "fileCount": [...],
+  "languages": [[language, files, language, files, ...], ...]} plus `x`/`y`/`z`
+  when laid out; ids are directory paths with a trailing "/" in `paths`
+- `levels[i]`: {"depth", "nodeCount", "edges": {"pairs": [...], "weight": [...]}}
+
+Node `name`/`type` (and a directory's `path`/`parent`/`depth`) are derived
+from the path and omitted.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Iterable, Optional
+
+from src.config import config
+from src.services.graph_model import EDGE_TYPES
+
+COMPACT_FORMAT = 3
+
+_NODE_BASE_KEYS = {"id", "name", "path", "type", "lines", "language"}
+
+
+class _Table:
+    """Insertion-ordered string -> index table."""
+
+    def __init__(self, initial: Iterable[str] = ()):
+        self.values: list[str] = []
+        self._index: dict[str, int] = {}
+        for value in initial:
+            self.intern(value)
+
+    def intern(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = len(self.values)
+            self._index[value] = index
+            self.values.append(value)
+        return index
+
+
+def _encode_history(history: list[dict[str, Any]], paths: _Table) -> list[dict[str, Any]]:
+    encoded = []
+    for commit in history:
+        files = commit.get("files", [])
+        encoded.append({
+            **{key: value for key, value in commit.items() if key != "files"},
+            "files": {
+                "path": [paths.intern(f["path"]) for f in files],
+                "status": "".join((f.get("status") or "M")[0] for f in files),
+            },
+        })
+    return encoded
+
+
+def _encode_file_nodes(files: dict[str, dict[str, Any]], paths: _Table, languages: _Table) -> dict[str, list[int]]:
+    return {
+        "id": [paths.intern(file_path) for file_path in files],
+        "lines": [info.get("line_count", 0) for info in files.values()],
+        "language": [languages.intern(info.get("language") or "") for info in files.values()],
+    }
+
+
+def _encode_edges(edges: Iterable[dict[str, Any]], paths: _Table, edge_types: _Table) -> dict[str, list[int]]:
+    columns: dict[str, list[int]] = {"pairs": [], "type": []}
+    for edge in edges:
+        columns["pairs"].extend((paths.intern(edge["source"]), paths.intern(edge["target"])))
+        columns["type"].append(edge_types.intern(edge.get("type") or "import"))
+    return columns
+
+
+def _encode_layout(layout: dict[str, list[float]], paths: _Table) -> dict[str, list]:
+    return {
+        "id": [paths.intern(path) for path in layout],
+        "xyz": [coordinate for xyz in layout.values() for coordinate in xyz],
+    }
+
+
+def _decode_layout(columns: dict[str, list], paths: list[str]) -> dict[str, list[float]]:
+    xyz = columns["xyz"]
+    return {paths[path_id]: xyz[3 * i:3 * i + 3] for i, path_id in enumerate(columns["id"])}
+
+
+def _encode_directories(directories: list[dict[str, Any]], paths: _Table, languages: _Table) -> dict[str, list]:
+    columns: dict[str, list] = {
+        "id": [paths.intern(directory["id"]) for directory in directories],
+        "lines": [directory["lines"] for directory in directories],
+        "fileCount": [directory["fileCount"] for directory in directories],
+        "languages": [
+            [value for language, count in directory["languages"].items() for value in (languages.intern(language), count)]
+            for directory in directories
+        ],
+    }
+    if directories and "x" in directories[0]:
+        for axis in ("x", "y", "z"):
+            columns[axis] = [directory[axis] for directory in directories]
+    return columns
+
+
+def _decode_directories(columns: dict[str, list], paths: list[str], languages: list[str]) -> list[dict[str, Any]]:
+    directories = []
+    for i, path_id in enumerate(columns["id"]):
+        path = paths[path_id][:-1]
+        parent, _, name = path.rpartition("/")
+        histogram = columns["languages"][i]
+        directory = {
+            "id": paths[path_id],
+            "name": name,
+            "path": path,
+            "type": "directory",
+            "parent": f"{parent}/" if parent else None,
+            "depth": path.count("/") + 1,
+            "lines": columns["lines"][i],
+            "fileCount": columns["fileCount"][i],
+            "languages": {languages[histogram[j]]: histogram[j + 1] for j in range(0, len(histogram), 2)},
+        }
+        for axis in ("x", "y", "z"):
+            if axis in columns:
+                directory[axis] = columns[axis][i]
+        directories.append(directory)
+    return directories
+
+
+def _decode_file_nodes(columns: dict[str, list[int]], paths: list[str], languages: list[str]) -> dict[str, dict[str, Any]]:
+    return {
+        paths[path_id]: {"language": languages[columns["language"][i]], "line_count": columns["lines"][i]}
+        for i, path_id in enumerate(columns["id"])
+    }
+
+
+def _decode_edges(columns: dict[str, list[int]], paths: list[str], edge_types: list[str]) -> list[dict[str, str]]:
+    pairs = columns["pairs"]
+    return [
+        {"source": paths[pairs[2 * i]], "target": paths[pairs[2 * i + 1]], "type": edge_types[type_id]}
+        for i, type_id in enumerate(columns["type"])
+    ]
+
+
+def encode_compact(graph: dict[str, Any]) -> dict[str, Any]:
+    """Encode an analyzer graph as format 3."""
+    paths = _Table()
+    languages = _Table()
+    # Known edge types keep their stable codes; unknown ones are appended per document.
+    edge_types = _Table(EDGE_TYPES)
+
+    node_columns: dict[str, list[Any]] = {"id": [], "lines": [], "language": []}
+    extra_keys = sorted({key for node in graph.get("nodes", []) for key in node} - _NODE_BASE_KEYS)
+    for key in extra_keys:
+        node_columns[key] = []
+    for node in graph.get("nodes", []):
+        node_columns["id"].append(paths.intern(node["id"]))
+        node_columns["lines"].append(node.get("lines", 0))
+        node_columns["language"].append(languages.intern(node.get("language") or ""))
+        for key in extra_keys:
+            node_columns[key].append(node.get(key))
+
+    edge_columns = _encode_edges(graph.get("edges", []), paths, edge_types)
+
+    snapshots = []
+    for snapshot in graph.get("snapshots", []):
+        entry = {key: value for key, value in snapshot.items() if key not in ("files", "delta", "layout")}
+        if "layout" in snapshot:
+            entry["layout"] = _encode_layout(snapshot["layout"], paths)
+        if "analytics" in snapshot:
+            entry["analytics"] = {
+                **snapshot["analytics"],
+                "id": [paths.intern(path) for path in snapshot["analytics"]["id"]],
+            }
+        if "delta" in snapshot:
+            delta = snapshot["delta"]
+            entry["delta"] = {
+                "addedNodes": _encode_file_nodes(delta.get("addedNodes", {}), paths, languages),
+                "removedNodes": [paths.intern(path) for path in delta.get("removedNodes", [])],
+                "changedLines": {
+                    "id": [paths.intern(path) for path in delta.get("changedLines", {})],
+                    "lines": list(delta.get("changedLines", {}).values()),
+                },
+                "addedEdges": _encode_edges(delta.get("addedEdges", []), paths, edge_types),
+                "removedEdges": _encode_edges(delta.get("removedEdges", []), paths, edge_types),
+            }
+        else:
+            files = snapshot.get("files", {})
+            entry["nodes"] = _encode_file_nodes(files, paths, languages)
+            entry["edges"] = _encode_edges(
+                (
+                    {"source": file_path, **dep}
+                    for file_path, info in files.items()
+                    for dep in info.get("depends_on", [])
+                ),
+                paths,
+                edge_types,
+            )
+        snapshots.append(entry)
+
+    history = _encode_history(graph.get("history", []), paths)
+
+    directories = _encode_directories(graph.get("directories", []), paths, languages)
+    levels = [
+        {
+            "depth": level["depth"],
+            "nodeCount": level["nodeCount"],
+            "edges": {
+                "pairs": [
+                    paths.intern(endpoint) for edge in level["edges"] for endpoint in (edge["source"], edge["target"])
+                ],
+                "weight": [edge["weight"] for edge in level["edges"]],
+            },
+        }
+        for level in graph.get("levels", [])
+    ]
+
+    return {
+        "format": COMPACT_FORMAT,
+        "metadata": {**graph.get("metadata", {}), "version": "3.0.0"},
+        "paths": paths.values,
+        "languages": languages.values,
+        "edgeTypes": edge_types.values,
+        "nodes": node_columns,
+        "edges": edge_columns,
+        "history": history,
+        "stats": graph.get("stats", {}),
+        "snapshots": snapshots,
+        "directories": directories,
+        "levels": levels,
+    }
+
+
+def decode_compact(doc: dict[str, Any]) -> dict[str, Any]:
+    """Expand a format 3 document back into the analyzer's native graph dict."""
+    paths = doc["paths"]
+    languages = doc["languages"]
+    edge_types = doc["edgeTypes"]
+
+    node_columns = doc["nodes"]
+    extra_keys = [key for key in node_columns if key not in ("id", "lines", "language")]
+    nodes = []
+    for i, path_id in enumerate(node_columns["id"]):
+        path = paths[path_id]
+        node = {
+            "id": path,
+            "name": os.path.basename(path),
+            "path": path,
+            "type": "file",
+            "lines": node_columns["lines"][i],
+            "language": languages[node_columns["language"][i]],
+        }
+        for key in extra_keys:
+            node[key] = node_columns[key][i]
+        nodes.append(node)
+
+    edges = _decode_edges(doc["edges"], paths, edge_types)
+
+    snapshots = []
+    for snapshot in doc.get("snapshots", []):
+        entry = {key: value for key, value in snapshot.items() if key not in ("nodes", "edges", "delta", "layout")}
+        if "layout" in snapshot:
+            entry["layout"] = _decode_layout(snapshot["layout"], paths)
+        if "analytics" in snapshot:
+            entry["analytics"] = {
+                **snapshot["analytics"],
+                "id": [paths[path_id] for path_id in snapshot["analytics"]["id"]],
+            }
+        if "delta" in snapshot:
+            delta = snapshot["delta"]
+            changed = delta["changedLines"]
+            entry["delta"] = {
+                "addedNodes": _decode_file_nodes(delta["addedNodes"], paths, languages),
+                "removedNodes": [paths[path_id] for path_id in delta["removedNodes"]],
+                "changedLines": {paths[path_id]: lines for path_id, lines in zip(changed["id"], changed["lines"])},
+                "addedEdges": _decode_edges(delta["addedEdges"], paths, edge_types),
+                "removedEdges": _decode_edges(delta["removedEdges"], paths, edge_types),
+            }
+        else:
+            files = _decode_file_nodes(snapshot["nodes"], paths, languages)
+            for info in files.values():
+                info["depends_on"] = []
+            for edge in _decode_edges(snapshot["edges"], paths, edge_types):
+                files[edge["source"]]["depends_on"].append({"target": edge["target"], "type": edge["type"]})
+            entry["files"] = files
+        snapshots.append(entry)
+
+    history = []
+    for commit in doc.get("history", []):
+        files = commit.get("files", {})
+        history.append({
+            **{key: value for key, value in commit.items() if key != "files"},
+            "files": [
+                {"path": paths[path_id], "status": status}
+                for path_id, status in zip(files.get("path", []), files.get("status", ""))
+            ],
+        })
+
+    levels = []
+    for level in doc.get("levels", []):
+        pairs = level["edges"]["pairs"]
+        levels.append({
+            "depth": level["depth"],
+            "nodeCount": level["nodeCount"],
+            "edges": [
+                {"source": paths[pairs[2 * i]], "target": paths[pairs[2 * i + 1]], "weight": weight}
+                for i, weight in enumerate(level["edges"]["weight"])
+            ],
+        })
+
+    return {
+        "metadata": doc.get("metadata", {}),
+        "nodes": nodes,
+        "edges": edges,
+        "history": history,
+        "stats": doc.get("stats", {}),
+        "snapshots": snapshots,
+        "directories": _decode_directories(doc["directories"], paths, languages) if "directories" in doc else [],
+        "levels": levels,
+    }
+
+
+def encode_graph(graph: dict[str, Any], fmt: Optional[int] = None) -> dict[str, Any]:
+    """Encode a graph in the configured wire format (GRAPH_FORMAT)."""
+    fmt = fmt if fmt is not None else config.GRAPH_FORMAT
+    if fmt >= COMPACT_FORMAT:
+        return encode_compact(graph)
+    return graph
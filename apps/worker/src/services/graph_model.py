@@ -0,0 +1,236 @@
+"""
+Compact in-memory graph model of the analyzer.
+
+Paths are interned once per analysis in a PathTable and referred to by their
+integer id everywhere else. A file's analysis result is a FileRecord whose
+dependencies are packed into a single `array` of
+`target path id << EDGE_TYPE_BITS | edge type code`, in resolution order.
+Snapshots share the records of files that did not change.
+
+FileGraph is the deduplicated graph of one file map in CSR form: node
+attributes are arrays indexed by node, and node i's out-edges are
+`targets[offsets[i]:offsets[i + 1]]` (node indices) with their edge type codes
+in `kinds`. The JSON shapes of graph.json are only produced by the `*_json`
+methods when the result is serialized.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from array import array
+from typing import Any, Iterable, Iterator, Optional
+
+# Known edge types with their stable codes; graph.json's edgeTypes table
+# starts with them too. Other types get the next free code on first use.
+EDGE_TYPES: tuple[str, ...] = (
+    "import",
+    "file_dependency",
+    "layout_include",
+    "class_reference",
+    "module_include",
+    "include",
+)
+EDGE_TYPE_BITS = 4
+
+_EDGE_TYPE_MASK = (1 << EDGE_TYPE_BITS) - 1
+_edge_names = list(EDGE_TYPES)
+_edge_codes = {edge_type: code for code, edge_type in enumerate(_edge_names)}
+
+
+def edge_code(edge_type: str) -> int:
+    code = _edge_codes.get(edge_type)
+    if code is None:
+        if len(_edge_names) > _EDGE_TYPE_MASK:
+            raise ValueError(f"Too many edge types, cannot add {edge_type!r}")
+        code = _edge_codes[edge_type] = len(_edge_names)
+        _edge_names.append(edge_type)
+    return code
+
+
+def edge_type(code: int) -> str:
+    return _edge_names[code]
+
+
+class PathTable:
+    """Interned path <-> id table shared by every snapshot of one analysis."""
+
+    __slots__ = ("paths", "_ids")
+
+    def __init__(self) -> None:
+        self.paths: list[str] = []
+        self._ids: dict[str, int] = {}
+
+    def intern(self, path: str) -> int:
+        path_id = self._ids.get(path)
+        if path_id is None:
+            path_id = self._ids[path] = len(self.paths)
+            self.paths.append(path)
+        return path_id
+
+    def get(self, path: str) -> Optional[int]:
+        return self._ids.get(path)
+
+    def __getitem__(self, path_id: int) -> str:
+        return self.paths[path_id]
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+class FileRecord:
+    """Language, line count and resolved dependencies of one file."""
+
+    __slots__ = ("language", "line_count", "deps")
+
+    def __init__(self, language: Optional[str], line_count: int, deps: Optional[array] = None) -> None:
+        self.language = sys.intern(language) if language else language
+        self.line_count = line_count
+        self.deps = deps if deps is not None else array("I")
+
+    @classmethod
+    def from_dependencies(
+        cls,
+        language: Optional[str],
+        line_count: int,
+        depends_on: Iterable[dict[str, str]],
+        paths: PathTable,
+    ) -> "FileRecord":
+        deps = array("I", (
+            paths.intern(dep["target"]) << EDGE_TYPE_BITS | edge_code(dep.get("type", "import"))
+            for dep in depends_on
+        ))
+        return cls(language, line_count, deps)
+
+    def dependencies(self) -> Iterator[tuple[int, int]]:
+        """(target path id, edge type code) pairs in resolution order."""
+        for packed in self.deps:
+            yield packed >> EDGE_TYPE_BITS, packed & _EDGE_TYPE_MASK
+
+    def to_json(self, paths: PathTable) -> dict[str, Any]:
+        return {
+            "language": self.language,
+            "line_count": self.line_count,
+            "depends_on": [
+                {"target": paths[target], "type": edge_type(kind)} for target, kind in self.dependencies()
+            ],
+        }
+
+
+class FileGraph:
+    """Nodes and deduplicated edges of one file map, with CSR adjacency."""
+
+    __slots__ = ("paths", "node_ids", "lines", "languages", "language", "offsets", "targets", "kinds")
+
+    def __init__(self, paths: PathTable) -> None:
+        self.paths = paths
+        self.node_ids = array("I")      # node -> path id, in path order
+        self.lines = array("I")         # node -> line count
+        self.languages: list[Optional[str]] = []
+        self.language = array("B")      # node -> index into `languages`
+        self.offsets = array("I", [0])  # node -> start of its edges; n + 1 entries
+        self.targets = array("I")       # edge -> target node
+        self.kinds = array("B")         # edge -> edge type code
+
+    @classmethod
+    def from_files(cls, files: dict[str, FileRecord], paths: PathTable) -> "FileGraph":
+        """
+        Build the graph of a file map. Nodes are sorted by path; edges to files
+        outside the map are dropped and repeated (target, type) pairs of a file
+        are kept once, in resolution order.
+        """
+        graph = cls(paths)
+        order = sorted(files)
+        graph.node_ids.extend(paths.intern(path) for path in order)
+        node_of = {path_id: node for node, path_id in enumerate(graph.node_ids)}
+        language_codes: dict[Optional[str], int] = {}
+
+        for path in order:
+            record = files[path]
+            code = language_codes.get(record.language)
+            if code is None:
+                code = language_codes[record.language] = len(graph.languages)
+                graph.languages.append(record.language)
+            graph.language.append(code)
+            graph.lines.append(record.line_count)
+
+            seen: set[int] = set()
+            for packed in record.deps:
+                target = node_of.get(packed >> EDGE_TYPE_BITS)
+                if target is None or packed in seen:
+                    continue
+                seen.add(packed)
+                graph.targets.append(target)
+                graph.kinds.append(packed & _EDGE_TYPE_MASK)
+            graph.offsets.append(len(graph.targets))
+        return graph
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def path(self, node: int) -> str:
+        return self.paths[self.node_ids[node]]
+
+    def node_paths(self) -> list[str]:
+        return [self.paths[path_id] for path_id in self.node_ids]
+
+    def node_language(self, node: int) -> Optional[str]:
+        return self.languages[self.language[node]]
+
+    def sources(self) -> array:
+        """Source node of every edge, aligned with `targets` (CSR to COO)."""
+        sources = array("I")
+        for node in range(self.node_count):
+            sources.extend([node] * (self.offsets[node + 1] - self.offsets[node]))
+        return sources
+
+    def edges(self) -> Iterator[tuple[int, int, int]]:
+        """(source node, target node, edge type code) in CSR order."""
+        offsets, targets, kinds = self.offsets, self.targets, self.kinds
+        for node in range(self.node_count):
+            for edge in range(offsets[node], offsets[node + 1]):
+                yield node, targets[edge], kinds[edge]
+
+    def stats(self) -> dict[str, Any]:
+        languages: dict[str, int] = {}
+        for code in self.language:
+            language = self.languages[code] or "unknown"
+            languages[language] = languages.get(language, 0) + 1
+        return {
+            "nodeCount": self.node_count,
+            "edgeCount": self.edge_count,
+            "fileCount": self.node_count,
+            "directoryCount": 0,
+            "totalLines": sum(self.lines),
+            "languages": languages,
+        }
+
+    def nodes_json(self, columns: Optional[dict[str, list[Any]]] = None) -> list[dict[str, Any]]:
+        """graph.json nodes, plus one attribute per extra column (one value per node)."""
+        columns = columns or {}
+        nodes = []
+        for node, path in enumerate(self.node_paths()):
+            entry = {
+                "id": path,
+                "name": os.path.basename(path),
+                "path": path,
+                "type": "file",
+                "lines": self.lines[node],
+                "language": self.node_language(node),
+            }
+            for key, values in columns.items():
+                entry[key] = values[node]
+            nodes.append(entry)
+        return nodes
+
+    def edges_json(self) -> list[dict[str, Any]]:
+        paths = self.node_paths()
+        return [
+            {"source": paths[source], "target": paths[target], "type": edge_type(kind)}
+            for source, target, kind in self.edges()
+        ]
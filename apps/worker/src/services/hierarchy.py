@@ -0,0 +1,134 @@
+"""
+Directory hierarchy and level-of-detail views of the file graph.
+
+Every directory that contains files becomes a supernode with aggregated line
+and file counts and a language histogram (files per language). Directory ids
+end with "/" so they never collide with file ids.
+
+For large repositories the graph also gets coarse levels. Level `d` collapses
+every file below depth `d` into its ancestor directory at depth `d`; files in
+shallower directories stay as they are. Each level carries the weighted edges
+between its nodes, where the weight is the number of file-level edges it
+stands for. The viewer can render the coarsest level first and expand
+directories on demand.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import Any, Optional
+
+import numpy as np
+
+from src.config import config
+from src.services.graph_model import FileGraph
+
+
+def directory_id(path: str) -> str:
+    return f"{path}/"
+
+
+def level_node_id(file_path: str, depth: int) -> str:
+    """The node `file_path` is shown as at level `depth`."""
+    parts = file_path.split("/")
+    if len(parts) - 1 < depth:
+        return file_path
+    return directory_id("/".join(parts[:depth]))
+
+
+def build_directories(graph: FileGraph) -> list[dict[str, Any]]:
+    """Directory supernodes with aggregated counts, sorted by path."""
+    directories: dict[str, dict[str, Any]] = {}
+    for node, file_path in enumerate(graph.node_paths()):
+        parts = file_path.split("/")[:-1]
+        language = graph.node_language(node) or "unknown"
+        for depth in range(1, len(parts) + 1):
+            path = "/".join(parts[:depth])
+            directory = directories.get(path)
+            if directory is None:
+                directory = directories[path] = {
+                    "id": directory_id(path),
+                    "name": parts[depth - 1],
+                    "path": path,
+                    "type": "directory",
+                    "parent": directory_id("/".join(parts[:depth - 1])) if depth > 1 else None,
+                    "depth": depth,
+                    "lines": 0,
+                    "fileCount": 0,
+                    "languages": defaultdict(int),
+                }
+            directory["lines"] += graph.lines[node]
+            directory["fileCount"] += 1
+            directory["languages"][language] += 1
+
+    result = []
+    for path in sorted(directories):
+        directory = directories[path]
+        directory["languages"] = dict(sorted(directory["languages"].items()))
+        result.append(directory)
+    return result
+
+
+def build_levels(graph: FileGraph, max_nodes: Optional[int] = None) -> list[dict[str, Any]]:
+    """
+    Coarse levels from the top down, as long as a level still collapses
+    something and has at most `max_nodes` (LOD_MAX_LEVEL_NODES) nodes.
+    """
+    max_nodes = config.LOD_MAX_LEVEL_NODES if max_nodes is None else max_nodes
+    paths = graph.node_paths()
+    max_depth = max((path.count("/") for path in paths), default=0)
+
+    levels: list[dict[str, Any]] = []
+    for depth in range(1, max_depth + 1):
+        mapping = [level_node_id(path, depth) for path in paths]
+        node_count = len(set(mapping))
+        # Deeper levels only get larger.
+        if node_count >= len(paths) or node_count > max_nodes:
+            break
+
+        weights: Counter[tuple[str, str]] = Counter()
+        for source, target, _kind in graph.edges():
+            if mapping[source] != mapping[target]:
+                weights[(mapping[source], mapping[target])] += 1
+        levels.append({
+            "depth": depth,
+            "nodeCount": node_count,
+            "edges": [
+                {"source": source, "target": target, "weight": weight}
+                for (source, target), weight in sorted(weights.items())
+            ],
+        })
+    return levels
+
+
+def place_directories(
+    directories: list[dict[str, Any]],
+    graph: FileGraph,
+    positions: Optional[np.ndarray],
+) -> None:
+    """Give directories the direction of their files' mean layout position."""
+    if not directories or positions is None:
+        return
+
+    index = {directory["path"]: i for i, directory in enumerate(directories)}
+    sums = np.zeros((len(directories), 3))
+    for node, file_path in enumerate(graph.node_paths()):
+        parts = file_path.split("/")[:-1]
+        for depth in range(1, len(parts) + 1):
+            sums[index["/".join(parts[:depth])]] += positions[node]
+
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    for directory, xyz in zip(directories, np.round(sums / norms, 4).tolist()):
+        directory["x"], directory["y"], directory["z"] = xyz
+
+
+def add_directory_levels(
+    graph: FileGraph,
+    stats: dict[str, Any],
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Directories for every graph and levels for graphs of at least LOD_MIN_FILES files."""
+    directories = build_directories(graph)
+    stats["directoryCount"] = len(directories)
+    levels = build_levels(graph) if graph.node_count >= config.LOD_MIN_FILES else []
+    return directories, levels
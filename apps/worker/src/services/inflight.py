@@ -0,0 +1,155 @@
+"""
+Registry of in-flight analyses, shared by all workers through Redis.
+
+The first job for a (repo URL, ref) becomes the leader and claims a lease that
+is kept alive while it runs. Jobs for the same repository that arrive
+meanwhile attach to the leader as followers instead of analyzing it again.
+When the leader finishes it releases the lease and takes over its followers
+in one atomic step, so a follower can never attach to a leader that has
+already finished. If a leader dies without releasing, its lease expires:
+the next job for that repository becomes the leader and inherits the waiting
+followers, and workers periodically take the followers of expired leases
+(`orphaned_followers`) so they are retried even if no such job arrives.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from contextlib import contextmanager
+from typing import Any, Generator, Optional
+
+from redis import Redis
+
+from src.config import config
+from src.services.repo_cache import normalize_repo_url
+
+# Returns "" when the caller became (or already is) the leader, else the leader's id.
+_CLAIM_SCRIPT = """
+local leader = redis.call('GET', KEYS[1])
+if (not leader) or leader == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+    return ''
+end
+redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return leader
+"""
+
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Drops the lease if still held by the caller and hands back the followers.
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return {}
+end
+redis.call('DEL', KEYS[1])
+local followers = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[2])
+return followers
+"""
+
+
+# Takes the followers of a lease that is gone without a release, i.e. whose leader died.
+_REAP_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return {}
+end
+local followers = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[2])
+return followers
+"""
+
+_KEY_PREFIX = "codeviz:inflight:"
+_FOLLOWERS_SUFFIX = ":followers"
+
+
+class InflightRegistry:
+    """Leader/follower coalescing of jobs for the same (repo URL, ref)."""
+
+    def __init__(self, redis_client: Redis, lease: int):
+        self.redis = redis_client
+        self.lease = lease
+        self._claim = redis_client.register_script(_CLAIM_SCRIPT)
+        self._renew = redis_client.register_script(_RENEW_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+        self._reap = redis_client.register_script(_REAP_SCRIPT)
+
+    def _keys(self, repo_url: str, ref: Optional[str]) -> list[str]:
+        identity = f"{normalize_repo_url(repo_url)}\n{ref or ''}"
+        key = f"{_KEY_PREFIX}{hashlib.sha256(identity.encode('utf-8')).hexdigest()}"
+        return [key, f"{key}{_FOLLOWERS_SUFFIX}"]
+
+    def claim(self, repo_url: str, ref: Optional[str], job_id: str, attempt: int = 0) -> Optional[str]:
+        """
+        Become the leader for (repo_url, ref) or attach as a follower.
+
+        Returns None for the leader, otherwise the id of the job being followed.
+        """
+        follower = json.dumps({"jobId": job_id, "attempt": attempt})
+        # Followers wait for a whole analysis, so keep them well beyond one lease.
+        leader = self._claim(
+            keys=self._keys(repo_url, ref),
+            args=[job_id, follower, self.lease, self.lease * 60],
+        )
+        leader = leader.decode("utf-8") if isinstance(leader, bytes) else leader
+        return leader or None
+
+    @contextmanager
+    def lease_kept(self, repo_url: str, ref: Optional[str], job_id: str) -> Generator[None, None, None]:
+        """Renew the leader's lease in the background while the body runs."""
+        keys = self._keys(repo_url, ref)
+        stop = threading.Event()
+
+        def renew() -> None:
+            while not stop.wait(self.lease / 3):
+                try:
+                    self._renew(keys=keys, args=[job_id, self.lease])
+                except Exception as e:
+                    print(f"[Inflight] Lease renewal failed: {e}")
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def release(self, repo_url: str, ref: Optional[str], job_id: str) -> list[dict[str, Any]]:
+        """Give up leadership and return the followers ({jobId, attempt}) that were waiting."""
+        followers = self._release(keys=self._keys(repo_url, ref), args=[job_id])
+        return [json.loads(follower) for follower in followers]
+
+    def orphaned_followers(self) -> list[dict[str, Any]]:
+        """Take the followers ({jobId, attempt}) of leaders whose lease expired without a release."""
+        orphans = []
+        for followers_key in self.redis.scan_iter(match=f"{_KEY_PREFIX}*{_FOLLOWERS_SUFFIX}", count=500):
+            followers_key = followers_key.decode("utf-8") if isinstance(followers_key, bytes) else followers_key
+            key = followers_key[: -len(_FOLLOWERS_SUFFIX)]
+            orphans.extend(json.loads(follower) for follower in self._reap(keys=[key, followers_key]))
+        return orphans
+
+    def requeue(self, job_id: str, attempt: int) -> None:
+        """Put a follower back on the queue; it is pushed to the consuming end so it runs next."""
+        self.redis.rpush(config.QUEUE_NAME, json.dumps({"jobId": job_id, "attempt": attempt}))
+
+
+_registry: Optional[InflightRegistry] = None
+
+
+def get_inflight_registry() -> Optional[InflightRegistry]:
+    """Return the process-wide registry, or None when coalescing is disabled."""
+    global _registry
+    if config.INFLIGHT_LEASE <= 0:
+        return None
+
+    if _registry is None:
+        _registry = InflightRegistry(Redis.from_url(config.REDIS_URL), config.INFLIGHT_LEASE)
+    return _registry
@@ -0,0 +1,152 @@
+"""
+Which repository files are analyzed.
+
+Besides the extension filter of the analyzer, a file is skipped when
+
+- a directory on its path matches an excluded directory name (vendored
+  dependencies and build output by default, see DEFAULT_EXCLUDED_DIRS),
+- its name matches an excluded file pattern (minified bundles, lockfiles and
+  generated code by default),
+- it is larger than INGEST_MAX_FILE_BYTES (INGEST_MAX_JSON_BYTES for JSON,
+  which is only ever an import target), or
+- it is binary: like git, a NUL byte in the first block marks it as such.
+  That needs the content, so the analyzer checks it when reading a blob.
+
+Huge repositories can be capped at INGEST_MAX_FILES files. The sample is
+planned once from the analyzed commit's tree: every directory keeps its share
+of the cap (largest remainder), filled with the files that sort first by a
+hash of their path. Files of older snapshots that are gone from that tree are
+kept at the same overall rate by the same hash, so whether a path is analyzed
+never depends on the snapshot and incremental snapshots stay exact.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import os
+import re
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from src.config import config
+
+DEFAULT_EXCLUDED_DIRS = (
+    "node_modules", "bower_components", "jspm_packages", "vendor", "third_party",
+    "dist", "build", "out", "target", "coverage", ".next", ".nuxt", ".svelte-kit",
+    ".gradle", "Pods", "__pycache__", ".venv", "venv", ".tox", "generated",
+)
+
+DEFAULT_EXCLUDED_FILES = (
+    "*.min.js", "*-min.js", "*.bundle.js", "*.chunk.js",
+    "package-lock.json", "npm-shrinkwrap.json",
+    "*.generated.*", "*.pb.h", "*.pb.cc", "*_pb2.py",
+)
+
+# Bytes inspected for a NUL byte, as in git's binary detection.
+SNIFF_BYTES = 8000
+
+
+def is_binary(data: bytes) -> bool:
+    return b"\0" in data[:SNIFF_BYTES]
+
+
+def _split_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _compile(patterns: Iterable[str]) -> Optional[re.Pattern[str]]:
+    patterns = list(patterns)
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+def _path_hash(path: str) -> bytes:
+    return hashlib.blake2b(path.encode("utf-8", errors="surrogateescape"), digest_size=8).digest()
+
+
+class IngestPolicy:
+    """Path, size and sampling rules for one analysis."""
+
+    def __init__(
+        self,
+        excluded_dirs: Iterable[str] = DEFAULT_EXCLUDED_DIRS,
+        excluded_files: Iterable[str] = DEFAULT_EXCLUDED_FILES,
+        max_file_bytes: int = 0,
+        max_json_bytes: int = 0,
+        max_files: int = 0,
+    ):
+        self._excluded_dirs = _compile(excluded_dirs)
+        self._excluded_files = _compile(excluded_files)
+        self.max_file_bytes = max_file_bytes
+        self.max_json_bytes = max_json_bytes
+        self.max_files = max_files
+        self._sample: Optional[frozenset[str]] = None
+        self._planned: frozenset[str] = frozenset()
+        self._rate = 1.0
+        self.sampled_from = 0
+
+    @classmethod
+    def from_config(cls) -> "IngestPolicy":
+        """Defaults plus INGEST_EXCLUDE_*, minus directories in INGEST_INCLUDE_DIRS."""
+        included = set(_split_list(config.INGEST_INCLUDE_DIRS))
+        return cls(
+            excluded_dirs=[name for name in DEFAULT_EXCLUDED_DIRS if name not in included]
+            + _split_list(config.INGEST_EXCLUDE_DIRS),
+            excluded_files=[*DEFAULT_EXCLUDED_FILES, *_split_list(config.INGEST_EXCLUDE_FILES)],
+            max_file_bytes=config.INGEST_MAX_FILE_BYTES,
+            max_json_bytes=config.INGEST_MAX_JSON_BYTES,
+            max_files=config.INGEST_MAX_FILES,
+        )
+
+    @property
+    def sampled(self) -> bool:
+        return self._sample is not None
+
+    def excludes_dir(self, name: str) -> bool:
+        return self._excluded_dirs is not None and self._excluded_dirs.match(name) is not None
+
+    def admits(self, path: str, size: Optional[int] = None) -> bool:
+        """Whether `path` (of `size` bytes, if known) is analyzed."""
+        *dirs, name = path.split("/")
+        if any(self.excludes_dir(part) for part in dirs):
+            return False
+        if self._excluded_files is not None and self._excluded_files.match(name):
+            return False
+        if size is not None:
+            limit = self.max_json_bytes if name.endswith(".json") else self.max_file_bytes
+            if limit and size > limit:
+                return False
+        if self._sample is not None and path not in self._sample:
+            return path not in self._planned and int.from_bytes(_path_hash(path), "big") < self._rate * 2 ** 64
+        return True
+
+    def plan_sample(self, paths: Iterable[str]) -> None:
+        """Cap the analysis at `max_files` of the admitted `paths`, sampled per directory."""
+        paths = sorted(set(paths))
+        self._sample, self._planned, self._rate, self.sampled_from = None, frozenset(), 1.0, 0
+        if not self.max_files or len(paths) <= self.max_files:
+            return
+
+        by_dir: dict[str, list[str]] = defaultdict(list)
+        for path in paths:
+            by_dir[os.path.dirname(path)].append(path)
+
+        # Largest remainder: every directory gets the floor of its share, and
+        # the leftover slots go to the largest fractional parts.
+        shares = {directory: len(files) * self.max_files / len(paths) for directory, files in by_dir.items()}
+        quotas = {directory: int(share) for directory, share in shares.items()}
+        leftover = self.max_files - sum(quotas.values())
+        for directory in sorted(shares, key=lambda d: (quotas[d] - shares[d], d))[:leftover]:
+            quotas[directory] += 1
+
+        sample: set[str] = set()
+        for directory, files in by_dir.items():
+            sample.update(sorted(files, key=_path_hash)[:quotas[directory]])
+
+        self._sample = frozenset(sample)
+        self._planned = frozenset(paths)
+        self._rate = self.max_files / len(paths)
+        self.sampled_from = len(paths)
+        print(f"[Ingest] Sampling {len(sample)} of {len(paths)} files")
@@ -0,0 +1,228 @@
+"""
+Deadlines and cooperative cancellation of running jobs.
+
+A job activates a JobControl the same way it activates its JobMetrics. Code
+below it calls `checkpoint()` between files and snapshots, starts git through
+`run_process()` and registers long-lived git processes with `tracked()`. A
+job is interrupted when
+
+- it is cancelled: its row is set to 'canceled' (by the web app); a watcher
+  thread polls for that every JOB_CANCEL_POLL_INTERVAL seconds, or
+- its deadline passes: JOB_TIMEOUT seconds of work. Time a job spends
+  waiting between pipeline stages does not count.
+
+The git processes of an interrupted job are killed right away, and the next
+checkpoint (or the `run_process()` whose process was killed) raises
+JobInterrupted. Outside an active job all of this is a no-op, so benchmarks
+and scripts run the analyzer unchanged.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, ContextManager, Generator, Optional
+
+from src.config import config
+
+# Terminal job statuses of an interrupted job.
+CANCELED = "canceled"
+TIMED_OUT = "timed_out"
+
+_current: ContextVar[Optional["JobControl"]] = ContextVar("codeviz_job_control", default=None)
+
+
+class JobInterrupted(Exception):
+    """The active job was cancelled or ran out of time; `status` says which."""
+
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class JobControl:
+    """Deadline, cancel flag and in-flight git processes of one job."""
+
+    def __init__(self, is_canceled: Optional[Callable[[], bool]] = None, timeout: Optional[float] = None):
+        self.is_canceled = is_canceled
+        self.timeout = config.JOB_TIMEOUT if timeout is None else timeout
+        self.deadline = time.monotonic() + self.timeout if self.timeout > 0 else None
+        # CANCELED or TIMED_OUT once the job is interrupted.
+        self.status: Optional[str] = None
+        self._lock = threading.Lock()
+        self._processes: set[subprocess.Popen] = set()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._paused_at: Optional[float] = None
+
+    @contextmanager
+    def activate(self) -> Generator["JobControl", None, None]:
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def start(self) -> None:
+        """Watch for cancellation and the deadline in the background."""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="codeviz-job-control", daemon=True)
+            self._watcher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._watcher is not None and self._watcher is not threading.current_thread():
+            self._watcher.join()
+
+    def _watch(self) -> None:
+        while self.status is None:
+            interval = config.JOB_CANCEL_POLL_INTERVAL
+            remaining = self.remaining()
+            if remaining is not None:
+                interval = min(interval, remaining)
+            if self._stop.wait(max(interval, 0.0)):
+                return
+            self.poll()
+
+    def poll(self) -> None:
+        """Interrupt the job if it has been cancelled or is past its deadline."""
+        if self.status is None and self.is_canceled is not None:
+            try:
+                if self.is_canceled():
+                    self.interrupt(CANCELED)
+            except Exception as e:
+                print(f"[Job] Cancellation check failed: {e}")
+        if self.status is None and self.expired():
+            self.interrupt(TIMED_OUT)
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None or self._paused_at is not None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def pause(self) -> None:
+        """Stop the clock while the job waits for the next pipeline stage."""
+        if self._paused_at is None:
+            self._paused_at = time.monotonic()
+
+    def resume(self) -> None:
+        """Restart the clock; the deadline moves back by the time spent waiting."""
+        if self._paused_at is not None:
+            if self.deadline is not None:
+                self.deadline += time.monotonic() - self._paused_at
+            self._paused_at = None
+
+    def interrupt(self, status: str) -> None:
+        """Mark the job interrupted and kill its git processes."""
+        with self._lock:
+            if self.status is not None:
+                return
+            self.status = status
+            processes = list(self._processes)
+        print(f"[Job] {'Cancelled' if status == CANCELED else 'Deadline exceeded'}, stopping")
+        for proc in processes:
+            _kill(proc)
+
+    def check(self) -> None:
+        if self.status is None and self.expired():
+            self.interrupt(TIMED_OUT)
+        error = self.error()
+        if error is not None:
+            raise error
+
+    def error(self) -> Optional[JobInterrupted]:
+        """The JobInterrupted for this job's state, or None while it may run."""
+        if self.status == CANCELED:
+            return JobInterrupted(CANCELED, "Job was cancelled")
+        if self.status == TIMED_OUT:
+            return JobInterrupted(TIMED_OUT, f"Job exceeded its {self.timeout:g}s deadline")
+        return None
+
+    @contextmanager
+    def tracked(self, proc: subprocess.Popen) -> Generator[subprocess.Popen, None, None]:
+        """Kill `proc` if the job is interrupted while the body runs."""
+        with self._lock:
+            interrupted = self.status is not None
+            if not interrupted:
+                self._processes.add(proc)
+        if interrupted:
+            _kill(proc)
+        try:
+            yield proc
+        finally:
+            with self._lock:
+                self._processes.discard(proc)
+
+
+def _kill(proc: subprocess.Popen) -> None:
+    try:
+        if proc.poll() is None:
+            proc.kill()
+    except OSError:
+        pass
+
+
+def checkpoint() -> None:
+    """Raise JobInterrupted if the active job was cancelled or ran out of time."""
+    control = _current.get()
+    if control is not None:
+        control.check()
+
+
+def tracked(proc: subprocess.Popen) -> ContextManager[Any]:
+    """Register a long-lived process (e.g. `git cat-file`) with the active job, if any."""
+    control = _current.get()
+    return control.tracked(proc) if control is not None else nullcontext(proc)
+
+
+def run_process(
+    args: list[str],
+    *,
+    timeout: Optional[float] = None,
+    check: bool = False,
+    **kwargs: Any,
+) -> subprocess.CompletedProcess:
+    """
+    `subprocess.run` bound to the active job: the process is killed when the
+    job is interrupted and its timeout is capped by the job's deadline.
+    Raises JobInterrupted instead of returning the output of a killed process.
+    """
+    control = _current.get()
+    if control is None:
+        return subprocess.run(args, timeout=timeout, check=check, **kwargs)
+
+    control.check()
+    remaining = control.remaining()
+    limit = timeout if remaining is None else max(0.0, remaining if timeout is None else min(timeout, remaining))
+
+    input_data = kwargs.pop("input", None)
+    if kwargs.pop("capture_output", False):
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    if input_data is not None:
+        kwargs["stdin"] = subprocess.PIPE
+
+    with subprocess.Popen(args, **kwargs) as proc:
+        with control.tracked(proc):
+            try:
+                stdout, stderr = proc.communicate(input_data, timeout=limit)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                if timeout is None or limit < timeout:
+                    # The job's deadline, not the command's own timeout, ran out.
+                    control.interrupt(TIMED_OUT)
+                    control.check()
+                raise
+    control.check()
+
+    completed = subprocess.CompletedProcess(args, proc.returncode, stdout, stderr)
+    if check:
+        completed.check_returncode()
+    return completed
@@ -0,0 +1,404 @@
+"""
+Precomputed 3D layout of the file graph.
+
+The viewer places every file on the surface of a planet, so the layout is a
+force-directed layout constrained to the unit sphere: positions are unit
+vectors, edges pull their ends together and all nodes repel each other
+(Fruchterman-Reingold forces, re-projected onto the sphere after every step).
+
+Repulsion uses the Barnes-Hut approximation on an octree: cells that are far
+away compared to their size (opening angle LAYOUT_THETA) act through their
+centroid, nearby nodes act exactly, so a step costs O(n log n) however the
+nodes cluster. The tree walk and the force evaluation are vectorized with
+NumPy. Small graphs get exact forces.
+
+Layouts are deterministic. A file's starting point is derived from its path
+and LAYOUT_SEED, and each history snapshot is warm-started from the previous
+snapshot's positions, so unchanged files stay where they were and new files
+start next to their neighbours.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Optional
+
+import numpy as np
+
+from src.config import config
+from src.services.graph_model import FileGraph
+from src.services.job_control import checkpoint
+
+# Positions are rounded to this many decimals in graph.json.
+PRECISION = 4
+
+# Octree depth (cells of side 2 / 2^depth), cells small enough to act through
+# their members and cells whose nodes share one interaction list.
+_MAX_DEPTH = 10
+_LEAF_SIZE = 8
+_GROUP_SIZE = 64
+# Groups evaluated together as one batch of padded matrix products.
+_CHUNK = 16
+
+
+def seed_positions(paths: list[str], seed: int) -> np.ndarray:
+    """Deterministic, uniformly spread unit vectors, one per path."""
+    if not paths:
+        return np.zeros((0, 3))
+    digests = b"".join(hashlib.blake2b(f"{seed}:{path}".encode("utf-8"), digest_size=8).digest() for path in paths)
+    u, v = (np.frombuffer(digests, dtype="<u4").reshape(-1, 2) / 2 ** 32).T
+    z = 2 * u - 1
+    phi = 2 * np.pi * v
+    r = np.sqrt(1 - z * z)
+    return np.column_stack((r * np.cos(phi), r * np.sin(phi), z))
+
+
+def _normalize(positions: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(positions, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return positions / norms
+
+
+def _spread_bits(values: np.ndarray) -> np.ndarray:
+    """Spread the low 10 bits of each value to every third bit (for Morton codes)."""
+    v = values.astype(np.uint64) & np.uint64(0x3FF)
+    for shift, mask in ((16, 0x030000FF), (8, 0x0300F00F), (4, 0x030C30C3), (2, 0x09249249)):
+        v = (v | (v << np.uint64(shift))) & np.uint64(mask)
+    return v
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, start + length) for each pair."""
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def _padded(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Rows arange(start, start + length), padded with -1 to the longest length."""
+    width = int(lengths.max()) if len(lengths) else 0
+    offsets = np.arange(width)
+    return np.where(offsets[None, :] < lengths[:, None], starts[:, None] + offsets[None, :], -1)
+
+
+class _Level:
+    """Occupied cells of one octree level; cell i holds `order[starts[i]:starts[i] + counts[i]]`."""
+
+    __slots__ = ("side", "codes", "starts", "counts", "centroids", "children_lo", "children_hi")
+
+    def __init__(self, side: float, codes: np.ndarray, starts: np.ndarray, positions: np.ndarray):
+        self.side = side
+        self.codes = codes
+        self.starts = starts
+        self.counts = np.diff(np.append(starts, len(positions)))
+        self.centroids = np.add.reduceat(positions, starts, axis=0) / self.counts[:, None]
+        # Children are the cells children_lo[i]:children_hi[i] of the next level.
+        self.children_lo = self.children_hi = np.zeros(0, dtype=np.int64)
+
+
+class _Octree:
+    """
+    Linear octree of node positions in [-1, 1]^3, built from Morton codes.
+
+    Nodes are sorted by code, so the members of every cell are a contiguous
+    range of `order` and the children of every cell a contiguous range of the
+    next level's cells. Cells that cannot be split further sit at _MAX_DEPTH.
+    """
+
+    def __init__(self, positions: np.ndarray):
+        side = 1 << _MAX_DEPTH
+        coords = np.clip(((positions + 1) / 2 * side).astype(np.int64), 0, side - 1)
+        codes = _spread_bits(coords[:, 0]) << np.uint64(2) | _spread_bits(coords[:, 1]) << np.uint64(1)
+        codes |= _spread_bits(coords[:, 2])
+        self.order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[self.order]
+        sorted_positions = positions[self.order]
+
+        self.levels: list[_Level] = []
+        for depth in range(_MAX_DEPTH + 1):
+            prefixes = sorted_codes >> np.uint64(3 * (_MAX_DEPTH - depth))
+            starts = np.flatnonzero(np.concatenate(([True], prefixes[1:] != prefixes[:-1])))
+            self.levels.append(_Level(2.0 / (1 << depth), prefixes[starts], starts, sorted_positions))
+        for level, below in zip(self.levels, self.levels[1:]):
+            parents = below.codes >> np.uint64(3)
+            level.children_lo = np.searchsorted(parents, level.codes, side="left")
+            level.children_hi = np.searchsorted(parents, level.codes, side="right")
+
+    def children(self, depth: int, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """The children of `cells` at `depth`, and how many each cell has."""
+        level = self.levels[depth]
+        counts = level.children_hi[cells] - level.children_lo[cells]
+        return _ranges(level.children_lo[cells], counts), counts
+
+
+def _target_groups(tree: _Octree, is_target: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split the nodes into the largest cells holding at most _GROUP_SIZE nodes
+    and keep those with targets. Returns each group's first row in `tree.order`,
+    its node count and its centroid.
+    """
+    target_prefix = np.concatenate(([0], np.cumsum(is_target[tree.order])))
+    starts, counts, centroids = [], [], []
+    cells = np.zeros(1, dtype=np.int64)
+    for depth, level in enumerate(tree.levels):
+        small = (level.counts[cells] <= _GROUP_SIZE) | (depth == _MAX_DEPTH)
+        group_cells = cells[small]
+        first = level.starts[group_cells]
+        has_targets = target_prefix[first + level.counts[group_cells]] > target_prefix[first]
+        starts.append(first[has_targets])
+        counts.append(level.counts[group_cells][has_targets])
+        centroids.append(level.centroids[group_cells][has_targets])
+        if depth == _MAX_DEPTH:
+            break
+        cells, _ = tree.children(depth, cells[~small])
+    return np.concatenate(starts), np.concatenate(counts), np.concatenate(centroids)
+
+
+def _interactions(
+    tree: _Octree,
+    positions: np.ndarray,
+    centers: np.ndarray,
+    radii: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Walk the octree for every group (center, radius) at once, one level at a
+    time. A cell whose side is below LAYOUT_THETA times its distance from the
+    group's nearest possible member acts through its centroid, a leaf cell
+    through each of its nodes, and any other cell is opened.
+
+    Returns the sources as (group, point, weight, node) columns; node is -1
+    for a cell centroid.
+    """
+    theta = config.LAYOUT_THETA
+    groups = np.arange(len(centers))
+    cells = np.zeros(len(centers), dtype=np.int64)
+    columns: list[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = []
+    for depth, level in enumerate(tree.levels):
+        if not len(groups):
+            break
+        counts = level.counts[cells]
+        gap = np.linalg.norm(centers[groups] - level.centroids[cells], axis=1) - radii[groups]
+        far = level.side < theta * gap
+        columns.append((groups[far], level.centroids[cells[far]], counts[far].astype(float), np.full(far.sum(), -1)))
+
+        leaf = ~far & ((counts <= _LEAF_SIZE) | (depth == _MAX_DEPTH))
+        nodes = tree.order[_ranges(level.starts[cells[leaf]], counts[leaf])]
+        columns.append((np.repeat(groups[leaf], counts[leaf]), positions[nodes], np.ones(len(nodes)), nodes))
+
+        if depth == _MAX_DEPTH:
+            break
+        opened = ~far & ~leaf
+        cells, child_counts = tree.children(depth, cells[opened])
+        groups = np.repeat(groups[opened], child_counts)
+    source_groups, points, weights, nodes = (np.concatenate(column) for column in zip(*columns))
+    order = np.argsort(source_groups, kind="stable")
+    return source_groups[order], points[order], weights[order], nodes[order]
+
+
+def _repulsion(positions: np.ndarray, k2: float, targets: np.ndarray) -> np.ndarray:
+    """
+    k^2/d repulsion on the nodes `targets` (indices) from all nodes, with the
+    Barnes-Hut approximation.
+
+    Nearby targets share one interaction list: they are grouped by octree
+    cell, each group walks the tree once, and the forces on a group's targets
+    are then evaluated against its list, batched as padded matrix products.
+    """
+    tree = _Octree(positions)
+    is_target = np.zeros(len(positions), dtype=bool)
+    is_target[targets] = True
+
+    group_starts, group_counts, centers = _target_groups(tree, is_target)
+    member_group = np.repeat(np.arange(len(group_starts)), group_counts)
+    members = tree.order[_ranges(group_starts, group_counts)]
+    radii = np.zeros(len(group_starts))
+    np.maximum.at(radii, member_group, np.linalg.norm(positions[members] - centers[member_group], axis=1))
+
+    source_groups, source_points, source_weights, source_nodes = _interactions(tree, positions, centers, radii)
+    source_counts = np.bincount(source_groups, minlength=len(group_starts))
+    source_bounds = np.concatenate(([0], np.cumsum(source_counts)))
+
+    target_members = members[is_target[members]]
+    target_counts = np.bincount(member_group[is_target[members]], minlength=len(group_starts))
+    target_bounds = np.concatenate(([0], np.cumsum(target_counts)))
+
+    forces = np.zeros((len(positions), 3))
+    # Groups of similar sizes are padded into one batch.
+    by_size = np.lexsort((source_counts, target_counts))
+    for start in range(0, len(by_size), _CHUNK):
+        chunk = by_size[start:start + _CHUNK]
+        rows = _padded(target_bounds[chunk], target_counts[chunk])
+        cols = _padded(source_bounds[chunk], source_counts[chunk])
+        nodes = np.where(rows >= 0, target_members[rows], -1)
+        points = positions[nodes]
+        others = source_points[cols]
+        weights = np.where(cols >= 0, source_weights[cols], 0.0)[:, None, :]
+
+        # sum_j w_j (p - o_j) / d_j^2 = p * sum_j s_j - S @ o, without (a, b, 3) temporaries.
+        dist2 = points @ others.transpose(0, 2, 1)
+        dist2 *= -2
+        dist2 += np.einsum("bgk,bgk->bg", points, points)[:, :, None]
+        dist2 += np.einsum("bsk,bsk->bs", others, others)[:, None, :]
+        # A target is among the sources of its own leaf; it exerts no force on itself.
+        dist2[nodes[:, :, None] == np.where(cols >= 0, source_nodes[cols], -1)[:, None, :]] = np.inf
+        np.maximum(dist2, 1e-9, out=dist2)
+        scale = np.divide(weights, dist2, out=dist2)
+        batch = k2 * (points * scale.sum(axis=2)[:, :, None] - scale @ others)
+        forces[nodes[rows >= 0]] = batch[rows >= 0]
+    return forces[targets]
+
+
+def _attraction(positions: np.ndarray, edges: np.ndarray, k: float) -> np.ndarray:
+    forces = np.zeros_like(positions)
+    if not len(edges):
+        return forces
+    source, target = edges[:, 0], edges[:, 1]
+    delta = positions[target] - positions[source]
+    pull = delta * (np.linalg.norm(delta, axis=1, keepdims=True) / k)
+    n = len(positions)
+    for axis in range(3):
+        forces[:, axis] += np.bincount(source, weights=pull[:, axis], minlength=n)
+        forces[:, axis] -= np.bincount(target, weights=pull[:, axis], minlength=n)
+    return forces
+
+
+def force_layout(
+    positions: np.ndarray,
+    edges: np.ndarray,
+    iterations: int,
+    temperature: float,
+    movable: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Relax `positions` (unit vectors) for `iterations` steps.
+
+    `edges` is an (m, 2) array of node indices; `temperature` is the largest
+    step of the first iteration and cools linearly to zero. Nodes outside the
+    boolean mask `movable` keep their positions but still exert forces; only
+    forces on movable nodes are computed.
+    """
+    n = len(positions)
+    positions = _normalize(positions.astype(float))
+    if n < 2 or iterations <= 0 or (movable is not None and not movable.any()):
+        return positions
+
+    # Ideal edge length: the side of the sphere area each node gets.
+    k = np.sqrt(4 * np.pi / n)
+    targets = np.arange(n) if movable is None else np.flatnonzero(movable)
+    for step in range(iterations):
+        checkpoint()
+        moving = positions[targets]
+        forces = _repulsion(positions, k * k, targets) + _attraction(positions, edges, k)[targets]
+        # Only the tangential part moves a node along the sphere.
+        forces -= np.einsum("ij,ij->i", forces, moving)[:, None] * moving
+        length = np.linalg.norm(forces, axis=1, keepdims=True)
+        limit = temperature * (1 - step / iterations)
+        forces *= np.minimum(1, limit / np.maximum(length, 1e-12))
+        positions[targets] = _normalize(moving + forces)
+    return positions
+
+
+def _edge_array(graph: FileGraph) -> np.ndarray:
+    """Distinct (source, target) node pairs of `graph` without self-loops, sorted."""
+    n = graph.node_count
+    sources = np.array(graph.sources(), dtype=np.int64)
+    targets = np.array(graph.targets, dtype=np.int64)
+    keep = sources != targets
+    keys = np.unique(sources[keep] * n + targets[keep])
+    return np.column_stack((keys // max(n, 1), keys % max(n, 1)))
+
+
+def _warm_start(
+    paths: list[str],
+    edges: np.ndarray,
+    known: np.ndarray,
+    known_positions: np.ndarray,
+    seed: int,
+) -> np.ndarray:
+    """Previous positions for `known` nodes; new ones start at their placed neighbours' centroid."""
+    positions = seed_positions(paths, seed)
+    positions[known] = known_positions
+
+    new = ~known
+    if new.any() and known.any() and len(edges):
+        both = np.concatenate((edges, edges[:, ::-1]))
+        both = both[new[both[:, 0]] & known[both[:, 1]]]
+        if len(both):
+            n = len(paths)
+            sums = np.column_stack([
+                np.bincount(both[:, 0], weights=positions[both[:, 1], axis], minlength=n) for axis in range(3)
+            ])
+            placed = np.bincount(both[:, 0], minlength=n) > 0
+            # Nudge towards the seeded point so files sharing neighbours do not coincide.
+            positions[placed] = _normalize(sums[placed]) + 0.05 * positions[placed]
+    return _normalize(positions)
+
+
+def layout_graphs(
+    graphs: list[FileGraph],
+    iterations: Optional[int] = None,
+    warm_iterations: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> list[np.ndarray]:
+    """
+    Lay out a sequence of graphs (snapshots in chronological order) that share
+    one path table.
+
+    The first graph gets a full layout. Each later one starts from the previous
+    result and only files that were added or whose edges changed are relaxed,
+    so consecutive layouts differ only where the graph changed. Returns an
+    (n, 3) array of rounded positions per graph, one row per node.
+    """
+    iterations = config.LAYOUT_ITERATIONS if iterations is None else iterations
+    warm_iterations = config.LAYOUT_WARM_ITERATIONS if warm_iterations is None else warm_iterations
+    seed = config.LAYOUT_SEED if seed is None else seed
+    size = max((len(graph.paths) for graph in graphs), default=0)
+
+    layouts: list[np.ndarray] = []
+    previous: Optional[np.ndarray] = None
+    previous_rows = np.full(size, -1, dtype=np.int64)
+    previous_pairs = np.zeros(0, dtype=np.int64)
+    for graph in graphs:
+        paths = graph.node_paths()
+        node_ids = np.array(graph.node_ids, dtype=np.int64)
+        edges = _edge_array(graph)
+        # Edges keyed by path ids, so they compare across snapshots.
+        pairs = node_ids[edges[:, 0]] * size + node_ids[edges[:, 1]]
+
+        rows = previous_rows[node_ids]
+        if previous is None:
+            positions = force_layout(seed_positions(paths, seed), edges, iterations, temperature=0.5)
+            movable = np.ones(len(paths), dtype=bool)
+        else:
+            known = rows >= 0
+            changed = np.setxor1d(pairs, previous_pairs)
+            movable = ~known | np.isin(node_ids, np.concatenate((changed // size, changed % size)))
+            positions = force_layout(
+                _warm_start(paths, edges, known, previous[rows[known]], seed),
+                edges, warm_iterations, temperature=0.05, movable=movable,
+            )
+
+        positions = np.round(positions, PRECISION)
+        if previous is not None:
+            positions[~movable] = previous[rows[~movable]]
+        layouts.append(positions)
+        previous, previous_pairs = positions, pairs
+        previous_rows = np.full(size, -1, dtype=np.int64)
+        previous_rows[node_ids] = np.arange(len(node_ids))
+    return layouts
+
+
+def diff_layout(
+    previous_graph: Optional[FileGraph],
+    previous: Optional[np.ndarray],
+    graph: FileGraph,
+    positions: np.ndarray,
+) -> dict[str, list[float]]:
+    """Positions of `graph` that are new or differ from the previous graph's, by path."""
+    changed = np.ones(graph.node_count, dtype=bool)
+    if previous_graph is not None and previous is not None:
+        rows = {path_id: row for row, path_id in enumerate(previous_graph.node_ids)}
+        for node, path_id in enumerate(graph.node_ids):
+            row = rows.get(path_id)
+            if row is not None:
+                changed[node] = bool((previous[row] != positions[node]).any())
+    return {graph.path(node): positions[node].tolist() for node in np.flatnonzero(changed)}
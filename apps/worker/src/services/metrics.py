@@ -0,0 +1,220 @@
+"""
+Lightweight per-job instrumentation.
+
+A job creates a JobMetrics and activates it; code anywhere below can then open
+spans with `span(name)` and add counters with `add_counts()` without the
+metrics object being passed through every call. Outside an active job both are
+no-ops. Each span records wall time, CPU time (own and of finished child
+processes such as git), the process's peak RSS, files scanned and bytes read.
+
+Spans of known stages also drive job progress: a stage moves progress to the
+start of its range, and `report_progress()` moves it within the range, e.g.
+per analyzed snapshot.
+
+Finished jobs are accumulated into per-process totals, which can be written in
+the Prometheus text format to a node_exporter textfile directory.
+"""
+
+from __future__ import annotations
+
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Generator, Optional
+
+from src.config import config
+
+# stage -> (progress at start, progress at end, message)
+STAGES: dict[str, tuple[float, float, str]] = {
+    "clone": (0.05, 0.15, "Cloning repository..."),
+    "commit_selection": (0.15, 0.2, "Selecting commits..."),
+    "snapshots": (0.2, 0.8, "Analyzing code structure..."),
+    "graph": (0.8, 0.81, "Building graph..."),
+    "analytics": (0.81, 0.82, "Computing graph metrics..."),
+    "layout": (0.82, 0.88, "Computing layout..."),
+    "history": (0.88, 0.89, "Reading history..."),
+    "serialize": (0.89, 0.9, "Serializing results..."),
+    "upload": (0.9, 0.99, "Uploading results..."),
+}
+
+# Own CPU time is per thread where supported, so stages of different jobs
+# running side by side in the pipeline do not count each other's work.
+_RUSAGE_OWN = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+
+_current: ContextVar[Optional["JobMetrics"]] = ContextVar("codeviz_job_metrics", default=None)
+
+
+def _cpu_seconds(usage: resource.struct_rusage) -> float:
+    return usage.ru_utime + usage.ru_stime
+
+
+class JobMetrics:
+    """Spans, counters and progress of one job."""
+
+    def __init__(self, on_progress: Optional[Callable[[float, str], None]] = None):
+        self.on_progress = on_progress
+        self.spans: list[dict[str, Any]] = []
+        self.outcome = "failed"
+        # (stage, done, total) of the latest progress report, kept for partial stats.
+        self.position: Optional[tuple[str, int, int]] = None
+        self._open: list[dict[str, Any]] = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def activate(self) -> Generator["JobMetrics", None, None]:
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def progress(self, stage: str, done: int = 0, total: int = 1, message: Optional[str] = None) -> None:
+        if stage not in STAGES:
+            return
+        self.position = (stage, done, total)
+        if self.on_progress is None:
+            return
+        start, end, default_message = STAGES[stage]
+        fraction = min(1.0, done / total) if total > 0 else 1.0
+        self.on_progress(round(start + (end - start) * fraction, 3), message or default_message)
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Generator[dict[str, Any], None, None]:
+        self.progress(name)
+        record: dict[str, Any] = {"name": name, **attrs, "files": 0, "bytesRead": 0}
+        wall = time.perf_counter()
+        cpu = _cpu_seconds(resource.getrusage(_RUSAGE_OWN))
+        child_cpu = _cpu_seconds(resource.getrusage(resource.RUSAGE_CHILDREN))
+        self._open.append(record)
+        try:
+            yield record
+        finally:
+            self._open.remove(record)
+            self_usage = resource.getrusage(resource.RUSAGE_SELF)
+            record["wallMs"] = round((time.perf_counter() - wall) * 1000, 1)
+            record["cpuMs"] = round((_cpu_seconds(resource.getrusage(_RUSAGE_OWN)) - cpu) * 1000, 1)
+            record["childCpuMs"] = round(
+                (_cpu_seconds(resource.getrusage(resource.RUSAGE_CHILDREN)) - child_cpu) * 1000, 1
+            )
+            # ru_maxrss is in KiB on Linux: the process high-water mark so far.
+            record["peakRssKb"] = self_usage.ru_maxrss
+            self.spans.append(record)
+
+    def add_counts(self, files: int = 0, bytes_read: int = 0) -> None:
+        """Add to the innermost open span."""
+        if self._open:
+            self._open[-1]["files"] += files
+            self._open[-1]["bytesRead"] += bytes_read
+
+    def to_stats(self) -> dict[str, Any]:
+        return {
+            "totalMs": round((time.perf_counter() - self._started) * 1000, 1),
+            "peakRssKb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "spans": self.spans,
+        }
+
+
+def span(name: str, **attrs: Any) -> ContextManager[Optional[dict[str, Any]]]:
+    """Open a span on the active job, if any."""
+    metrics = _current.get()
+    return metrics.span(name, **attrs) if metrics is not None else nullcontext()
+
+
+def add_counts(files: int = 0, bytes_read: int = 0) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_counts(files, bytes_read)
+
+
+def report_progress(stage: str, done: int, total: int, message: Optional[str] = None) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.progress(stage, done, total, message)
+
+
+# Per-process totals since start, exported as Prometheus counters. Jobs can
+# finish on any stage thread of the pipeline, hence the lock.
+_totals_lock = threading.Lock()
+_jobs: dict[str, int] = {}
+_stages: dict[str, dict[str, float]] = {}
+_last_job_seconds = 0.0
+
+
+def record_job(metrics: JobMetrics) -> None:
+    """Fold a finished job into the process totals and refresh the textfile."""
+    global _last_job_seconds
+    with _totals_lock:
+        _jobs[metrics.outcome] = _jobs.get(metrics.outcome, 0) + 1
+        for record in metrics.spans:
+            totals = _stages.setdefault(
+                record["name"], {"runs": 0, "wall": 0.0, "cpu": 0.0, "childCpu": 0.0, "files": 0, "bytesRead": 0}
+            )
+            totals["runs"] += 1
+            totals["wall"] += record["wallMs"] / 1000
+            totals["cpu"] += record["cpuMs"] / 1000
+            totals["childCpu"] += record["childCpuMs"] / 1000
+            totals["files"] += record["files"]
+            totals["bytesRead"] += record["bytesRead"]
+        _last_job_seconds = time.perf_counter() - metrics._started
+
+        if config.METRICS_TEXTFILE_DIR:
+            try:
+                write_textfile(Path(config.METRICS_TEXTFILE_DIR))
+            except Exception as e:
+                print(f"[Metrics] Could not write textfile: {e}")
+
+
+def render_prometheus() -> str:
+    pid = os.getpid()
+    lines: list[str] = []
+
+    def metric(name: str, kind: str, help_text: str, samples: list[tuple[dict[str, Any], float]]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{val}"' for key, val in {"pid": pid, **labels}.items())
+            lines.append(f"{name}{{{label_text}}} {round(value, 6)}")
+
+    metric("codeviz_jobs_total", "counter", "Jobs processed by this worker process.",
+           [({"outcome": outcome}, count) for outcome, count in sorted(_jobs.items())])
+    for key, name, help_text in (
+        ("runs", "codeviz_stage_runs_total", "Spans recorded per stage."),
+        ("wall", "codeviz_stage_wall_seconds_total", "Wall time spent per stage."),
+        ("cpu", "codeviz_stage_cpu_seconds_total", "Worker CPU time spent per stage."),
+        ("childCpu", "codeviz_stage_child_cpu_seconds_total", "CPU time of child processes (git) per stage."),
+        ("files", "codeviz_stage_files_scanned_total", "Files scanned per stage."),
+        ("bytesRead", "codeviz_stage_bytes_read_total", "Bytes of file content read per stage."),
+    ):
+        metric(name, "counter", help_text, [({"stage": stage}, totals[key]) for stage, totals in sorted(_stages.items())])
+    metric("codeviz_peak_rss_bytes", "gauge", "Peak resident set size of this worker process.",
+           [({}, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)])
+    metric("codeviz_last_job_seconds", "gauge", "Wall time of the last job.", [({}, round(_last_job_seconds, 3))])
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(directory: Path) -> None:
+    """Write this process's metrics to `<dir>/codeviz-worker-<pid>.prom` and drop files of dead workers."""
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("codeviz-worker-*.prom"):
+        pid = stale.stem.rsplit("-", 1)[-1]
+        if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            stale.unlink(missing_ok=True)
+
+    path = directory / f"codeviz-worker-{os.getpid()}.prom"
+    tmp_path = path.with_suffix(".prom.tmp")
+    tmp_path.write_text(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,102 @@
+"""
+Opt-in per-job profiling.
+
+A profiled job runs its analysis under cProfile and tracemalloc and keeps two
+artifacts next to its graph.json: `profile.prof` (load it with pstats or
+snakeviz) and `allocations.txt`, a report of the peak traced memory, the
+source lines whose allocations are still alive when the analysis returns and
+the slowest functions by cumulative time.
+
+Jobs are profiled when their payload asks for it (`"profile": true`) or, for
+jobs that do not say, by sampling PROFILE_SAMPLE_RATE of them. Only the job's
+own process and thread are profiled; work done in the parallel extraction
+pool or in git subprocesses shows up as time spent waiting on them.
+tracemalloc traces every thread of the process, so the job pipeline runs a
+profiled analysis with its fetch and publish stages stopped.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import tracemalloc
+from contextlib import contextmanager
+from typing import Generator, Optional
+
+from src.config import config
+
+
+def should_profile(requested: Optional[bool] = None) -> bool:
+    """An explicit payload flag wins; otherwise sample PROFILE_SAMPLE_RATE of jobs."""
+    if requested is not None:
+        return bool(requested)
+    return config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE
+
+
+class JobProfile:
+    """cProfile and tracemalloc results of one profiled section."""
+
+    def __init__(self) -> None:
+        self.profiler = cProfile.Profile()
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_bytes = 0
+
+    @contextmanager
+    def capture(self) -> Generator["JobProfile", None, None]:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(config.PROFILE_TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        self.profiler.enable()
+        try:
+            yield self
+        finally:
+            self.profiler.disable()
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            self.snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            if started_tracing:
+                tracemalloc.stop()
+
+    def prof_bytes(self) -> bytes:
+        """The profile in the binary format written by `pstats.Stats.dump_stats`."""
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+    def report(self, top: Optional[int] = None) -> str:
+        """Top allocation sites and the slowest functions as plain text."""
+        top = top or config.PROFILE_TOP_N
+        out = io.StringIO()
+        out.write(f"Peak traced memory: {self.peak_bytes / 1024 / 1024:.1f} MiB\n\n")
+
+        if self.snapshot is not None:
+            stats = self.snapshot.statistics("lineno")
+            total = sum(stat.size for stat in stats)
+            out.write(f"Top {top} allocation sites still held at the end "
+                      f"({total / 1024 / 1024:.1f} MiB in total):\n")
+            for index, stat in enumerate(stats[:top], 1):
+                frame = stat.traceback[0]
+                out.write(f"{index:4}. {frame.filename}:{frame.lineno}: "
+                          f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            out.write("\n")
+
+        out.write(f"Top {top} functions by cumulative time:\n")
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(top)
+        return out.getvalue()
+
+
+@contextmanager
+def maybe_profile(enabled: bool) -> Generator[Optional[JobProfile], None, None]:
+    """Profile the body when `enabled`, yielding the JobProfile (or None)."""
+    if not enabled:
+        yield None
+        return
+
+    profile = JobProfile()
+    with profile.capture():
+        yield profile
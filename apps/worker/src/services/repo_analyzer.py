@@ -9,30 +9,109 @@ Repository analyzer that:
 
 from __future__ import annotations
 
+import heapq
+import multiprocessing
 import os
 import re
 import shutil
 import subprocess
 import tempfile
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Callable, Generator, Iterator, Optional
+
+import numpy as np
+
+from src.config import config
+from src.services.analysis_cache import AnalysisCache, get_analysis_cache
+from src.services.git_objects import (
+    GitObjectReader,
+    list_modified_paths,
+    list_tree_blob_sizes,
+    list_tree_blobs,
+    read_blob_sizes,
+)
+from src.services.graph_analytics import compute_analytics
+from src.services.graph_model import FileGraph, FileRecord, PathTable, edge_type
+from src.services.hierarchy import add_directory_levels, place_directories
+from src.services.ingestion import IngestPolicy, is_binary
+from src.services.job_control import JobInterrupted, checkpoint, run_process, tracked
+from src.services.layout import diff_layout, layout_graphs
+from src.services.metrics import add_counts, report_progress, span
+from src.services.repo_cache import get_mirror_store
+
+
+def resolve_revision(repo_path: Path, ref: str) -> Optional[str]:
+    """Resolve a branch, tag or SHA to a commit, trying remote branches too."""
+    for candidate in (ref, f"origin/{ref}"):
+        result = run_process(
+            ["git", "rev-parse", "--verify", "--quiet", f"{candidate}^{{commit}}"],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+    return None
+
+
+def resolve_remote_commit(repo_url: str, ref: Optional[str]) -> Optional[str]:
+    """
+    Resolve a ref to a commit SHA with `git ls-remote`, without cloning.
+
+    Tags win over branches of the same name, as in `git rev-parse`.
+    """
+    if ref and re.fullmatch(r"[0-9a-fA-F]{40}", ref):
+        return ref.lower()
+
+    target = ref or "HEAD"
+    try:
+        result = run_process(
+            ["git", "ls-remote", repo_url, target, f"{target}^{{}}"],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    except subprocess.TimeoutExpired:
+        return None
+    if result.returncode != 0:
+        return None
+
+    refs: dict[str, str] = {}
+    for line in result.stdout.splitlines():
+        sha, _, name = line.partition("\t")
+        refs[name] = sha
+
+    if target == "HEAD":
+        return refs.get("HEAD")
+    for name in (f"refs/tags/{target}^{{}}", f"refs/tags/{target}", f"refs/heads/{target}", target):
+        if name in refs:
+            return refs[name]
+    return None
 
 
 def clone_repository(repo_url: str, ref: Optional[str], target_dir: str) -> bool:
     """Clone a git repository to the target directory."""
     try:
-        # Full history is needed for historical snapshots.
-        subprocess.run(
-            ["git", "clone", repo_url, target_dir],
+        # Full history is needed for historical snapshots. Snapshots are read
+        # from the object database, so no working tree is ever written.
+        run_process(
+            ["git", "clone", "--no-checkout", repo_url, target_dir],
             check=True,
             capture_output=True,
             timeout=300,
         )
 
         if ref:
-            subprocess.run(
-                ["git", "checkout", ref],
+            commit = resolve_revision(Path(target_dir), ref)
+            if not commit:
+                raise Exception(f"Unknown ref: {ref}")
+            # Detach HEAD at the ref without touching the (empty) working tree.
+            run_process(
+                ["git", "update-ref", "--no-deref", "HEAD", commit],
                 cwd=target_dir,
                 check=True,
                 capture_output=True,
@@ -40,320 +119,1078 @@ def clone_repository(repo_url: str, ref: Optional[str], target_dir: str) -> bool
             )
 
         return True
+    except JobInterrupted:
+        raise
     except Exception as e:
         print(f"[Analyzer] Clone failed: {e}")
         return False
 
 
-def get_impactful_commits(repo_path: Path) -> list[dict[str, Any]]:
-    """Pick impactful commits by insertions+deletions and include HEAD."""
-    cmd = ["git", "log", "--pretty=format:%H|%cd", "--shortstat"]
-    result = subprocess.run(
-        cmd,
+def iter_commit_stats(repo_path: Path, rev: str = "HEAD") -> Iterator[dict[str, Any]]:
+    """
+    Stream commits of `rev` (newest first) with their insertions+deletions.
+
+    Output is parsed line by line from the running `git log`, so memory does
+    not grow with the length of the history.
+    """
+    proc = subprocess.Popen(
+        ["git", "log", "--pretty=format:%H|%ct|%cd", "--shortstat", rev],
         cwd=repo_path,
-        capture_output=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
         text=True,
         encoding="utf-8",
         errors="ignore",
     )
 
-    commits: list[dict[str, Any]] = []
     current_commit: Optional[dict[str, Any]] = None
+    try:
+        with tracked(proc):
+            for line in proc.stdout:
+                if "|" in line:
+                    if current_commit is not None:
+                        yield current_commit
+                    parts = line.rstrip("\n").split("|", 2)
+                    current_commit = {
+                        "hash": parts[0],
+                        "date": parts[2] if len(parts) > 2 else "",
+                        "impact": 0,
+                        "timestamp": int(parts[1]) if parts[1].isdigit() else 0,
+                    }
+                elif current_commit is not None and "changed" in line:
+                    insertions = 0
+                    deletions = 0
+                    ins_match = re.search(r"(\d+) insertion", line)
+                    del_match = re.search(r"(\d+) deletion", line)
+                    if ins_match:
+                        insertions = int(ins_match.group(1))
+                    if del_match:
+                        deletions = int(del_match.group(1))
+                    current_commit["impact"] = insertions + deletions
+
+            # A killed `git log` ends early; never pass that off as the whole history.
+            checkpoint()
+            if current_commit is not None:
+                yield current_commit
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
 
-    lines = result.stdout.splitlines()
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        if "|" in line:
-            parts = line.split("|", 1)
-            current_commit = {"hash": parts[0], "date": parts[1], "impact": 0}
-            i += 1
-
-            if i < len(lines) and lines[i].strip() == "":
-                i += 1
-            if i < len(lines) and "changed" in lines[i]:
-                stat = lines[i]
-                insertions = 0
-                deletions = 0
-                ins_match = re.search(r"(\d+) insertion", stat)
-                del_match = re.search(r"(\d+) deletion", stat)
-                if ins_match:
-                    insertions = int(ins_match.group(1))
-                if del_match:
-                    deletions = int(del_match.group(1))
-                current_commit["impact"] = insertions + deletions
-
-            commits.append(current_commit)
-        i += 1
 
-    if not commits:
+def get_root_timestamp(repo_path: Path, rev: str = "HEAD") -> Optional[int]:
+    """Commit time of the oldest root commit reachable from `rev`."""
+    result = run_process(
+        ["git", "log", "--max-parents=0", "--format=%ct", rev],
+        cwd=repo_path,
+        capture_output=True,
+        text=True,
+    )
+    timestamps = [int(t) for t in result.stdout.split() if t.isdigit()]
+    return min(timestamps) if timestamps else None
+
+
+def get_impactful_commits(
+    repo_path: Path,
+    rev: str = "HEAD",
+    count: Optional[int] = None,
+    mode: Optional[str] = None,
+) -> list[dict[str, Any]]:
+    """
+    Pick impactful commits by insertions+deletions and include HEAD.
+
+    Returns up to `count` commits (SNAPSHOT_COUNT by default), oldest first.
+    In "impact" mode these are HEAD plus the highest-impact other commits; in
+    "spread" mode the history is cut into equal date buckets and the most
+    impactful commit of each bucket is kept, so snapshots cover the project's
+    whole lifetime. Only a bounded number of candidates is ever held in memory.
+    """
+    count = count if count is not None else config.SNAPSHOT_COUNT
+    mode = mode or config.SNAPSHOT_SELECTION
+    if count <= 0:
         return []
 
-    sorted_by_impact = sorted(commits, key=lambda x: x["impact"], reverse=True)
-    top_commits = sorted_by_impact[:9]
-    head_commit = commits[0]
+    commits = iter_commit_stats(repo_path, rev)
+    head_commit = next(commits, None)
+    if head_commit is None:
+        return []
 
-    if head_commit not in top_commits:
-        if top_commits:
-            top_commits.pop()
-        top_commits.append(head_commit)
+    # Candidates are ranked by (impact, -position): among equal impact the
+    # newer commit wins, like a stable sort of the full history would.
+    if mode == "spread":
+        root_ts = get_root_timestamp(repo_path, rev)
+        head_ts = head_commit["timestamp"]
+        buckets = count - 1
+        lifetime = max(1, head_ts - (root_ts if root_ts is not None else head_ts))
+        best: dict[int, tuple[int, int, dict[str, Any]]] = {}
+        for position, commit in enumerate(commits, start=1):
+            offset = min(max(commit["timestamp"] - (head_ts - lifetime), 0), lifetime - 1)
+            bucket = offset * buckets // lifetime if buckets else 0
+            candidate = (commit["impact"], -position, commit)
+            if buckets and (bucket not in best or candidate[:2] > best[bucket][:2]):
+                best[bucket] = candidate
+        selected = [(-position, commit) for _impact, position, commit in best.values()]
+    else:
+        heap: list[tuple[int, int, dict[str, Any]]] = []
+        for position, commit in enumerate(commits, start=1):
+            candidate = (commit["impact"], -position, commit)
+            if len(heap) < count - 1:
+                heapq.heappush(heap, candidate)
+            elif heap and candidate[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, candidate)
+        selected = [(-position, commit) for _impact, position, commit in heap]
+
+    selected.append((0, head_commit))
+    selected.sort(key=lambda item: item[0], reverse=True)
+    return [commit for _position, commit in selected]
+
+
+# Bump whenever extract_file_facts changes its output, so cached facts are not reused.
+EXTRACTOR_VERSION = 2
+
+SUPPORTED_EXTS = {
+    ".kt": "kotlin",
+    ".java": "java",
+    ".py": "python",
+    ".xml": "xml",
+    ".gradle": "gradle",
+    ".kts": "gradle",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".vue": "vue",
+    ".c": "c",
+    ".cpp": "cpp",
+    ".h": "c",
+    ".hpp": "cpp",
+    ".cc": "cpp",
+    ".json": "json",
+}
+
+
+def detect_language(rel_path: str) -> Optional[str]:
+    """Map a repository path to its language, or None if it is not analyzed."""
+    name = os.path.basename(rel_path)
+    ext = os.path.splitext(name)[1]
+    lang = SUPPORTED_EXTS.get(ext)
+    if ext == ".kts" and "gradle" not in name:
+        lang = "kotlin"
+    return lang
+
+
+def extractor_key(rel_path: str) -> str:
+    """Identify the extractor (and its version) that handles this path."""
+    ext = os.path.splitext(rel_path)[1]
+    return f"{ext}:{detect_language(rel_path)}:v{EXTRACTOR_VERSION}"
+
+
+def extract_file_facts(rel_path: str, content: str) -> dict[str, Any]:
+    """
+    Run the per-language regexes over a file once.
+
+    The result only depends on the file content and its extractor, so it can be
+    cached by blob hash. Imports are kept as raw (dependency type, hint) pairs
+    and resolved against a symbol map later.
+    """
+    ext = os.path.splitext(rel_path)[1]
+    package: Optional[str] = None
+    imports: list[list[str]] = []
 
-    indices = {c["hash"]: i for i, c in enumerate(commits)}
-    top_commits.sort(key=lambda x: indices[x["hash"]], reverse=True)
+    if ext in [".kt", ".java"]:
+        pkg_match = re.search(r"^\s*package\s+([\w\.]+)", content, re.MULTILINE)
+        if pkg_match:
+            package = pkg_match.group(1)
+        for imp in re.findall(r"^\s*import\s+([\w\.]+)", content, re.MULTILINE):
+            imports.append(["file_dependency", imp])
 
-    return top_commits
+    elif ext == ".py":
+        py_imports = re.findall(r"^(?:from\s+([\w\.]+)\s+import|import\s+([\w\.]+))", content, re.MULTILINE)
+        for match in py_imports:
+            imports.append(["file_dependency", match[0] if match[0] else match[1]])
 
+    elif ext == ".xml":
+        for layout in re.findall(r"@layout/([\w_]+)", content):
+            imports.append(["layout_include", f"@layout/{layout}"])
+        for cls in re.findall(r"<\s*([\w\.]+)", content):
+            if "." in cls:
+                imports.append(["class_reference", cls])
 
-def build_symbol_map(repo_path: Path) -> dict[str, str]:
-    """Index symbols to file paths for dependency resolution."""
-    symbol_map: dict[str, str] = {}
+    elif ext in [".gradle", ".kts"]:
+        for inc in re.findall(r"include\s*\(?[\"']:(.+?)[\"']\)?", content):
+            imports.append(["module_include", inc.replace(":", "/")])
 
-    for path in repo_path.rglob("*"):
-        if path.is_dir() or ".git" in path.parts:
-            continue
+    elif ext in [".c", ".cpp", ".h", ".hpp", ".cc"]:
+        for inc in re.findall(r"#include\s*[\"<](.+?)[\">]", content):
+            imports.append(["include", os.path.basename(inc)])
 
-        rel_path = path.relative_to(repo_path).as_posix()
-        ext = path.suffix
-        stem = path.stem
-        filename = path.name
+    elif ext in [".js", ".jsx", ".ts", ".tsx", ".vue"]:
+        for imp_path in re.findall(r"(?:from|require\s*\()\s*[\"']([\./@][^\"']+)[\"']", content):
+            imports.append(["import", imp_path])
+
+    return {
+        "language": detect_language(rel_path),
+        "line_count": len(content.splitlines()),
+        "package": package,
+        "imports": imports,
+    }
 
-        try:
-            content = path.read_text(errors="ignore", encoding="utf-8")
-        except Exception:
-            continue
 
-        if ext in [".kt", ".java"]:
-            pkg_match = re.search(r"^\s*package\s+([\w\.]+)", content, re.MULTILINE)
-            if pkg_match:
-                package_name = pkg_match.group(1)
-                full_class_name = f"{package_name}.{stem}"
-                symbol_map[full_class_name] = rel_path
+def symbol_keys(rel_path: str, facts: dict[str, Any]) -> list[str]:
+    """List the symbols a single file provides."""
+    ext = os.path.splitext(rel_path)[1]
+    stem = os.path.splitext(os.path.basename(rel_path))[0]
+    filename = os.path.basename(rel_path)
 
-        elif ext == ".py":
-            if stem == "__init__":
-                module_name = rel_path.replace("/", ".").replace(".__init__.py", "")
-            else:
-                module_name = rel_path.replace("/", ".").replace(".py", "")
-            symbol_map[module_name] = rel_path
+    if ext in [".kt", ".java"]:
+        if facts.get("package"):
+            return [f"{facts['package']}.{stem}"]
 
-        elif ext == ".xml" and "layout" in path.parts:
-            resource_name = f"@layout/{stem}"
-            symbol_map[resource_name] = rel_path
+    elif ext == ".py":
+        if stem == "__init__":
+            module_name = rel_path.replace("/", ".").replace(".__init__.py", "")
+        else:
+            module_name = rel_path.replace("/", ".").replace(".py", "")
+        return [module_name]
 
-        elif ext in [".h", ".hpp", ".c", ".cpp", ".cc"]:
-            symbol_map[filename] = rel_path
+    elif ext == ".xml" and "layout" in rel_path.split("/"):
+        return [f"@layout/{stem}"]
 
-        elif ext in [".js", ".jsx", ".ts", ".tsx", ".vue"]:
-            symbol_map[rel_path] = rel_path
-            no_ext_path = os.path.splitext(rel_path)[0]
-            symbol_map[no_ext_path] = rel_path
-            if stem == "index":
-                folder_path = os.path.dirname(rel_path)
-                symbol_map[folder_path] = rel_path
+    elif ext in [".h", ".hpp", ".c", ".cpp", ".cc"]:
+        return [filename]
 
-        elif ext == ".json":
-            symbol_map[rel_path] = rel_path
+    elif ext in [".js", ".jsx", ".ts", ".tsx", ".vue"]:
+        keys = [rel_path, os.path.splitext(rel_path)[0]]
+        if stem == "index":
+            keys.append(os.path.dirname(rel_path))
+        return keys
 
-    return symbol_map
+    elif ext == ".json":
+        return [rel_path]
 
+    return []
 
-def get_dependencies(file_path: Path, symbol_map: dict[str, str], repo_root: Path) -> list[dict[str, str]]:
-    """Extract dependencies for a single file based on its language."""
-    deps: list[dict[str, str]] = []
-    ext = file_path.suffix
 
-    try:
-        content = file_path.read_text(errors="ignore", encoding="utf-8")
-    except Exception:
-        return []
+def index_symbols(rel_path: str, facts: dict[str, Any], symbol_map: dict[str, str]) -> None:
+    """Add the symbols a single file provides to the symbol map."""
+    for key in symbol_keys(rel_path, facts):
+        symbol_map[key] = rel_path
 
-    if ext in [".kt", ".java"]:
-        imports = re.findall(r"^\s*import\s+([\w\.]+)", content, re.MULTILINE)
-        for imp in imports:
-            if imp in symbol_map:
-                deps.append({"target": symbol_map[imp], "type": "file_dependency"})
 
-    elif ext == ".py":
-        py_imports = re.findall(r"^(?:from\s+([\w\.]+)\s+import|import\s+([\w\.]+))", content, re.MULTILINE)
-        for match in py_imports:
-            target = match[0] if match[0] else match[1]
-            if target in symbol_map:
-                deps.append({"target": symbol_map[target], "type": "file_dependency"})
+JS_IMPORT_PREFIXES = ("src/", "app/", "apps/web/src/")
 
-    elif ext == ".xml":
-        layout_refs = re.findall(r"@layout/([\w_]+)", content)
-        for layout in layout_refs:
-            key = f"@layout/{layout}"
-            if key in symbol_map:
-                deps.append({"target": symbol_map[key], "type": "layout_include"})
-        class_refs = re.findall(r"<\s*([\w\.]+)", content)
-        for cls in class_refs:
-            if "." in cls and cls in symbol_map:
-                deps.append({"target": symbol_map[cls], "type": "class_reference"})
 
-    elif ext in [".gradle", ".kts"]:
-        includes = re.findall(r"include\s*\(?[\"']:(.+?)[\"']\)?", content)
-        for inc in includes:
-            module_dir = inc.replace(":", "/")
-            possible_targets = [
-                f"{module_dir}/build.gradle",
-                f"{module_dir}/build.gradle.kts",
-            ]
-            for pt in possible_targets:
-                if (repo_root / pt).exists():
-                    rel_target = str(Path(pt)).replace("\\", "/")
-                    deps.append({"target": rel_target, "type": "module_include"})
-                    break
+def js_import_path(current_dir: str, hint: str) -> str:
+    """Turn a raw JS/TS import specifier into a repository-relative path hint."""
+    if hint.startswith("@/"):
+        return hint[2:]
+    if not current_dir:
+        return os.path.normpath(hint).replace("\\", "/")
+    return os.path.normpath(f"{current_dir}/{hint}").replace("\\", "/")
 
-    elif ext in [".c", ".cpp", ".h", ".hpp", ".cc"]:
-        includes = re.findall(r"#include\s*[\"<](.+?)[\">]", content)
-        for inc in includes:
-            filename = os.path.basename(inc)
-            if filename in symbol_map:
-                deps.append({"target": symbol_map[filename], "type": "include"})
 
-    elif ext in [".js", ".jsx", ".ts", ".tsx", ".vue"]:
-        js_imports = re.findall(r"(?:from|require\s*\()\s*[\"']([\./@][^\"']+)[\"']", content)
-        current_dir = os.path.dirname(file_path.relative_to(repo_root).as_posix())
+def dependency_probes(rel_path: str, facts: dict[str, Any]) -> tuple[set[str], set[str]]:
+    """
+    Return the lookups resolve_dependencies makes for a file.
 
-        def resolve_js_target(path_hint: str) -> Optional[str]:
-            if path_hint in symbol_map:
-                return symbol_map[path_hint]
+    The first set holds exact symbol keys / paths, the second the path hints
+    that may also match any key ending in "/<hint>". A file's dependencies can
+    only change when one of these lookups answers differently.
+    """
+    exact: set[str] = set()
+    suffixes: set[str] = set()
+    current_dir = os.path.dirname(rel_path)
 
-            for prefix in ("src/", "app/", "apps/web/src/"):
-                candidate = f"{prefix}{path_hint}"
-                if candidate in symbol_map:
-                    return symbol_map[candidate]
+    for dep_type, hint in facts.get("imports", []):
+        if dep_type == "module_include":
+            exact.update((f"{hint}/build.gradle", f"{hint}/build.gradle.kts"))
+        elif dep_type == "import":
+            resolved_path = js_import_path(current_dir, hint)
+            if resolved_path:
+                exact.add(resolved_path)
+                exact.update(f"{prefix}{resolved_path}" for prefix in JS_IMPORT_PREFIXES)
+                suffixes.add(resolved_path)
+        else:
+            exact.add(hint)
 
-            suffix = f"/{path_hint}"
-            for key, value in symbol_map.items():
-                if "/" in key and key.endswith(suffix):
-                    return value
+    return exact, suffixes
 
-            return None
 
-        for imp_path in js_imports:
-            resolved_path = ""
-            if imp_path.startswith("@/"):
-                resolved_path = imp_path[2:]
-            else:
-                if current_dir == ".":
-                    resolved_path = os.path.normpath(imp_path).replace("\\", "/")
-                else:
-                    resolved_path = os.path.normpath(f"{current_dir}/{imp_path}").replace("\\", "/")
+def suffix_rank(key: str) -> tuple[int, str]:
+    """Order ambiguous suffix matches: shallowest key first, then lowest."""
+    return key.count("/"), key
 
+
+class SuffixIndex:
+    """
+    Reverse path-segment index over symbol map keys.
+
+    Answers "which key ends with /<hint>" with one dict lookup instead of a
+    scan over every symbol. Each key containing "/" is registered under each of
+    its trailing segment paths, and every suffix remembers its best match by
+    suffix_rank so ambiguous imports resolve deterministically.
+    """
+
+    def __init__(self) -> None:
+        self._matches: dict[str, set[str]] = {}
+        self._best: dict[str, str] = {}
+
+    @staticmethod
+    def _suffixes(key: str) -> Iterator[str]:
+        for i, char in enumerate(key):
+            if char == "/":
+                yield key[i + 1:]
+
+    def add(self, key: str) -> None:
+        for suffix in self._suffixes(key):
+            self._matches.setdefault(suffix, set()).add(key)
+            best = self._best.get(suffix)
+            if best is None or suffix_rank(key) < suffix_rank(best):
+                self._best[suffix] = key
+
+    def remove(self, key: str) -> None:
+        for suffix in self._suffixes(key):
+            keys = self._matches.get(suffix)
+            if not keys or key not in keys:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._matches[suffix]
+                del self._best[suffix]
+            elif self._best[suffix] == key:
+                self._best[suffix] = min(keys, key=suffix_rank)
+
+    def lookup(self, hint: str) -> Optional[str]:
+        """Return the best key ending with "/<hint>", if any."""
+        return self._best.get(hint)
+
+
+def build_suffix_index(symbol_map: dict[str, str]) -> SuffixIndex:
+    """Build the suffix index for a finished symbol map."""
+    index = SuffixIndex()
+    for key in symbol_map:
+        index.add(key)
+    return index
+
+
+def resolve_dependencies(
+    rel_path: str,
+    facts: dict[str, Any],
+    symbol_map: dict[str, str],
+    path_exists: Callable[[str], bool],
+    suffix_index: Optional[SuffixIndex] = None,
+) -> list[dict[str, str]]:
+    """
+    Resolve a file's raw import hints to repository paths.
+
+    Without a suffix index, JS suffix fallbacks scan the whole symbol map; pass
+    one when resolving more than a handful of files.
+    """
+    deps: list[dict[str, str]] = []
+    current_dir = os.path.dirname(rel_path)
+
+    def resolve_js_target(path_hint: str) -> Optional[str]:
+        if path_hint in symbol_map:
+            return symbol_map[path_hint]
+
+        for prefix in JS_IMPORT_PREFIXES:
+            candidate = f"{prefix}{path_hint}"
+            if candidate in symbol_map:
+                return symbol_map[candidate]
+
+        if suffix_index is not None:
+            key = suffix_index.lookup(path_hint)
+            return symbol_map[key] if key else None
+
+        suffix = f"/{path_hint}"
+        matches = [key for key in symbol_map if "/" in key and key.endswith(suffix)]
+        if matches:
+            return symbol_map[min(matches, key=suffix_rank)]
+
+        return None
+
+    for dep_type, hint in facts.get("imports", []):
+        if dep_type == "module_include":
+            for pt in (f"{hint}/build.gradle", f"{hint}/build.gradle.kts"):
+                if path_exists(pt):
+                    rel_target = str(Path(pt)).replace("\\", "/")
+                    deps.append({"target": rel_target, "type": dep_type})
+                    break
+
+        elif dep_type == "import":
+            resolved_path = js_import_path(current_dir, hint)
             if not resolved_path:
                 continue
 
             target = resolve_js_target(resolved_path)
             if target:
-                deps.append({"target": target, "type": "import"})
+                deps.append({"target": target, "type": dep_type})
+
+        elif hint in symbol_map:
+            deps.append({"target": symbol_map[hint], "type": dep_type})
 
     return deps
 
 
-def analyze_current_tree(repo_path: Path) -> dict[str, dict[str, Any]]:
-    symbol_map = build_symbol_map(repo_path)
-    result_files: dict[str, dict[str, Any]] = {}
-
-    supported_exts = {
-        ".kt": "kotlin",
-        ".java": "java",
-        ".py": "python",
-        ".xml": "xml",
-        ".gradle": "gradle",
-        ".kts": "gradle",
-        ".js": "javascript",
-        ".jsx": "javascript",
-        ".ts": "typescript",
-        ".tsx": "typescript",
-        ".vue": "vue",
-        ".c": "c",
-        ".cpp": "cpp",
-        ".h": "c",
-        ".hpp": "cpp",
-        ".cc": "cpp",
-        ".json": "json",
+def read_source_bytes(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except Exception:
+        return None
+
+
+def read_source(path: Path) -> Optional[str]:
+    """Read a checked-out file as text; None if it cannot be read or is binary."""
+    data = read_source_bytes(path)
+    if data is None or is_binary(data):
+        return None
+    return decode_source(data)
+
+
+def decode_source(data: bytes) -> str:
+    """Decode a blob the same way `read_text` decodes a checked-out file."""
+    return data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def blob_facts(rel_path: str, data: Optional[bytes]) -> dict[str, Any]:
+    """Facts of a file's raw content. Binary content is only flagged, and skipped by collect_facts."""
+    if data is not None and is_binary(data):
+        return {"language": detect_language(rel_path), "line_count": 0, "package": None, "imports": [], "binary": True}
+    return extract_file_facts(rel_path, decode_source(data) if data is not None else "")
+
+
+def collect_facts(
+    rel_paths: list[str],
+    blob_shas: dict[str, str],
+    extract_missing: Callable[[list[str]], Iterator[tuple[str, dict[str, Any]]]],
+    cache: Optional[AnalysisCache] = None,
+) -> dict[str, dict[str, Any]]:
+    """
+    Produce facts for every path, reading only files whose blob is not cached.
+
+    `extract_missing` receives the paths that missed the cache and yields
+    (path, facts) pairs for them. Binary files are cached as such but left
+    out of the result.
+    """
+    cache_keys = {
+        rel_path: (blob_shas[rel_path], extractor_key(rel_path))
+        for rel_path in rel_paths
+        if rel_path in blob_shas
+    }
+    cached = cache.get_many(cache_keys.values()) if cache else {}
+
+    facts_by_path: dict[str, dict[str, Any]] = {}
+    missing: list[str] = []
+    for rel_path in rel_paths:
+        key = cache_keys.get(rel_path)
+        if key in cached:
+            facts_by_path[rel_path] = cached[key]
+        else:
+            missing.append(rel_path)
+
+    fresh: dict[tuple[str, str], dict[str, Any]] = {}
+    for rel_path, facts in extract_missing(missing):
+        checkpoint()
+        facts_by_path[rel_path] = facts
+        key = cache_keys.get(rel_path)
+        if key:
+            fresh[key] = facts
+
+    if cache and fresh:
+        cache.put_many(fresh)
+
+    # Keep the caller's path order; symbol collisions are resolved by it.
+    return {
+        rel_path: facts_by_path[rel_path]
+        for rel_path in rel_paths
+        if rel_path in facts_by_path and not facts_by_path[rel_path].get("binary")
     }
 
-    for path in repo_path.rglob("*"):
-        if path.is_dir() or ".git" in path.parts:
-            continue
 
-        rel_path = path.relative_to(repo_path).as_posix()
-        dependencies = get_dependencies(path, symbol_map, repo_path)
+def analyze_facts(
+    facts_by_path: dict[str, dict[str, Any]],
+    path_exists: Callable[[str], bool],
+    paths: PathTable,
+) -> dict[str, FileRecord]:
+    """Build the symbol map from file facts and resolve every file's dependencies."""
+    symbol_map: dict[str, str] = {}
+    for rel_path, facts in facts_by_path.items():
+        index_symbols(rel_path, facts, symbol_map)
+    suffix_index = build_suffix_index(symbol_map)
+
+    result_files: dict[str, FileRecord] = {}
+    for rel_path, facts in facts_by_path.items():
+        paths.intern(rel_path)
+        result_files[rel_path] = FileRecord.from_dependencies(
+            facts["language"],
+            facts["line_count"],
+            resolve_dependencies(rel_path, facts, symbol_map, path_exists, suffix_index),
+            paths,
+        )
+
+    return result_files
 
-        if path.suffix in supported_exts:
-            lang = supported_exts[path.suffix]
-            if path.suffix == ".kts" and "gradle" not in path.name:
-                lang = "kotlin"
 
+IGNORED_DIRS = {".git", ".hg", ".svn"}
+
+
+def walk_source_files(repo_path: Path, policy: Optional[IngestPolicy] = None) -> Iterator[tuple[str, str]]:
+    """
+    Yield (relative path, absolute path) for every analyzable file in a tree.
+
+    Ignored and policy-excluded directories are pruned before descending and
+    files are filtered by extension before any I/O, so nothing under `.git` or
+    of an unsupported type is ever stat'ed or read. The order is deterministic
+    but not sorted.
+    """
+    policy = policy or IngestPolicy.from_config()
+    stack = [(str(repo_path), "")]
+    while stack:
+        dir_path, rel_dir = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirs: list[tuple[str, str]] = []
+        for entry in entries:
+            rel_path = f"{rel_dir}{entry.name}"
             try:
-                line_count = len(path.read_text(errors="ignore").splitlines())
-            except Exception:
-                line_count = 0
-
-            result_files[rel_path] = {
-                "language": lang,
-                "line_count": line_count,
-                "depends_on": dependencies,
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in IGNORED_DIRS and not policy.excludes_dir(entry.name):
+                        subdirs.append((entry.path, f"{rel_path}/"))
+                elif (
+                    os.path.splitext(entry.name)[1] in SUPPORTED_EXTS
+                    and entry.is_file()
+                    and policy.admits(rel_path, entry.stat().st_size)
+                ):
+                    yield rel_path, entry.path
+            except OSError:
+                continue
+
+        stack.extend(reversed(subdirs))
+
+
+def build_symbol_map(repo_path: Path, policy: Optional[IngestPolicy] = None) -> dict[str, str]:
+    """Index symbols to file paths for dependency resolution."""
+    symbol_map: dict[str, str] = {}
+
+    for rel_path, abs_path in sampled_source_files(repo_path, policy).items():
+        content = read_source(Path(abs_path))
+        if content is None:
+            continue
+        index_symbols(rel_path, extract_file_facts(rel_path, content), symbol_map)
+
+    return symbol_map
+
+
+def get_dependencies(file_path: Path, symbol_map: dict[str, str], repo_root: Path) -> list[dict[str, str]]:
+    """Extract dependencies for a single file based on its language."""
+    content = read_source(file_path)
+    if content is None:
+        return []
+
+    rel_path = file_path.relative_to(repo_root).as_posix()
+    facts = extract_file_facts(rel_path, content)
+    return resolve_dependencies(rel_path, facts, symbol_map, lambda p: (repo_root / p).exists())
+
+
+def sampled_source_files(repo_path: Path, policy: Optional[IngestPolicy] = None) -> dict[str, str]:
+    """walk_source_files as a dict, capped to the policy's sample of it."""
+    policy = policy or IngestPolicy.from_config()
+    files = dict(walk_source_files(repo_path, policy))
+    policy.plan_sample(files)
+    return {rel_path: abs_path for rel_path, abs_path in files.items() if policy.admits(rel_path)}
+
+
+def analyze_current_tree(
+    repo_path: Path,
+    paths: PathTable,
+    cache: Optional[AnalysisCache] = None,
+    policy: Optional[IngestPolicy] = None,
+) -> dict[str, FileRecord]:
+    """
+    Analyze the checked-out working tree, interning its paths in `paths`.
+
+    Every analyzable file is read at most once and its facts feed symbol
+    indexing, dependency resolution and line counting alike. With a cache,
+    files whose blob (per `git ls-tree HEAD`) was analyzed before are not read.
+    Files that differ from HEAD in the working tree bypass the cache, since
+    their content is not the HEAD blob.
+    """
+    files = sampled_source_files(repo_path, policy)
+
+    def extract_missing(rel_paths: list[str]) -> Iterator[tuple[str, dict[str, Any]]]:
+        for rel_path in rel_paths:
+            yield rel_path, blob_facts(rel_path, read_source_bytes(Path(files[rel_path])) or b"")
+
+    blob_shas: dict[str, str] = {}
+    if cache:
+        modified = list_modified_paths(repo_path)
+        if modified is not None:
+            blob_shas = {
+                rel_path: sha
+                for rel_path, sha in list_tree_blobs(repo_path).items()
+                if rel_path not in modified
             }
+    facts_by_path = collect_facts(sorted(files), blob_shas, extract_missing, cache)
+    return analyze_facts(facts_by_path, lambda p: p in files, paths)
 
-    return result_files
+
+_worker_reader: Optional[GitObjectReader] = None
+
+
+def _init_extract_worker(repo_path: str) -> None:
+    """Give each pool process its own cat-file stream over the repository."""
+    global _worker_reader
+    _worker_reader = GitObjectReader(Path(repo_path))
+
+
+def _extract_blob_chunk(entries: list[tuple[str, str]]) -> tuple[list[tuple[str, dict[str, Any]]], int]:
+    """Extract facts for a chunk of (path, blob SHA) entries; also returns the bytes read."""
+    results: list[tuple[str, dict[str, Any]]] = []
+    bytes_read = 0
+    shas = [sha for _rel_path, sha in entries]
+    for (rel_path, _sha), (_, data) in zip(entries, _worker_reader.read_many(shas)):
+        bytes_read += len(data) if data is not None else 0
+        results.append((rel_path, blob_facts(rel_path, data)))
+    return results, bytes_read
+
+
+def create_extract_pool(repo_path: Path) -> Optional[ProcessPoolExecutor]:
+    """
+    Start the opt-in process pool for fact extraction (ANALYZER_WORKERS > 1).
+
+    Workers are spawned rather than forked so they do not inherit the parent's
+    cat-file pipes or cache connection; each opens its own reader instead, and
+    only (path, blob SHA) pairs and the resulting facts cross process boundaries.
+    """
+    if config.ANALYZER_WORKERS <= 1:
+        return None
+
+    return ProcessPoolExecutor(
+        max_workers=config.ANALYZER_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_extract_worker,
+        initargs=(str(repo_path),),
+    )
+
+
+def read_blob_facts(
+    blobs: dict[str, str],
+    reader: GitObjectReader,
+    cache: Optional[AnalysisCache] = None,
+    pool: Optional[ProcessPoolExecutor] = None,
+) -> dict[str, dict[str, Any]]:
+    """
+    Produce facts for the given path -> blob SHA entries via the object database.
+
+    With a pool, cache misses are sharded into ANALYZER_CHUNK_SIZE chunks and
+    extracted in parallel; results are identical to the serial path.
+    """
+    chunk_size = max(1, config.ANALYZER_CHUNK_SIZE)
+
+    def extract_missing(missing: list[str]) -> Iterator[tuple[str, dict[str, Any]]]:
+        if pool is not None and len(missing) > chunk_size:
+            chunks = [
+                [(rel_path, blobs[rel_path]) for rel_path in missing[start:start + chunk_size]]
+                for start in range(0, len(missing), chunk_size)
+            ]
+            for results, bytes_read in pool.map(_extract_blob_chunk, chunks):
+                add_counts(bytes_read=bytes_read)
+                yield from results
+            return
+
+        shas = [blobs[rel_path] for rel_path in missing]
+        for rel_path, (_sha, data) in zip(missing, reader.read_many(shas)):
+            add_counts(bytes_read=len(data) if data is not None else 0)
+            yield rel_path, blob_facts(rel_path, data)
+
+    add_counts(files=len(blobs))
+    return collect_facts(list(blobs), blobs, extract_missing, cache)
+
+
+def list_source_blobs(repo_path: Path, rev: str, policy: Optional[IngestPolicy] = None) -> dict[str, str]:
+    """List the analyzable files of a commit with their blob SHAs."""
+    policy = policy or IngestPolicy.from_config()
+    tree = list_tree_blob_sizes(repo_path, rev)
+    return {
+        p: sha
+        for p, (sha, size) in tree.items()
+        if os.path.splitext(p)[1] in SUPPORTED_EXTS and policy.admits(p, size)
+    }
 
 
-def build_graph_from_files(file_data: dict[str, dict[str, Any]]) -> tuple[list[dict[str, Any]], list[dict[str, Any]], dict[str, Any]]:
-    nodes: list[dict[str, Any]] = []
-    edges: list[dict[str, Any]] = []
-    languages = defaultdict(int)
-
-    for file_path, info in file_data.items():
-        languages[info.get("language", "") or "unknown"] += 1
-        nodes.append({
-            "id": file_path,
-            "name": os.path.basename(file_path),
-            "path": file_path,
-            "type": "file",
-            "lines": info.get("line_count", 0),
-            "language": info.get("language", ""),
-        })
-
-    edge_keys: set[tuple[str, str, str]] = set()
-    for source_path, info in file_data.items():
-        for dep in info.get("depends_on", []):
-            target = dep.get("target")
-            if not target or target not in file_data:
+def analyze_snapshot(
+    repo_path: Path,
+    rev: str,
+    reader: GitObjectReader,
+    paths: PathTable,
+    cache: Optional[AnalysisCache] = None,
+    pool: Optional[ProcessPoolExecutor] = None,
+    policy: Optional[IngestPolicy] = None,
+) -> dict[str, FileRecord]:
+    """
+    Analyze a commit without checking it out, interning its paths in `paths`.
+
+    The tree comes from `git ls-tree` and file contents are streamed from the
+    object database through `reader`.
+    """
+    blobs = list_source_blobs(repo_path, rev, policy)
+    facts_by_path = read_blob_facts(blobs, reader, cache, pool)
+    return analyze_facts(facts_by_path, lambda p: p in blobs, paths)
+
+
+def diff_trees(
+    repo_path: Path,
+    old_rev: str,
+    new_rev: str,
+    policy: Optional[IngestPolicy] = None,
+) -> Optional[tuple[list[str], dict[str, str]]]:
+    """
+    List what changed between two commits.
+
+    Returns the analyzable paths whose old version is gone (deleted, modified
+    or renamed away) and the new path -> blob SHA entries the policy admits,
+    or None if git fails. Renames are reported as delete + add; the blob cache
+    makes the re-add free.
+    """
+    policy = policy or IngestPolicy.from_config()
+    result = run_process(
+        ["git", "diff", "--raw", "-z", "--no-abbrev", "--no-renames", old_rev, new_rev],
+        cwd=repo_path,
+        capture_output=True,
+    )
+    if result.returncode != 0:
+        return None
+
+    removed: list[str] = []
+    added: dict[str, str] = {}
+    tokens = result.stdout.decode("utf-8", errors="surrogateescape").split("\0")
+    i = 0
+    while i < len(tokens):
+        meta = tokens[i]
+        i += 1
+        if not meta.startswith(":"):
+            continue
+
+        _old_mode, new_mode, _old_sha, new_sha, status = meta[1:].split(" ")
+        path_count = 2 if status[0] in "RC" else 1
+        paths = tokens[i:i + path_count]
+        i += path_count
+
+        old_path, new_path = paths[0], paths[-1]
+        if status[0] != "A" and os.path.splitext(old_path)[1] in SUPPORTED_EXTS:
+            removed.append(old_path)
+        if status[0] != "D" and os.path.splitext(new_path)[1] in SUPPORTED_EXTS:
+            # Symlinks and submodules are not analyzed, same as in list_tree_blobs.
+            if new_mode not in ("120000", "160000") and policy.admits(new_path):
+                added[new_path] = new_sha
+
+    sizes = read_blob_sizes(repo_path, added.values())
+    return removed, {path: sha for path, sha in added.items() if policy.admits(path, sizes.get(sha))}
+
+
+class SnapshotIndex:
+    """
+    Analysis state of one snapshot that can be advanced commit by commit.
+
+    Besides per-file facts and results it remembers which files provide each
+    symbol and which files look up each key, so applying a diff re-resolves only
+    the changed files and those whose lookups can now answer differently.
+    """
+
+    def __init__(self) -> None:
+        self.paths = PathTable()
+        self.facts: dict[str, dict[str, Any]] = {}
+        self.symbol_map: dict[str, str] = {}
+        self.suffix_index = SuffixIndex()
+        self.file_data: dict[str, FileRecord] = {}
+        self._providers: dict[str, set[str]] = defaultdict(set)
+        self._probers: dict[str, set[str]] = defaultdict(set)
+        self._suffix_probers: dict[str, set[str]] = defaultdict(set)
+        self._probes: dict[str, tuple[set[str], set[str]]] = {}
+
+    def apply(self, removed: list[str], added: dict[str, dict[str, Any]]) -> None:
+        """Drop `removed` paths, (re)insert `added` facts and re-resolve what they affect."""
+        touched_keys: set[str] = set()
+        changed_paths: set[str] = set()
+
+        for rel_path in removed:
+            facts = self.facts.pop(rel_path, None)
+            if facts is None:
                 continue
-            edge_type = dep.get("type", "import")
-            key = (source_path, target, edge_type)
-            if key in edge_keys:
+            changed_paths.add(rel_path)
+            for key in symbol_keys(rel_path, facts):
+                self._providers[key].discard(rel_path)
+                touched_keys.add(key)
+            self._forget_probes(rel_path)
+            self.file_data.pop(rel_path, None)
+
+        for rel_path, facts in added.items():
+            self.paths.intern(rel_path)
+            self.facts[rel_path] = facts
+            changed_paths.add(rel_path)
+            for key in symbol_keys(rel_path, facts):
+                self._providers[key].add(rel_path)
+                touched_keys.add(key)
+
+        # On collisions the highest path wins, matching a full build in tree order.
+        changed_keys: set[str] = set()
+        for key in touched_keys:
+            providers = self._providers.get(key)
+            winner = max(providers) if providers else None
+            if not providers:
+                self._providers.pop(key, None)
+            if self.symbol_map.get(key) != winner:
+                changed_keys.add(key)
+                if winner is None:
+                    del self.symbol_map[key]
+                    self.suffix_index.remove(key)
+                else:
+                    if key not in self.symbol_map:
+                        self.suffix_index.add(key)
+                    self.symbol_map[key] = winner
+
+        affected = set(added)
+        for key in changed_keys | changed_paths:
+            affected |= self._probers.get(key, set())
+        for key in changed_keys:
+            for i, char in enumerate(key):
+                if char == "/":
+                    affected |= self._suffix_probers.get(key[i + 1:], set())
+
+        for rel_path in affected:
+            facts = self.facts.get(rel_path)
+            if facts is None:
                 continue
-            edge_keys.add(key)
-            edges.append({
-                "source": source_path,
-                "target": target,
-                "type": edge_type,
-            })
-
-    total_lines = sum(info.get("line_count", 0) for info in file_data.values())
-    stats = {
-        "nodeCount": len(nodes),
-        "edgeCount": len(edges),
-        "fileCount": len(nodes),
-        "directoryCount": 0,
-        "totalLines": total_lines,
-        "languages": dict(languages),
+            self._forget_probes(rel_path)
+            self._remember_probes(rel_path, facts)
+            # Records are shared with earlier snapshots, so replace rather than mutate.
+            self.file_data[rel_path] = FileRecord.from_dependencies(
+                facts["language"],
+                facts["line_count"],
+                resolve_dependencies(rel_path, facts, self.symbol_map, self.facts.__contains__, self.suffix_index),
+                self.paths,
+            )
+
+    def snapshot_files(self) -> dict[str, FileRecord]:
+        """Return the current file results in tree order."""
+        return {rel_path: self.file_data[rel_path] for rel_path in sorted(self.file_data)}
+
+    def _remember_probes(self, rel_path: str, facts: dict[str, Any]) -> None:
+        exact, suffixes = dependency_probes(rel_path, facts)
+        self._probes[rel_path] = (exact, suffixes)
+        for key in exact:
+            self._probers[key].add(rel_path)
+        for key in suffixes:
+            self._suffix_probers[key].add(rel_path)
+
+    def _forget_probes(self, rel_path: str) -> None:
+        exact, suffixes = self._probes.pop(rel_path, (set(), set()))
+        for key in exact:
+            self._probers[key].discard(rel_path)
+            if not self._probers[key]:
+                del self._probers[key]
+        for key in suffixes:
+            self._suffix_probers[key].discard(rel_path)
+            if not self._suffix_probers[key]:
+                del self._suffix_probers[key]
+
+
+def advance_snapshot(
+    repo_path: Path,
+    index: Optional[SnapshotIndex],
+    prev_rev: Optional[str],
+    rev: str,
+    reader: GitObjectReader,
+    cache: Optional[AnalysisCache] = None,
+    pool: Optional[ProcessPoolExecutor] = None,
+    policy: Optional[IngestPolicy] = None,
+) -> SnapshotIndex:
+    """
+    Move `index` from `prev_rev` to `rev` by applying their diff.
+
+    Falls back to a full analysis of `rev` for the first snapshot or when the
+    diff cannot be computed.
+    """
+    policy = policy or IngestPolicy.from_config()
+    diff = diff_trees(repo_path, prev_rev, rev, policy) if index is not None and prev_rev else None
+    if index is None or diff is None:
+        index = SnapshotIndex()
+        blobs = list_source_blobs(repo_path, rev, policy)
+        index.apply([], read_blob_facts(blobs, reader, cache, pool))
+        return index
+
+    removed, added_blobs = diff
+    index.apply(removed, read_blob_facts(added_blobs, reader, cache, pool))
+    return index
+
+
+def _file_edges(source_path: str, record: FileRecord) -> set[tuple[str, int, int]]:
+    return {(source_path, target, kind) for target, kind in record.dependencies()}
+
+
+def _edges_json(edges: set[tuple[str, int, int]], paths: PathTable) -> list[dict[str, str]]:
+    return [
+        {"source": source, "target": target, "type": kind}
+        for source, target, kind in sorted((s, paths[t], edge_type(k)) for s, t, k in edges)
+    ]
+
+
+def diff_snapshot_files(
+    old_files: dict[str, FileRecord],
+    new_files: dict[str, FileRecord],
+    paths: PathTable,
+) -> dict[str, Any]:
+    """
+    Describe how to turn one snapshot's file map into the next, in graph.json form.
+
+    Unchanged files share their record between snapshots, so only records
+    that differ by identity are compared.
+    """
+    added_nodes: dict[str, dict[str, Any]] = {}
+    changed_lines: dict[str, int] = {}
+    added_edges: set[tuple[str, int, int]] = set()
+    removed_edges: set[tuple[str, int, int]] = set()
+
+    removed_nodes = sorted(path for path in old_files if path not in new_files)
+    for path in removed_nodes:
+        removed_edges |= _file_edges(path, old_files[path])
+
+    for path, record in new_files.items():
+        old_record = old_files.get(path)
+        if old_record is record:
+            continue
+        if old_record is None:
+            added_nodes[path] = {"language": record.language, "line_count": record.line_count}
+            added_edges |= _file_edges(path, record)
+            continue
+
+        if old_record.line_count != record.line_count:
+            changed_lines[path] = record.line_count
+        old_edges = _file_edges(path, old_record)
+        new_edges = _file_edges(path, record)
+        added_edges |= new_edges - old_edges
+        removed_edges |= old_edges - new_edges
+
+    return {
+        "addedNodes": added_nodes,
+        "removedNodes": removed_nodes,
+        "changedLines": changed_lines,
+        "addedEdges": _edges_json(added_edges, paths),
+        "removedEdges": _edges_json(removed_edges, paths),
     }
 
-    return nodes, edges, stats
 
+def apply_snapshot_delta(files: dict[str, dict[str, Any]], delta: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Return the graph.json file map after `delta`; `files` is left untouched."""
+    result = dict(files)
+    for path in delta.get("removedNodes", []):
+        result.pop(path, None)
+    for path, info in delta.get("addedNodes", {}).items():
+        result[path] = {**info, "depends_on": []}
+    for path, line_count in delta.get("changedLines", {}).items():
+        result[path] = {**result[path], "line_count": line_count}
+
+    removed_by_source: dict[str, set[tuple[str, str]]] = defaultdict(set)
+    for edge in delta.get("removedEdges", []):
+        removed_by_source[edge["source"]].add((edge["target"], edge["type"]))
+    for source, removed in removed_by_source.items():
+        if source in result:
+            info = result[source]
+            result[source] = {
+                **info,
+                "depends_on": [dep for dep in info["depends_on"] if (dep["target"], dep["type"]) not in removed],
+            }
+
+    added_by_source: dict[str, list[dict[str, str]]] = defaultdict(list)
+    for edge in delta.get("addedEdges", []):
+        added_by_source[edge["source"]].append({"target": edge["target"], "type": edge["type"]})
+    for source, added in added_by_source.items():
+        info = result[source]
+        result[source] = {**info, "depends_on": info["depends_on"] + added}
+
+    return dict(sorted(result.items()))
+
+
+def serialize_snapshots(
+    snapshots: list[dict[str, Any]],
+    graphs: list[FileGraph],
+    layouts: Optional[list[np.ndarray]],
+    analytics: Optional[list[dict[str, Any]]],
+    paths: PathTable,
+) -> list[dict[str, Any]]:
+    """
+    Snapshots in graph.json form: the first keeps its full `files` map, the
+    rest become deltas, and each gets the `layout` positions that are new or
+    changed since the previous snapshot when a layout was computed. With
+    per-snapshot analytics, `analytics` holds each snapshot's node metrics as
+    columns aligned with `id`, plus their `summary`.
+    """
+    encoded: list[dict[str, Any]] = []
+    prev_files: Optional[dict[str, FileRecord]] = None
+    for position, snapshot in enumerate(snapshots):
+        files = snapshot["files"]
+        entry = {key: value for key, value in snapshot.items() if key != "files"}
+        if prev_files is None:
+            entry["files"] = {path: record.to_json(paths) for path, record in files.items()}
+        else:
+            entry["delta"] = diff_snapshot_files(prev_files, files, paths)
+        if layouts is not None:
+            entry["layout"] = diff_layout(
+                graphs[position - 1] if position else None,
+                layouts[position - 1] if position else None,
+                graphs[position],
+                layouts[position],
+            )
+        if analytics is not None:
+            entry["analytics"] = {
+                "id": graphs[position].node_paths(),
+                **analytics[position]["columns"],
+                "summary": analytics[position]["summary"],
+            }
+        encoded.append(entry)
+        prev_files = files
+    return encoded
+
+
+def rebuild_snapshot(snapshots: list[dict[str, Any]], index: int) -> dict[str, dict[str, Any]]:
+    """
+    Rebuild the full file map of `snapshots[index]` from delta-encoded snapshots.
+
+    Each edge appears once per file in the result; the order of a file's
+    `depends_on` may differ from what the analyzer produced.
+    """
+    files: dict[str, dict[str, Any]] = {}
+    for snapshot in snapshots[:index + 1]:
+        if "files" in snapshot:
+            files = snapshot["files"]
+        else:
+            files = apply_snapshot_delta(files, snapshot["delta"])
+    return files
+
+
+def compute_layouts(graphs: list[FileGraph]) -> Optional[list[np.ndarray]]:
+    """
+    Precomputed 3D positions for each graph (snapshots, then the latest
+    graph), or None when layout is disabled or a graph is too large.
+    """
+    if not graphs or config.LAYOUT_ITERATIONS <= 0:
+        return None
+    if max(graph.node_count for graph in graphs) > config.LAYOUT_MAX_NODES:
+        return None
+    return layout_graphs(graphs)
 
-def get_git_history(repo_dir: Path, max_commits: int = 20) -> list[dict[str, Any]]:
+
+def get_git_history(repo_dir: Path, max_commits: int = 20, rev: str = "HEAD") -> list[dict[str, Any]]:
     history: list[dict[str, Any]] = []
 
     try:
-        result = subprocess.run(
-            ["git", "log", f"-{max_commits}", "--pretty=format:%H|%s|%an|%at", "--name-status"],
+        result = run_process(
+            ["git", "log", f"-{max_commits}", "--pretty=format:%H|%s|%an|%at", "--name-status", rev],
             cwd=repo_dir,
             capture_output=True,
             text=True,
@@ -388,64 +1225,158 @@ def get_git_history(repo_dir: Path, max_commits: int = 20) -> list[dict[str, Any
     return history
 
 
-def analyze_repository(repo_url: str, ref: Optional[str] = None) -> dict[str, Any]:
-    """Analyze a repository and return graph data and history snapshots."""
+def analyze_git_repository(
+    repo_path: Path,
+    repo_url: str,
+    ref: Optional[str],
+    rev: str = "HEAD",
+) -> dict[str, Any]:
+    """Analyze the history of `rev` in a local (possibly bare) repository."""
+    cache = get_analysis_cache()
+    policy = IngestPolicy.from_config()
+    with span("commit_selection"):
+        target_commits = get_impactful_commits(repo_path, rev)
+        if policy.max_files:
+            # Huge repositories: plan the sample from the analyzed commit's tree.
+            policy.plan_sample(list_source_blobs(repo_path, rev, policy))
+    history_snapshots: list[dict[str, Any]] = []
+
+    if target_commits:
+        print(f"[Analyzer] Analyzing {len(target_commits)} snapshots...")
+
+    pool = create_extract_pool(repo_path)
+    try:
+        with GitObjectReader(repo_path) as reader:
+            # Commits are in chronological order, so each snapshot is derived
+            # from the previous one by applying only what changed in between.
+            index: Optional[SnapshotIndex] = None
+            prev_hash: Optional[str] = None
+            for position, commit in enumerate(target_commits):
+                checkpoint()
+                report_progress(
+                    "snapshots", position, len(target_commits),
+                    f"Analyzing snapshot {position + 1}/{len(target_commits)}...",
+                )
+                with span("snapshot", commit=commit["hash"]):
+                    index = advance_snapshot(
+                        repo_path, index, prev_hash, commit["hash"], reader, cache, pool, policy
+                    )
+                    prev_hash = commit["hash"]
+                    history_snapshots.append({
+                        "hash": commit["hash"],
+                        "date": commit["date"],
+                        "impact": commit["impact"],
+                        "files": index.snapshot_files(),
+                    })
+
+            if history_snapshots:
+                paths = index.paths
+                latest_files = history_snapshots[-1]["files"]
+            else:
+                paths = PathTable()
+                report_progress("snapshots", 0, 1)
+                with span("snapshot", commit=rev):
+                    latest_files = analyze_snapshot(repo_path, rev, reader, paths, cache, pool, policy)
+    finally:
+        if pool is not None:
+            # Chunks not started yet are dropped if the job was interrupted.
+            pool.shutdown(cancel_futures=True)
+
+    checkpoint()
+    with span("graph"):
+        # The latest file map is the last snapshot's when there is history.
+        snapshot_graphs = [FileGraph.from_files(snapshot["files"], paths) for snapshot in history_snapshots]
+        graph = snapshot_graphs[-1] if snapshot_graphs else FileGraph.from_files(latest_files, paths)
+        stats = graph.stats()
+        stats["sampled"] = policy.sampled
+        if policy.sampled:
+            stats["sampledFrom"] = policy.sampled_from
+        directories, levels = add_directory_levels(graph, stats)
+    checkpoint()
+    with span("analytics"):
+        analytics = compute_analytics(graph)
+        stats["analytics"] = analytics["summary"]
+        snapshot_analytics = None
+        if config.GRAPH_ANALYTICS_SNAPSHOTS:
+            snapshot_analytics = [
+                analytics if snapshot_graph is graph else compute_analytics(snapshot_graph)
+                for snapshot_graph in snapshot_graphs
+            ]
+    checkpoint()
+    with span("layout"):
+        layouts = compute_layouts(snapshot_graphs or [graph])
+        positions = layouts[-1] if layouts is not None else None
+        place_directories(directories, graph, positions)
+    checkpoint()
+    with span("history"):
+        history = get_git_history(repo_path, rev=rev)
+        commit = resolve_revision(repo_path, rev)
+    with span("serialize"):
+        columns = dict(zip(("x", "y", "z"), positions.T.tolist())) if positions is not None else {}
+        columns.update(analytics["columns"])
+        nodes = graph.nodes_json(columns)
+        edges = graph.edges_json()
+        snapshots = serialize_snapshots(history_snapshots, snapshot_graphs, layouts, snapshot_analytics, paths)
+
+    print(f"[Analyzer] Analysis complete: {stats}")
+
+    return {
+        "metadata": {
+            "repoUrl": repo_url,
+            "ref": ref or "main",
+            "commit": commit,
+            "analyzedAt": None,
+            "version": "2.4.0",
+        },
+        "nodes": nodes,
+        "edges": edges,
+        "directories": directories,
+        "levels": levels,
+        "history": history,
+        "stats": stats,
+        "snapshots": snapshots,
+    }
+
+
+@contextmanager
+def fetched_repository(repo_url: str, ref: Optional[str] = None) -> Generator[tuple[Path, str], None, None]:
+    """
+    Yield a local repository of `repo_url` and the revision to analyze in it.
+
+    With the mirror store this is the updated mirror, with the commit of `ref`
+    pinned up front so concurrent fetches cannot move it; otherwise a fresh
+    clone that is deleted when the context exits.
+    """
+    store = get_mirror_store()
+    if store is not None:
+        print(f"[Analyzer] Updating mirror of {repo_url}...")
+        with store.mirror(repo_url) as repo_path:
+            rev = resolve_revision(repo_path, ref or "HEAD")
+            if ref and not rev:
+                raise Exception(f"Unknown ref: {ref}")
+            yield repo_path, rev or "HEAD"
+        return
+
     temp_dir = tempfile.mkdtemp(prefix="codeviz_")
     repo_path = Path(temp_dir)
 
     try:
         print(f"[Analyzer] Cloning {repo_url}...")
-        if not clone_repository(repo_url, ref, temp_dir):
+        with span("clone", cached=False):
+            cloned = clone_repository(repo_url, ref, temp_dir)
+        if not cloned:
             raise Exception("Failed to clone repository")
 
-        target_commits = get_impactful_commits(repo_path)
-        history_snapshots: list[dict[str, Any]] = []
-
-        if target_commits:
-            print(f"[Analyzer] Analyzing {len(target_commits)} snapshots...")
-
-        for commit in target_commits:
-            subprocess.run(
-                ["git", "checkout", "-f", commit["hash"]],
-                cwd=repo_path,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-
-            file_data = analyze_current_tree(repo_path)
-            history_snapshots.append({
-                "hash": commit["hash"],
-                "date": commit["date"],
-                "impact": commit["impact"],
-                "files": file_data,
-            })
-
-        if history_snapshots:
-            latest_files = history_snapshots[-1]["files"]
-        else:
-            latest_files = analyze_current_tree(repo_path)
-
-        nodes, edges, stats = build_graph_from_files(latest_files)
-        history = get_git_history(repo_path)
-
-        print(f"[Analyzer] Analysis complete: {stats}")
-
-        return {
-            "metadata": {
-                "repoUrl": repo_url,
-                "ref": ref or "main",
-                "analyzedAt": None,
-                "version": "2.1.0",
-            },
-            "nodes": nodes,
-            "edges": edges,
-            "history": history,
-            "stats": stats,
-            "snapshots": history_snapshots,
-        }
+        yield repo_path, "HEAD"
 
     finally:
         try:
             shutil.rmtree(temp_dir)
         except Exception:
             pass
+
+
+def analyze_repository(repo_url: str, ref: Optional[str] = None) -> dict[str, Any]:
+    """Analyze a repository and return graph data and history snapshots."""
+    with fetched_repository(repo_url, ref) as (repo_path, rev):
+        return analyze_git_repository(repo_path, repo_url, ref, rev)
@@ -0,0 +1,264 @@
+"""
+Persistent bare-mirror store for analyzed repositories.
+
+Instead of a fresh full clone per job, each repository is cloned once into a
+bare mirror keyed by its normalized URL and then updated with `git fetch`.
+The analyzer only reads git objects, so jobs work directly from the mirror.
+
+Locking is per repository and uses two lock files kept outside the mirror:
+- `<key>.fetch.lock` (exclusive) serializes clone/fetch of the same repo;
+- `<key>.use.lock` is held shared by every job reading the mirror and taken
+  exclusively (non-blocking) by eviction, so a mirror is never deleted while
+  in use.
+Automatic `git gc` is disabled in mirrors, so a fetch never repacks under a
+running job. Instead each mirror is garbage-collected with `git gc --auto`
+under its fetch lock at most once per REPO_CACHE_GC_INTERVAL, after a job
+used it; unreachable objects are only pruned once they are two weeks old.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Generator, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from src.config import config
+from src.services.job_control import JobInterrupted, run_process
+from src.services.metrics import span
+
+
+def normalize_repo_url(repo_url: str) -> str:
+    """Canonical form of a repo URL: no credentials, lowercase host, no `.git`."""
+    url = repo_url.strip()
+    parts = urlsplit(url)
+    if parts.scheme and parts.netloc:
+        host = parts.hostname or ""
+        if parts.port:
+            host = f"{host}:{parts.port}"
+        path = parts.path.rstrip("/")
+        if path.endswith(".git"):
+            path = path[:-4]
+        # GitHub paths are case-insensitive.
+        if host == "github.com":
+            path = path.lower()
+        return urlunsplit((parts.scheme.lower(), host.lower(), path, "", ""))
+
+    url = url.rstrip("/")
+    return url[:-4] if url.endswith(".git") else url
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+@contextmanager
+def _locked(lock_path: Path, mode: int) -> Generator[None, None, None]:
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class MirrorStore:
+    """Directory of bare mirrors with per-repo locking and LRU disk-quota eviction."""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.mirrors_dir = self.root / "mirrors"
+        self.locks_dir = self.root / "locks"
+        self.mirrors_dir.mkdir(parents=True, exist_ok=True)
+        self.locks_dir.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, repo_url: str) -> str:
+        return hashlib.sha256(normalize_repo_url(repo_url).encode("utf-8")).hexdigest()[:32]
+
+    def _meta_path(self, key: str) -> Path:
+        return self.mirrors_dir / f"{key}.json"
+
+    @contextmanager
+    def mirror(self, repo_url: str) -> Generator[Path, None, None]:
+        """
+        Yield an up-to-date bare mirror of `repo_url`.
+
+        The mirror is cloned on first use and fetched afterwards. It stays
+        protected from eviction until the context exits.
+        """
+        key = self._key(repo_url)
+        mirror_path = self.mirrors_dir / f"{key}.git"
+        fetch_lock = self.locks_dir / f"{key}.fetch.lock"
+        used = False
+        collected = False
+
+        try:
+            with _locked(self.locks_dir / f"{key}.use.lock", fcntl.LOCK_SH):
+                with span("clone", cached=mirror_path.exists()):
+                    with _locked(fetch_lock, fcntl.LOCK_EX):
+                        try:
+                            if mirror_path.exists():
+                                self._fetch(repo_url, mirror_path)
+                            else:
+                                self._clone(repo_url, mirror_path)
+                        except JobInterrupted:
+                            raise
+                        except Exception as e:
+                            print(f"[RepoCache] Mirror update failed: {e}")
+                            raise Exception("Failed to clone repository") from e
+                        self._touch(key, repo_url, mirror_path)
+
+                used = True
+                try:
+                    yield mirror_path
+                finally:
+                    with _locked(fetch_lock, fcntl.LOCK_EX):
+                        collected = self._collect_garbage(key, mirror_path)
+        finally:
+            # Runs whether or not the job using the mirror succeeded.
+            if used:
+                try:
+                    self._touch(key, repo_url, mirror_path if collected else None)
+                    self.evict()
+                except Exception as e:
+                    print(f"[RepoCache] Eviction failed: {e}")
+
+    def _clone(self, repo_url: str, mirror_path: Path) -> None:
+        tmp_path = Path(tempfile.mkdtemp(prefix=f"{mirror_path.name}.", dir=self.mirrors_dir))
+        try:
+            # Only branches and tags; `--mirror` would also pull refs/pull/* on GitHub.
+            run_process(
+                ["git", "clone", "--bare", "--quiet", repo_url, str(tmp_path)],
+                check=True,
+                capture_output=True,
+                timeout=300,
+            )
+            for args in (
+                ["config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*"],
+                ["config", "gc.auto", "0"],
+            ):
+                run_process(["git", *args], cwd=tmp_path, check=True, capture_output=True, timeout=60)
+            os.rename(tmp_path, mirror_path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+    def _fetch(self, repo_url: str, mirror_path: Path) -> None:
+        run_process(
+            ["git", "fetch", "--quiet", "--prune", "--tags", repo_url, "+refs/heads/*:refs/heads/*"],
+            cwd=mirror_path,
+            check=True,
+            capture_output=True,
+            timeout=300,
+        )
+
+    def _collect_garbage(self, key: str, mirror_path: Path) -> bool:
+        """
+        Run `git gc --auto` on a mirror if it was not collected within
+        REPO_CACHE_GC_INTERVAL; the caller holds its fetch lock. True if gc ran.
+        """
+        interval = config.REPO_CACHE_GC_INTERVAL
+        if interval <= 0:
+            return False
+        meta = self._read_meta(key)
+        if time.time() - meta.get("lastGc", meta.get("created", 0)) < interval:
+            return False
+
+        try:
+            # gc.auto is 0 in mirrors; re-enable the default thresholds for this
+            # run only, and keep gc in the foreground so it finishes under the lock.
+            run_process(
+                ["git", "-c", "gc.auto=6700", "-c", "gc.autoDetach=false", "gc", "--auto", "--quiet"],
+                cwd=mirror_path,
+                check=True,
+                capture_output=True,
+                timeout=600,
+            )
+        except JobInterrupted:
+            return False
+        except Exception as e:
+            print(f"[RepoCache] Mirror gc failed: {e}")
+        # Recorded even on failure, so a broken mirror is not retried on every job.
+        self._write_meta(key, {**self._read_meta(key), "lastGc": time.time()})
+        return True
+
+    def _read_meta(self, key: str) -> dict:
+        meta_path = self._meta_path(key)
+        if not meta_path.exists():
+            return {}
+        try:
+            return json.loads(meta_path.read_text())
+        except Exception:
+            return {}
+
+    def _write_meta(self, key: str, meta: dict) -> None:
+        meta_path = self._meta_path(key)
+        tmp_meta = meta_path.with_suffix(f".json.{os.getpid()}.tmp")
+        tmp_meta.write_text(json.dumps(meta))
+        os.replace(tmp_meta, meta_path)
+
+    def _touch(self, key: str, repo_url: str, mirror_path: Optional[Path]) -> None:
+        meta = self._read_meta(key)
+        meta.setdefault("created", time.time())
+        meta["url"] = normalize_repo_url(repo_url)
+        meta["lastUsed"] = time.time()
+        if mirror_path is not None:
+            meta["size"] = _dir_size(mirror_path)
+        self._write_meta(key, meta)
+
+    def evict(self) -> None:
+        """Delete least-recently-used mirrors until the store fits its quota."""
+        entries = []
+        for meta_path in self.mirrors_dir.glob("*.json"):
+            try:
+                meta = json.loads(meta_path.read_text())
+            except Exception:
+                continue
+            entries.append((meta.get("lastUsed", 0), meta.get("size", 0), meta_path.stem))
+
+        total = sum(size for _last_used, size, _key in entries)
+        for _last_used, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            with open(self.locks_dir / f"{key}.use.lock", "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # In use by a running job.
+                try:
+                    shutil.rmtree(self.mirrors_dir / f"{key}.git", ignore_errors=True)
+                    self._meta_path(key).unlink(missing_ok=True)
+                    total -= size
+                    print(f"[RepoCache] Evicted mirror {key}")
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+_store: Optional[MirrorStore] = None
+
+
+def get_mirror_store() -> Optional[MirrorStore]:
+    """Return the process-wide mirror store, or None when it is disabled."""
+    global _store
+    if not config.REPO_CACHE_DIR:
+        return None
+
+    if _store is None:
+        _store = MirrorStore(config.REPO_CACHE_DIR, config.REPO_CACHE_MAX_BYTES)
+    return _store
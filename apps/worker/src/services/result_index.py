@@ -0,0 +1,75 @@
+"""
+Index of finished analyses, shared by all workers through Redis.
+
+Maps (normalized repo URL, commit SHA, analyzer fingerprint) to the S3 key and
+stats of a graph that was already uploaded, so a repository at a commit that
+was analyzed before can be answered without cloning it again. The fingerprint
+covers everything that changes the output, so results produced by another
+analyzer version or configuration are never reused.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from typing import Any, Optional
+
+from redis import Redis
+
+from src.config import config
+from src.services.repo_analyzer import EXTRACTOR_VERSION
+from src.services.repo_cache import normalize_repo_url
+
+# Bump whenever the analyzer's output changes in a way the other fingerprint
+# components do not capture.
+RESULT_VERSION = 5
+
+
+def analyzer_fingerprint() -> str:
+    """Identity of the analyzer build and of the configuration that shapes its output."""
+    return (
+        f"r{RESULT_VERSION}.e{EXTRACTOR_VERSION}.f{config.GRAPH_FORMAT}"
+        f".{config.SNAPSHOT_SELECTION}{config.SNAPSHOT_COUNT}"
+        f".l{config.LAYOUT_ITERATIONS}-{config.LAYOUT_WARM_ITERATIONS}-{config.LAYOUT_SEED}-{config.LAYOUT_THETA}"
+        f"-{config.LAYOUT_MAX_NODES}"
+        f".d{config.LOD_MIN_FILES}-{config.LOD_MAX_LEVEL_NODES}"
+        f".a{int(config.GRAPH_ANALYTICS_SNAPSHOTS)}-{config.PAGERANK_DAMPING}-{config.PAGERANK_TOLERANCE}"
+        f"-{config.PAGERANK_MAX_ITERATIONS}-{config.ANALYTICS_TOP_N}"
+        f".i{config.INGEST_MAX_FILE_BYTES}-{config.INGEST_MAX_JSON_BYTES}-{config.INGEST_MAX_FILES}"
+        f"-{config.INGEST_EXCLUDE_DIRS}-{config.INGEST_INCLUDE_DIRS}-{config.INGEST_EXCLUDE_FILES}"
+    )
+
+
+class ResultIndex:
+    """Redis-backed (repo, commit, fingerprint) -> {resultUrl, stats} map with a TTL."""
+
+    def __init__(self, redis_client: Redis, ttl: int):
+        self.redis = redis_client
+        self.ttl = ttl
+
+    def _key(self, repo_url: str, commit: str) -> str:
+        identity = f"{normalize_repo_url(repo_url)}\n{commit}\n{analyzer_fingerprint()}"
+        return f"codeviz:results:{hashlib.sha256(identity.encode('utf-8')).hexdigest()}"
+
+    def get(self, repo_url: str, commit: str) -> Optional[dict[str, Any]]:
+        raw = self.redis.get(self._key(repo_url, commit))
+        return json.loads(raw) if raw else None
+
+    def put(self, repo_url: str, commit: str, result_url: str, stats: dict[str, Any]) -> None:
+        entry = {"resultUrl": result_url, "stats": stats, "storedAt": time.time()}
+        self.redis.set(self._key(repo_url, commit), json.dumps(entry), ex=self.ttl)
+
+
+_index: Optional[ResultIndex] = None
+
+
+def get_result_index() -> Optional[ResultIndex]:
+    """Return the process-wide result index, or None when reuse is disabled."""
+    global _index
+    if config.RESULT_INDEX_TTL <= 0:
+        return None
+
+    if _index is None:
+        _index = ResultIndex(Redis.from_url(config.REDIS_URL), config.RESULT_INDEX_TTL)
+    return _index
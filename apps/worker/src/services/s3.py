@@ -1,9 +1,13 @@
 import boto3
 import json
-from typing import Any
+import zlib
+from typing import Any, Iterator
 
 from src.config import config
 
+# S3 rejects multipart parts (other than the last) smaller than 5 MiB.
+MIN_PART_SIZE = 5 * 1024 * 1024
+
 
 def get_s3_client():
     return boto3.client(
@@ -11,23 +15,129 @@ def get_s3_client():
         region_name=config.AWS_REGION,
         aws_access_key_id=config.AWS_ACCESS_KEY_ID,
         aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
+        endpoint_url=config.S3_ENDPOINT_URL or None,
     )
 
 
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _iter_json(data: Any, depth: int) -> Iterator[str]:
+    """
+    Compact JSON of `data` in pieces: containers down to `depth` levels are
+    split into their elements, and each element is encoded in one call to the
+    C encoder (`iterencode` would fall back to the pure-Python one).
+    """
+    if depth > 0 and isinstance(data, dict) and all(isinstance(key, str) for key in data):
+        yield "{"
+        for i, (key, value) in enumerate(data.items()):
+            yield f"{',' if i else ''}{_dumps(key)}:"
+            yield from _iter_json(value, depth - 1)
+        yield "}"
+    elif depth > 0 and isinstance(data, (list, tuple)):
+        yield "["
+        for i, value in enumerate(data):
+            if i:
+                yield ","
+            yield from _iter_json(value, depth - 1)
+        yield "]"
+    else:
+        yield _dumps(data)
+
+
+def iter_gzip_json(data: Any, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Serialize `data` as compact JSON and gzip it incrementally, yielding compressed chunks."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    pending: list[str] = []
+    pending_size = 0
+    # Three levels reach the columns of graph.json sections and the entries
+    # of snapshot lists, so no single piece holds a whole large section.
+    for piece in _iter_json(data, 3):
+        pending.append(piece)
+        pending_size += len(piece)
+        if pending_size >= chunk_size:
+            compressed = compressor.compress("".join(pending).encode("utf-8"))
+            pending, pending_size = [], 0
+            if compressed:
+                yield compressed
+
+    compressed = compressor.compress("".join(pending).encode("utf-8")) + compressor.flush()
+    if compressed:
+        yield compressed
+
+
 def upload_graph_json(job_id: str, graph_data: dict[str, Any]) -> str:
-    """Upload graph.json to S3 privately and return the S3 object key."""
+    """
+    Upload graph.json to S3 privately and return the S3 object key.
+
+    The body is streamed as gzip (`Content-Encoding: gzip`) through a multipart
+    upload, so at most one part is held in memory. Graphs that compress below
+    one part are sent with a single `put_object`.
+    """
     s3 = get_s3_client()
 
     key = f"codeviz/graphs/{job_id}/graph.json"
-    body = json.dumps(graph_data, ensure_ascii=False, indent=2)
-
-    s3.put_object(
-        Bucket=config.S3_BUCKET,
-        Key=key,
-        Body=body.encode("utf-8"),
-        ContentType="application/json",
-        # No ACL specified = private by default
-    )
+    part_size = max(config.S3_UPLOAD_PART_SIZE, MIN_PART_SIZE)
+    # No ACL specified = private by default
+    object_args = {
+        "Bucket": config.S3_BUCKET,
+        "Key": key,
+        "ContentType": "application/json",
+        "ContentEncoding": "gzip",
+    }
+
+    chunks = iter_gzip_json(graph_data)
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= part_size:
+            break
+    else:
+        s3.put_object(Body=bytes(buffer), **object_args)
+        return key
+
+    upload_id = s3.create_multipart_upload(**object_args)["UploadId"]
+    parts: list[dict[str, Any]] = []
+
+    def send_part(body: bytes) -> None:
+        part_number = len(parts) + 1
+        response = s3.upload_part(
+            Bucket=config.S3_BUCKET,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    try:
+        for chunk in chunks:
+            buffer += chunk
+            if len(buffer) >= part_size:
+                send_part(bytes(buffer[:part_size]))
+                del buffer[:part_size]
+        if buffer:
+            send_part(bytes(buffer))
+
+        s3.complete_multipart_upload(
+            Bucket=config.S3_BUCKET,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=config.S3_BUCKET, Key=key, UploadId=upload_id)
+        raise
 
     # Return only the S3 key, not a public URL
     return key
+
+
+def upload_job_artifact(job_id: str, name: str, body: bytes, content_type: str) -> str:
+    """Upload a small job artifact (e.g. a profile) next to graph.json and return its S3 key."""
+    s3 = get_s3_client()
+
+    key = f"codeviz/graphs/{job_id}/{name}"
+    s3.put_object(Bucket=config.S3_BUCKET, Key=key, Body=body, ContentType=content_type)
+    return key
@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
 """
 CodeViz Worker - Processes analysis jobs from Redis queue
+
+With WORKER_CONCURRENCY > 1 the main process becomes a supervisor of that many
+job slots. Each slot is a child process that pulls jobs from the queue on its
+own; crashed slots are restarted and shutdown drains in-flight jobs.
+
+Within a process, jobs run through the fetch/analyze/publish pipeline of
+src/jobs/pipeline.py (PIPELINE_PREFETCH = 0 runs them one after another).
 """
 
 import json
+import multiprocessing
 import signal
 import sys
+import time
+from typing import Optional
 from redis import Redis
 
 from src.config import config
-from src.jobs.analyze import process_analysis_job
+from src.jobs.analyze import mark_job_failed, process_analysis_job, retry_orphaned_followers
+from src.jobs.pipeline import JobPipeline
 
 
 class GracefulShutdown:
@@ -25,18 +36,27 @@ class GracefulShutdown:
         self.should_stop = True
 
 
-def main():
-    print("[Worker] Starting CodeViz Worker...")
-    print(f"[Worker] Queue: {config.QUEUE_NAME}")
-    print(f"[Worker] Redis: {config.REDIS_URL}")
+def run_job_loop(shutdown: GracefulShutdown, current_jobs=None) -> None:
+    """
+    Pull and process jobs until shutdown is requested.
 
-    shutdown = GracefulShutdown()
-    redis_client = Redis.from_url(config.REDIS_URL)
+    `current_jobs` is an optional shared byte buffer where the comma-separated
+    ids of the jobs in progress are published, so a supervisor can fail them
+    if this process dies.
+    """
+    def publish_jobs(job_ids: list[str]) -> None:
+        if current_jobs is not None:
+            current_jobs.value = ",".join(job_ids).encode("utf-8")
+
+    if config.PIPELINE_PREFETCH > 0:
+        JobPipeline(lambda: shutdown.should_stop, publish_jobs).run()
+        return
 
-    print("[Worker] Waiting for jobs...")
+    redis_client = Redis.from_url(config.REDIS_URL)
 
     while not shutdown.should_stop:
         try:
+            retry_orphaned_followers()
             # BRPOP blocks for up to 5 seconds waiting for a job
             result = redis_client.brpop(config.QUEUE_NAME, timeout=5)
 
@@ -53,16 +73,110 @@ def main():
                 continue
 
             print(f"[Worker] Received job: {job_id}")
-            process_analysis_job(job_id)
+            publish_jobs([job_id])
+            try:
+                process_analysis_job(job_id, payload.get("attempt", 0), payload.get("profile"))
+            finally:
+                publish_jobs([])
 
         except Exception as e:
             print(f"[Worker] Error processing job: {e}")
             import traceback
             traceback.print_exc()
 
-    print("[Worker] Shutdown complete")
     redis_client.close()
 
 
+def run_slot(slot_id: int, current_jobs) -> None:
+    """Entry point of a job slot process."""
+    shutdown = GracefulShutdown()
+    print(f"[Worker] Slot {slot_id} ready")
+    run_job_loop(shutdown, current_jobs)
+    print(f"[Worker] Slot {slot_id} stopped")
+
+
+class JobSlot:
+    """A supervised child process that runs one job (or one job pipeline) at a time."""
+
+    def __init__(self, slot_id: int):
+        self.slot_id = slot_id
+        # Room for the ids of every job a pipeline can hold at once.
+        capacity = config.PIPELINE_PREFETCH + config.PIPELINE_PUBLISH_QUEUE + 4
+        self.current_jobs = multiprocessing.Array("c", 64 * capacity)
+        self.process: Optional[multiprocessing.Process] = None
+
+    def start(self) -> None:
+        self.current_jobs.value = b""
+        self.process = multiprocessing.Process(
+            target=run_slot,
+            args=(self.slot_id, self.current_jobs),
+            name=f"codeviz-slot-{self.slot_id}",
+        )
+        self.process.start()
+
+    def orphaned_jobs(self) -> list[str]:
+        job_ids = self.current_jobs.value.decode("utf-8")
+        return job_ids.split(",") if job_ids else []
+
+
+def supervise(concurrency: int, shutdown: GracefulShutdown) -> None:
+    """Run `concurrency` job slots, restarting crashed ones, until shutdown."""
+    slots = [JobSlot(slot_id) for slot_id in range(concurrency)]
+    for slot in slots:
+        slot.start()
+
+    while not shutdown.should_stop:
+        for slot in slots:
+            if slot.process.is_alive():
+                continue
+
+            exitcode = slot.process.exitcode
+            print(f"[Worker] Slot {slot.slot_id} exited with code {exitcode}, restarting...")
+            for job_id in slot.orphaned_jobs():
+                try:
+                    mark_job_failed(job_id, f"WorkerCrashed: job process exited with code {exitcode}")
+                except Exception as e:
+                    print(f"[Worker] Could not mark job {job_id} as failed: {e}")
+            slot.start()
+
+        time.sleep(1)
+
+    # Drain: ask every slot to stop after its current job and wait for it.
+    print("[Worker] Draining in-flight jobs...")
+    for slot in slots:
+        if slot.process.is_alive():
+            slot.process.terminate()
+
+    deadline = time.monotonic() + config.WORKER_DRAIN_TIMEOUT
+    for slot in slots:
+        slot.process.join(max(0.0, deadline - time.monotonic()))
+        if slot.process.is_alive():
+            print(f"[Worker] Slot {slot.slot_id} did not drain in time, killing it")
+            slot.process.kill()
+            slot.process.join()
+            for job_id in slot.orphaned_jobs():
+                try:
+                    mark_job_failed(job_id, "WorkerShutdown: job did not finish before shutdown")
+                except Exception as e:
+                    print(f"[Worker] Could not mark job {job_id} as failed: {e}")
+
+
+def main():
+    print("[Worker] Starting CodeViz Worker...")
+    print(f"[Worker] Queue: {config.QUEUE_NAME}")
+    print(f"[Worker] Redis: {config.REDIS_URL}")
+
+    shutdown = GracefulShutdown()
+
+    if config.WORKER_CONCURRENCY > 1:
+        print(f"[Worker] Supervising {config.WORKER_CONCURRENCY} job slots...")
+        supervise(config.WORKER_CONCURRENCY, shutdown)
+    else:
+        print("[Worker] Waiting for jobs...")
+        run_job_loop(shutdown)
+
+    print("[Worker] Shutdown complete")
+
+
 if __name__ == "__main__":
     main()